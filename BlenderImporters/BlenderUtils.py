@@ -2,6 +2,7 @@
 Defines generic and often used functions to perform operations in Blender
 """
 import math
+import os
 import logging
 
 from typing import List
@@ -16,6 +17,8 @@ from RainbowFileReaders.RSEMaterialDefinition import RSEMaterialDefinition
 from RainbowFileReaders.RSEGeometryDataStructures import R6GeometryObject
 from RainbowFileReaders.RSMAPStructures import RSMAPGeometryObject
 from RainbowFileReaders.RenderableArray import RenderableArray
+from FileUtilities.CacheDirectory import get_cache_path, set_cache_root
+from FileUtilities.Settings import load_settings
 
 log = logging.getLogger(__name__)
 
@@ -51,6 +54,16 @@ def set_blender_render_unit_scale_options():
     bpy.context.scene.unit_settings.system_rotation = 'DEGREES'
     bpy.context.scene.unit_settings.scale_length = 0.01
 
+def load_cache_root_setting(settingsFilename: str = "settings.json"):
+    """Sets the cache root from the cacheRoot setting, so textures converted into a cache root are found.
+    If the settings file doesn't exist, textures are looked for beside their source files"""
+    if os.path.isfile(settingsFilename) is False:
+        log.warning("Settings file not found, looking for converted textures beside the game files: %s", settingsFilename)
+        set_cache_root(None)
+        return
+    settings = load_settings(settingsFilename)
+    set_cache_root(settings.get("cacheRoot"))
+
 def setup_blank_scene():
     """Load a blank scene, unloading any existing imported models/materials etc"""
     #bpy.ops.wm.read_factory_settings(use_empty=True)
@@ -144,7 +157,11 @@ def create_material_from_RSE_specification(materialSpecification: RSEMaterialDef
         texToLoad = find_texture(textureName, path)
         #if a texture was found, don't continue searching
         if texToLoad is not None:
-            texToLoad = texToLoad + ".PNG"
+            # Prefer a DDS file with a precomputed mip chain if one has been converted
+            if os.path.isfile(get_cache_path(texToLoad, ".DDS")):
+                texToLoad = get_cache_path(texToLoad, ".DDS")
+            else:
+                texToLoad = get_cache_path(texToLoad, ".PNG")
             break
 
     if texToLoad is None:
@@ -160,6 +160,7 @@ def import_MAP_to_scene(filename: str):
         # and it is not used anywhere so it is safe to skip
         log.info("Skipping test map: %s", filename)
         return False
+    BlenderUtils.load_cache_root_setting()
     MAPObject = MAPLevelReader.MAPLevelFile()
     MAPObject.read_file(filename)
 
@@ -180,9 +181,11 @@ def import_MAP_to_scene(filename: str):
             if isinstance(geoObj, RSMAPGeometryObject):
                 create_objects_from_RSMAPGeometryObject(geoObj, blenderMaterials)
 
+    #Skipped sections and missing DMP files are stored as None
     if MAPObject.gameVersion == RSEGameVersions.RAINBOW_SIX:
-        import_r6_lights(MAPObject.lightList)
-    else:
+        if MAPObject.lightList is not None:
+            import_r6_lights(MAPObject.lightList)
+    elif MAPObject.dmpLights is not None:
         import_rs_lights(MAPObject.dmpLights)
 
     log.info("Import Map Succeeded")
@@ -18,6 +18,7 @@ log = logging.getLogger(__name__)
 
 def import_SOB_to_scene(filename: str):
     """Opens SOB file and imports all relevant information"""
+    BlenderUtils.load_cache_root_setting()
     SOBObject = SOBModelReader.SOBModelFile()
     SOBObject.read_file(filename)
 
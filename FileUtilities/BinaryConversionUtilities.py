@@ -2,17 +2,92 @@
 Provides some utility classes and functions for reading data from binary files
 Also provides some functions to unpack data from packed structures
 """
+import array
+import functools
+import mmap
+import os
 import struct
+import sys
 import logging
 
-from typing import List, Tuple
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Callable, Dict, List, Tuple, Optional, Union, Sequence, TYPE_CHECKING
 
 from deprecated import deprecated # type: ignore
 
 from FileUtilities.LoggingUtils import log_pprint
+from FileUtilities.FileOffsetIndex import FileOffsetIndex, FileOffsetIndexEntry, get_file_key, get_index_path
+
+if TYPE_CHECKING:
+    from FileUtilities.BinaryStructSchema import BinaryStructSchema
 
 log = logging.getLogger(__name__)
 
+# Data returned by BinaryFileReader.read_bytes, memoryviews are returned when reading from memory mapped files
+BytesLike = Union[bytes, memoryview]
+
+# When reading from a memory mapped file, pages that have already been parsed are released back to the OS every time this many bytes have been read
+MMAP_RELEASE_INTERVAL = 4 * 1024 * 1024
+
+# struct typecodes matching each of the scalar read functions of BinaryFileReader
+# read_uint16 and read_int16 have always unpacked with swapped signedness, this is preserved so existing files read identically
+TYPECODE_UINT32 = "I"
+TYPECODE_INT32 = "i"
+TYPECODE_UINT16 = "h"
+TYPECODE_INT16 = "H"
+TYPECODE_FLOAT = "f"
+TYPECODE_UINT8 = "B"
+
+@functools.lru_cache(maxsize=256)
+def get_vector_struct(typecode: str, count: int) -> struct.Struct:
+    """Returns a precompiled little-endian struct which unpacks count values of typecode at once. Structs are cached per count and type"""
+    return struct.Struct("<" + str(count) + typecode)
+
+UINT32_STRUCT = get_vector_struct(TYPECODE_UINT32, 1)
+INT32_STRUCT = get_vector_struct(TYPECODE_INT32, 1)
+UINT16_STRUCT = get_vector_struct(TYPECODE_UINT16, 1)
+INT16_STRUCT = get_vector_struct(TYPECODE_INT16, 1)
+FLOAT_STRUCT = get_vector_struct(TYPECODE_FLOAT, 1)
+
+# A list of fixed width float vectors, either a list of lists or a PackedVectorArray
+FloatVectorSequence = Sequence[List[float]]
+
+class PackedVectorArray(SequenceABC):
+    """
+    A sequence of fixed width float vectors stored in a single contiguous array('f').
+    Indexing returns a new list for the vector, so code written against lists of lists keeps working.
+    """
+    def __init__(self, values: array.array, width: int):
+        super(PackedVectorArray, self).__init__()
+        self.values: array.array = values
+        self.width: int = width
+
+    def __len__(self) -> int:
+        return len(self.values) // self.width
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("PackedVectorArray index out of range")
+        start = index * self.width
+        return self.values[start:start + self.width].tolist()
+
+    def tolist(self) -> List[List[float]]:
+        """Returns the vectors as a list of lists"""
+        flatValues = self.values.tolist()
+        return [flatValues[i:i + self.width] for i in range(0, len(flatValues), self.width)]
+
+def unpack_float_array(data: BytesLike) -> array.array:
+    """Converts little-endian packed floats into an array('f') without unpacking each value"""
+    values = array.array(TYPECODE_FLOAT)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
 # Disabling "Too many public methods", as this is caused by some deprecated wrapper
 # functions that I don't want to remove just yet.
 # pylint: disable=R0904
@@ -21,32 +96,143 @@ class BinaryFileReader(object):
     A wrapper for reading and conversion operations on binary file data.
     All datatypes assume they were written in little-endian format
     """
-    def __init__(self, path=None):
+    def __init__(self, path=None, useMemoryMap=False, usePackedArrays=False):
         super(BinaryFileReader, self).__init__()
+        self.filepath: str = None
+        self.bytes: BytesLike = b''
+        # When True, read_vec_f_block returns PackedVectorArrays instead of lists of lists
+        self.usePackedArrays: bool = usePackedArrays
+        # When set, called with each BinaryFileDataStructure and the offset it starts at, as it is read
+        self.offsetRecorder: Optional[Callable[[Any, int], None]] = None
+        self._seekg: int = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._releasedUpTo: int = 0
         if path is not None:
-            self.open_file(path)
+            self.open_file(path, useMemoryMap)
 
-    def open_file(self, path: str):
-        """Opens the file at specified path and reads all data at once into buffer self.bytes"""
+    def open_file(self, path: str, useMemoryMap: bool = False):
+        """Opens the file at specified path and reads all data at once into buffer self.bytes
+        If useMemoryMap is True the file is memory mapped instead, and read_bytes will return memoryview slices of the mapping rather than copies"""
+        self.close()
         self.filepath = path
         log.debug("Opening file for read: %s", self.filepath)
         f = open(path, "rb")
-        # read entire file
-        self.bytes = f.read()
+        # Empty files cannot be memory mapped, so they are always read normally
+        if useMemoryMap and os.fstat(f.fileno()).st_size > 0:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.bytes = memoryview(self._mmap)
+        else:
+            # read entire file
+            self.bytes = f.read()
         f.close()
 
         # note that we "seek" to the beginning of the file at load
         self._seekg = 0
-
-    def read_bytes(self, size: int) -> bytes:
-        """Reads and returns a sequence of bytes of specified length"""
+        self._releasedUpTo = 0
+
+    def open_buffer(self, data: Union[bytes, bytearray, memoryview], name: str = None):
+        """Reads from data which is already in memory, such as a file extracted from an archive. The data is not copied.
+        name is stored as the filepath, and is only used for logging and locating related files"""
+        self.close()
+        self.filepath = name
+        if isinstance(data, bytearray):
+            data = memoryview(data)
+        self.bytes = data
+        self._seekg = 0
+        self._releasedUpTo = 0
+
+    def close(self):
+        """Releases the buffer held by this reader.
+        A memory mapped file stays mapped until every memoryview returned by read_bytes has been garbage collected.
+        Readers copy the slices they keep, so this only happens when data is deliberately kept for later, such as in lazy modes"""
+        self.bytes = b''
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Slices of the mapping are still referenced, the mapping and its file handle will be released along with them
+                log.debug("Memory mapped file is still referenced, it will be unmapped once released: %s", self.filepath)
+            self._mmap = None
+
+    def is_memory_mapped(self) -> bool:
+        """Returns true if the data is read from a memory mapped file"""
+        return self._mmap is not None
+
+    def release_consumed_pages(self):
+        """Tells the OS that pages of a memory mapped file before the current read position are no longer needed.
+        They will be transparently read from disk again if anything still references them."""
+        if self._mmap is None or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        releaseEnd = (self._seekg // mmap.PAGESIZE) * mmap.PAGESIZE
+        if releaseEnd > self._releasedUpTo:
+            self._mmap.madvise(mmap.MADV_DONTNEED, self._releasedUpTo, releaseEnd - self._releasedUpTo)
+            self._releasedUpTo = releaseEnd
+
+    def _check_remaining_length(self, size: int):
+        """Raises a ValueError if there are not enough bytes left to read size bytes"""
         if len(self.bytes) < self._seekg + size:
-            log.critical("File not long enough to read %d bytes", str(size))
+            log.critical("File not long enough to read %d bytes", size)
             raise ValueError("File not long enough to read " + str(size) + " bytes")
-        val = self.bytes[self._seekg:self._seekg+size]
+
+    def _advance(self, size: int):
+        """Moves the read position forward after a successful read"""
         self._seekg += size
+        if self._mmap is not None and self._seekg - self._releasedUpTo >= MMAP_RELEASE_INTERVAL:
+            self.release_consumed_pages()
+
+    def seek(self, offset: int):
+        """Moves the read position to offset bytes from the start of the data"""
+        if offset < 0 or offset > len(self.bytes):
+            raise ValueError("Unable to seek to " + str(offset) + ", data is " + str(len(self.bytes)) + " bytes long")
+        self._seekg = offset
+
+    def skip_bytes(self, size: int):
+        """Moves the read position forward without reading any data. When memory mapped, skipped pages are never loaded from disk"""
+        self._check_remaining_length(size)
+        self._advance(size)
+
+    def read_bytes(self, size: int) -> BytesLike:
+        """Reads and returns a sequence of bytes of specified length.
+        Returns a memoryview instead of bytes when reading from a memory mapped file"""
+        self._check_remaining_length(size)
+        val = self.bytes[self._seekg:self._seekg+size]
+        self._advance(size)
         return val
 
+    def read_struct(self, structFormat: struct.Struct) -> Tuple:
+        """Unpacks a precompiled struct from the current position, without copying any bytes"""
+        size = structFormat.size
+        self._check_remaining_length(size)
+        values = structFormat.unpack_from(self.bytes, self._seekg)
+        self._advance(size)
+        return values
+
+    def read_vec(self, typecode: str, count: int) -> Tuple:
+        """Reads count values of the given struct typecode with a single unpack. Returns a tuple"""
+        return self.read_struct(get_vector_struct(typecode, count))
+
+    def read_vec_f_block(self, count: int, width: int) -> FloatVectorSequence:
+        """Reads count vectors of width floats with a single bulk read.
+        Returns a PackedVectorArray if usePackedArrays is set, otherwise a list of lists"""
+        if self.usePackedArrays:
+            return PackedVectorArray(unpack_float_array(self.read_bytes(count * width * FLOAT_STRUCT.size)), width)
+        values = self.read_vec(TYPECODE_FLOAT, count * width)
+        return [list(values[i:i + width]) for i in range(0, count * width, width)]
+
+    def read_vec_f_block_with_scalar(self, count: int, width: int) -> Tuple[FloatVectorSequence, Sequence[float]]:
+        """Reads count records, each made of a vector of width floats followed by a single float, with a single bulk read.
+        Returns the vectors and the scalars separately, such as face normals and their distances from the origin"""
+        recordWidth = width + 1
+        if self.usePackedArrays:
+            records = unpack_float_array(self.read_bytes(count * recordWidth * FLOAT_STRUCT.size))
+            vectors = array.array(TYPECODE_FLOAT, bytes(count * width * FLOAT_STRUCT.size))
+            for component in range(width):
+                vectors[component::width] = records[component::recordWidth]
+            return PackedVectorArray(vectors, width), records[width::recordWidth]
+        values = self.read_vec(TYPECODE_FLOAT, count * recordWidth)
+        vectorList = [list(values[i:i + width]) for i in range(0, count * recordWidth, recordWidth)]
+        return vectorList, list(values[width::recordWidth])
+
     @deprecated
     def read_uint(self) -> int:
         """Converts 4 bytes to an integer"""
@@ -54,12 +240,7 @@ class BinaryFileReader(object):
 
     def read_uint32(self) -> int:
         """Converts 4 bytes to an integer"""
-        #https://stackoverflow.com/a/444610
-        data = self.read_bytes(4)
-        if len(data) < 4:
-            log.error("Data read not long enough, returning 0")
-            return 0
-        return struct.unpack("<I", data)[0]
+        return self.read_struct(UINT32_STRUCT)[0]
 
     @deprecated
     def read_int(self) -> int:
@@ -68,12 +249,7 @@ class BinaryFileReader(object):
 
     def read_int32(self) -> int:
         """Converts 4 bytes to an integer"""
-        #https://stackoverflow.com/a/444610
-        data = self.read_bytes(4)
-        if len(data) < 4:
-            log.error("Data read not long enough, returning 0")
-            return 0
-        return struct.unpack("<i", data)[0]
+        return self.read_struct(INT32_STRUCT)[0]
 
     @deprecated
     def read_short_int(self) -> int:
@@ -82,11 +258,7 @@ class BinaryFileReader(object):
 
     def read_int16(self) -> int:
         """Converts 2 bytes to a short integer"""
-        data = self.read_bytes(2)
-        if len(data) < 2:
-            log.error("Data read not long enough, returning 0")
-            return 0
-        return struct.unpack("<H", data)[0]
+        return self.read_struct(INT16_STRUCT)[0]
 
     @deprecated
     def read_short_uint(self) -> int:
@@ -95,26 +267,15 @@ class BinaryFileReader(object):
 
     def read_uint16(self) -> int:
         """Converts 2 bytes to a short integer"""
-        data = self.read_bytes(2)
-        if len(data) < 2:
-            log.error("Data read not long enough, returning 0")
-            return 0
-        return struct.unpack("<h", data)[0]
+        return self.read_struct(UINT16_STRUCT)[0]
 
     def read_float(self) -> float:
-        """Converts 2 bytes to a short integer"""
-        data = self.read_bytes(4)
-        if len(data) < 4:
-            log.error("Data read not long enough, returning 0")
-            return 0
-        return struct.unpack("f", data)[0]
+        """Converts 4 bytes to a float"""
+        return self.read_struct(FLOAT_STRUCT)[0]
 
     def read_vec_f(self, size: int) -> List[float]:
         """Reads a specified number of floats into a list"""
-        vec = []
-        for _ in range(size):
-            vec.append(self.read_float())
-        return vec
+        return list(self.read_vec(TYPECODE_FLOAT, size))
 
     @deprecated
     def read_vec_uint(self, size: int) -> List[int]:
@@ -123,10 +284,7 @@ class BinaryFileReader(object):
 
     def read_vec_uint32(self, size: int) -> List[int]:
         """Reads a specified number of uints into a list"""
-        vec = []
-        for _ in range(size):
-            vec.append(self.read_uint32())
-        return vec
+        return list(self.read_vec(TYPECODE_UINT32, size))
 
     @deprecated
     def read_vec_short_uint(self, size: int) -> List[int]:
@@ -135,17 +293,14 @@ class BinaryFileReader(object):
 
     def read_vec_uint16(self, size: int) -> List[int]:
         """Reads a specified number of short uints into a list"""
-        vec = []
-        for _ in range(size):
-            vec.append(self.read_uint16())
-        return vec
+        return list(self.read_vec(TYPECODE_UINT16, size))
 
     def read_bgra_color_8bpp_byte(self) -> List[int]:
         """reads 4 bytes into a BGRA color, and then converts to RGBA."""
         byteStream = self.read_bytes(4)
         color: List[int] = []
         for j in range(4):
-            color.append(ord(byteStream[j:j + 1]))
+            color.append(byteStream[j])
         tempblue = color[0]
         color[0] = color[2]
         color[2] = tempblue
@@ -153,24 +308,15 @@ class BinaryFileReader(object):
 
     def read_rgb_color_24bpp_uint(self) -> List[int]:
         """Reads 3 uints"""
-        color = []
-        for _ in range(3):
-            color.append(self.read_uint32())
-        return color
+        return self.read_vec_uint32(3)
 
     def read_rgba_color_32bpp_uint(self) -> List[int]:
         """Reads 4 uints"""
-        color = []
-        for _ in range(4):
-            color.append(self.read_uint32())
-        return color
+        return self.read_vec_uint32(4)
 
     def read_rgba_color_32bpp_float(self) -> List[float]:
-        """Reads 4 uints"""
-        color = []
-        for _ in range(4):
-            color.append(self.read_float())
-        return color
+        """Reads 4 floats"""
+        return self.read_vec_f(4)
 
     def get_length(self) -> int:
         """Returns the length of the file that was read"""
@@ -199,14 +345,115 @@ class FileFormatReader(object):
         """Utility method to print detailed information on data stored"""
         log_pprint(vars(self), logging.INFO)
 
-    def read_file(self, filepath, verboseOutput=False):
-        """Reads the file specified into memory and then will call read_data to process"""
+    @classmethod
+    def probe(cls, filepath: str):
+        """Reads only the information needed to identify a file, such as its header, without parsing the rest of it.
+        The file is memory mapped, so only the pages that are read are loaded from disk.
+        Returns a new instance of this class with only the fields set by read_probe_data populated"""
+        probedFile = cls()
+        probedFile.filepath = filepath
+        probedFile._filereader = BinaryFileReader(filepath, useMemoryMap=True)
+        try:
+            probedFile.read_probe_data()
+        finally:
+            probedFile._filereader.close()
+            probedFile._filereader = None
+        return probedFile
+
+    def read_probe_data(self):
+        """The method to override to read the summary information used by probe. Like read_data, nothing is read by default"""
+
+    @classmethod
+    def get_indexed_structure_types(cls) -> Dict[type, str]:
+        """Override to map each named BinaryFileDataStructure type to the kind it is stored as in a FileOffsetIndex.
+        Indexed structures must have a name_string"""
+        return {}
+
+    def get_section_offsets(self) -> Dict[str, int]:
+        """Override to return the offset of each section read, which will be stored in a FileOffsetIndex"""
+        return {}
+
+    @classmethod
+    def build_index(cls, filepath: str) -> FileOffsetIndex:
+        """Reads the whole file and records the offset of every section and every structure listed in indexedStructureTypes"""
+        fileSize, fileModifiedTime = get_file_key(filepath)
+        index = FileOffsetIndex(filepath, fileSize, fileModifiedTime)
+
+        recordedStructures: List[Tuple[Any, int]] = []
+        filereader = BinaryFileReader(filepath, useMemoryMap=True)
+        filereader.offsetRecorder = lambda structure, offset: recordedStructures.append((structure, offset))
+        indexedFile = cls()
+        indexedFile._read_with_reader(filereader, filepath, False)
+
+        for sectionName, offset in indexedFile.get_section_offsets().items():
+            index.add_entry(FileOffsetIndexEntry("section", sectionName, offset))
+        indexedStructureTypes = cls.get_indexed_structure_types()
+        for structure, offset in recordedStructures:
+            kind = indexedStructureTypes.get(type(structure))
+            if kind is not None:
+                index.add_entry(FileOffsetIndexEntry(kind, structure.name_string.string, offset, type(structure).__name__))
+        return index
+
+    @classmethod
+    def load_index(cls, filepath: str, cacheDirectory: str = None) -> FileOffsetIndex:
+        """Loads the index for a file, stored next to it or in cacheDirectory. The index is built and saved if it is missing or out of date"""
+        indexPath = get_index_path(filepath, cacheDirectory)
+        index = FileOffsetIndex.load(indexPath)
+        if index is not None and index.is_valid_for(filepath):
+            return index
+        log.debug("Building index: %s", indexPath)
+        index = cls.build_index(filepath)
+        index.save(indexPath)
+        return index
+
+    @classmethod
+    def read_structure_by_name(cls, filepath: str, kind: str, name: str, index: FileOffsetIndex = None, cacheDirectory: str = None, usePackedArrays=False):
+        """Uses an index to read a single named structure, such as one room or geometry object, without reading anything before it
+        Returns None if no structure of that kind and name exists"""
+        if index is None:
+            index = cls.load_index(filepath, cacheDirectory)
+        entry = index.find(kind, name)
+        if entry is None:
+            return None
+        structureTypes = {structureType.__name__: structureType for structureType in cls.get_indexed_structure_types()}
+        structure = structureTypes[entry.structureType]()
+        filereader = BinaryFileReader(filepath, useMemoryMap=True, usePackedArrays=usePackedArrays)
+        filereader.seek(entry.offset)
+        structure.read(filereader)
+        filereader.close()
+        return structure
+
+    def read_file(self, filepath, verboseOutput=False, useMemoryMap=False, usePackedArrays=False):
+        """Reads the file specified into memory and then will call read_data to process
+        If useMemoryMap is True, the file is memory mapped and parsed without copying the file into memory
+        If usePackedArrays is True, large geometry blocks are stored in PackedVectorArrays rather than lists of lists"""
         #TODO: Add error checking to see if this file was loaded
+        filereader = BinaryFileReader(filepath, useMemoryMap, usePackedArrays)
+        return self._read_with_reader(filereader, filepath, verboseOutput)
+
+    def read_buffer(self, data: Union[bytes, bytearray, memoryview], name: str = None, verboseOutput=False, usePackedArrays=False):
+        """Parses data which is already in memory, such as a file extracted from an archive or a cache, without writing it to disk
+        name should be the path the data originally came from, if known. It is used to locate related files such as CXPs"""
+        filereader = BinaryFileReader(usePackedArrays=usePackedArrays)
+        filereader.open_buffer(data, name)
+        return self._read_with_reader(filereader, name, verboseOutput)
+
+    def read_stream(self, fileobj, name: str = None, verboseOutput=False, usePackedArrays=False):
+        """Parses the remaining contents of a binary file-like object, such as a file opened from a zip archive
+        If name is not specified, the name attribute of fileobj is used when available"""
+        if name is None:
+            name = getattr(fileobj, "name", None)
+            if not isinstance(name, str):
+                name = None
+        return self.read_buffer(fileobj.read(), name, verboseOutput, usePackedArrays)
+
+    def _read_with_reader(self, filereader: BinaryFileReader, filepath: Optional[str], verboseOutput: bool):
+        """Calls read_data using an opened filereader, then releases the reader. Returns True if all data was read"""
         self.filepath = filepath
         self.verboseOutput = verboseOutput
 
         log.debug("Processing: %s", self.filepath)
-        self._filereader = BinaryFileReader(filepath)
+        self._filereader = filereader
 
         self.read_data()
 
@@ -221,6 +468,7 @@ class FileFormatReader(object):
 
         reachedEOF = self._filereader.is_at_eof()
 
+        self._filereader.close()
         del self._filereader
         self._filereader = None
 
@@ -232,11 +480,19 @@ class FileFormatReader(object):
 
 class BinaryFileDataStructure(object):
     """A helper class to provide utility methods and a common interface to data structures"""
+    # A BinaryStructSchema describing the leading fields of this structure. When set, these fields are read by this class' read method
+    schema: Optional["BinaryStructSchema"] = None
+
     def __init__(self):
         super().__init__()
 
     def read(self, filereader: BinaryFileReader):
-        """This is to be overriden in child classes. This is where all data for this structure can be read from"""
+        """This is to be overriden in child classes. This is where all data for this structure can be read from
+        If the structure declares a schema, the fields it describes are read here"""
+        if filereader.offsetRecorder is not None:
+            filereader.offsetRecorder(self, filereader.get_seekg())
+        if self.schema is not None:
+            self.schema.read(self, filereader)
 
     def print_structure_info(self):
         """Helper method to output class information for debugging"""
@@ -255,11 +511,12 @@ class SizedCString(object):
     def read(self, filereader: BinaryFileReader):
         """Reads a length and then a null-terminated string of that length from the BinaryFileReader"""
         self.string_length = filereader.read_uint32()
-        self.string_value_raw = filereader.read_bytes(self.string_length)
+        # Strings are always copied, so they remain usable once a memory mapped file is closed
+        self.string_value_raw = bytes(filereader.read_bytes(self.string_length))
         self.string = self.string_value_raw[:-1].decode("utf-8")
 
 
-def bytes_to_shortint(byteStream: bytes) -> Tuple[int]:
+def bytes_to_shortint(byteStream: BytesLike) -> Tuple[int]:
     """Converts 2 bytes to a short integer"""
     # Ignore this in typing, as the 'H' will guarantee ints are returned
     return struct.unpack('H', byteStream) # type: ignore
@@ -0,0 +1,144 @@
+"""
+Provides a declarative way to describe the fields of a binary data structure.
+Consecutive fixed size fields in a schema are merged so they are read with a single struct unpack,
+which avoids the overhead of a separate read call for every scalar and vector in a record.
+"""
+import struct
+import logging
+
+from typing import Any, Callable, List, Optional, Tuple
+
+from FileUtilities.BinaryConversionUtilities import BinaryFileReader, SizedCString
+
+log = logging.getLogger(__name__)
+
+# Field type for a SizedCString. All other field types are the struct typecodes such as TYPECODE_UINT32 in BinaryConversionUtilities
+FIELD_SIZED_CSTRING = "cstring"
+# Field type for a fixed length run of raw bytes. Count specifies the number of bytes
+FIELD_BYTES = "s"
+
+SchemaCondition = Callable[[Any], bool]
+
+class SchemaField(object):
+    """
+    A single named field in a schema.
+    Fields with a count of 1 are stored as a scalar, larger counts are stored as a list.
+    FIELD_BYTES fields are always stored as bytes, using count as the length.
+    """
+    def __init__(self, name: str, fieldType: str, count: int = 1):
+        super(SchemaField, self).__init__()
+        self.name: str = name
+        self.fieldType: str = fieldType
+        self.count: int = count
+
+    def is_fixed_size(self) -> bool:
+        """Returns true if the size of this field is known before reading"""
+        return self.fieldType != FIELD_SIZED_CSTRING
+
+    def read(self, target, filereader: BinaryFileReader):
+        """Reads a variable size field. Fixed size fields are read as part of a SchemaFieldRun"""
+        setattr(target, self.name, SizedCString(filereader))
+
+class SchemaAlias(object):
+    """Copies an already read attribute to a new name, used when a name string turns out to be a version string"""
+    def __init__(self, name: str, sourceName: str):
+        super(SchemaAlias, self).__init__()
+        self.name: str = name
+        self.sourceName: str = sourceName
+
+    def read(self, target, filereader: BinaryFileReader):
+        """Assigns the source attribute to the alias. Nothing is read from the file"""
+        setattr(target, self.name, getattr(target, self.sourceName))
+
+class SchemaBranch(object):
+    """A group of fields which are only present when condition is true. elseFields are read otherwise"""
+    def __init__(self, condition: SchemaCondition, fields: List[Any], elseFields: Optional[List[Any]] = None):
+        super(SchemaBranch, self).__init__()
+        self.condition: SchemaCondition = condition
+        self.fields: List[Any] = fields
+        self.elseFields: List[Any] = elseFields or []
+        self.steps = compile_schema_steps(self.fields)
+        self.elseSteps = compile_schema_steps(self.elseFields)
+
+    def read(self, target, filereader: BinaryFileReader):
+        """Evaluates the condition against the fields read so far, and then reads the appropriate fields"""
+        steps = self.steps if self.condition(target) else self.elseSteps
+        for step in steps:
+            step.read(target, filereader)
+
+class SchemaFieldRun(object):
+    """A sequence of consecutive fixed size fields, read with a single unpack"""
+    def __init__(self, fields: List[SchemaField]):
+        super(SchemaFieldRun, self).__init__()
+        structFormat = "<"
+        # Each assignment is (attribute name, index of first value, number of values or 0 for scalars)
+        self.assignments: List[Tuple[str, int, int]] = []
+        valueIndex = 0
+        for field in fields:
+            structFormat += str(field.count) + field.fieldType
+            if field.count == 1 or field.fieldType == FIELD_BYTES:
+                self.assignments.append((field.name, valueIndex, 0))
+                valueIndex += 1
+            else:
+                self.assignments.append((field.name, valueIndex, field.count))
+                valueIndex += field.count
+        self.struct: struct.Struct = struct.Struct(structFormat)
+
+    def read(self, target, filereader: BinaryFileReader):
+        """Unpacks every field in the run and assigns the attributes"""
+        values = filereader.read_struct(self.struct)
+        for name, valueIndex, count in self.assignments:
+            if count == 0:
+                setattr(target, name, values[valueIndex])
+            else:
+                setattr(target, name, list(values[valueIndex:valueIndex + count]))
+
+def compile_schema_steps(fields: List[Any]) -> List[Any]:
+    """Merges consecutive fixed size fields into SchemaFieldRuns. Returns a list of steps, which all provide a read method"""
+    steps: List[Any] = []
+    pendingFixedFields: List[SchemaField] = []
+    for field in fields:
+        if isinstance(field, SchemaField) and field.is_fixed_size():
+            pendingFixedFields.append(field)
+            continue
+        if pendingFixedFields:
+            steps.append(SchemaFieldRun(pendingFixedFields))
+            pendingFixedFields = []
+        steps.append(field)
+    if pendingFixedFields:
+        steps.append(SchemaFieldRun(pendingFixedFields))
+    return steps
+
+def collect_field_names(fields: List[Any]) -> List[str]:
+    """Returns the name of every attribute that may be assigned by fields, including those in branches"""
+    names: List[str] = []
+    for field in fields:
+        if isinstance(field, SchemaBranch):
+            fieldNames = collect_field_names(field.fields) + collect_field_names(field.elseFields)
+        else:
+            fieldNames = [field.name]
+        for name in fieldNames:
+            if name not in names:
+                names.append(name)
+    return names
+
+def is_version_string(attributeName: str) -> SchemaCondition:
+    """Creates a condition that checks if a SizedCString attribute that was read contains the string "Version" """
+    def condition(target) -> bool:
+        return getattr(target, attributeName).string == "Version"
+    return condition
+
+class BinaryStructSchema(object):
+    """
+    Describes the layout of a binary data structure as a list of SchemaFields, SchemaAliases and SchemaBranches.
+    Assign to the schema attribute of a BinaryFileDataStructure and it will be read automatically in BinaryFileDataStructure.read
+    """
+    def __init__(self, fields: List[Any]):
+        super(BinaryStructSchema, self).__init__()
+        self.fieldNames: List[str] = collect_field_names(fields)
+        self.steps = compile_schema_steps(fields)
+
+    def read(self, target, filereader: BinaryFileReader):
+        """Reads all fields described by this schema and assigns them as attributes on target"""
+        for step in self.steps:
+            step.read(target, filereader)
@@ -0,0 +1,305 @@
+"""
+Encodes RGBA8 images to BC1 (DXT1) and BC3 (DXT5) block compressed data, for storing in DDS files.
+Images are split into 4x4 blocks which are encoded independently. Identical blocks are only encoded once,
+which is common in game textures with large areas of flat color.
+Format reference: https://docs.microsoft.com/en-us/windows/win32/direct3d10/d3d10-graphics-programming-guide-resources-block-compression
+"""
+import logging
+import struct
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image as PILImage # type: ignore
+
+from FileUtilities.DDSFile import DDSFormat, DDSTexture
+
+log = logging.getLogger(__name__)
+
+# Pixels with alpha below this value are transparent in a BC1 block
+BC1_ALPHA_THRESHOLD = 128
+BC1_TRANSPARENT_INDEX = 3
+
+class BCQuality(object):
+    """Constants for the quality/speed tradeoff when choosing the endpoints of each block"""
+    #Endpoints are the corners of the bounding box of the block colors
+    FAST = 0
+    #Endpoints are chosen along the principal axis of the block colors
+    NORMAL = 1
+    #As NORMAL, then endpoints are refined with a least squares fit to the chosen indices
+    HIGH = 2
+
+ColorList = List[Tuple[int, ...]]
+
+def get_blend_mode_for_alpha_bitdepth(bitDepthAlpha: int) -> str:
+    """Returns the CXP blendMode that best matches an image with the given alpha bit depth, for when no CXP definition is available"""
+    if bitDepthAlpha > 1:
+        return "alphablend"
+    if bitDepthAlpha == 1:
+        return "colorkey"
+    return "opaque"
+
+def select_block_compression_format(blendMode: Optional[str]) -> str:
+    """Returns the block compression format suitable for a CXP blendMode.
+    Alpha blended textures need BC3, while opaque and colorkey textures only need the 1 bit alpha of BC1"""
+    if blendMode == "alphablend":
+        return DDSFormat.BC3
+    return DDSFormat.BC1
+
+def pack_565(color: Sequence[int]) -> int:
+    """Quantizes an 8 bit per channel RGB color to a 16 bit 565 color"""
+    return (((color[0] * 31 + 127) // 255) << 11) | (((color[1] * 63 + 127) // 255) << 5) | ((color[2] * 31 + 127) // 255)
+
+def unpack_565(color: int) -> Tuple[int, int, int]:
+    """Expands a 16 bit 565 color to 8 bits per channel, replicating the high bits into the low bits as decoders do"""
+    red = (color >> 11) & 0x1F
+    green = (color >> 5) & 0x3F
+    blue = color & 0x1F
+    return ((red << 3) | (red >> 2), (green << 2) | (green >> 4), (blue << 3) | (blue >> 2))
+
+def get_bc1_palette(color0: int, color1: int, fourColorMode: bool) -> ColorList:
+    """Returns the colors that indices in a BC1 block refer to"""
+    c0 = unpack_565(color0)
+    c1 = unpack_565(color1)
+    if fourColorMode:
+        return [c0, c1,
+                tuple((2 * x + y) // 3 for x, y in zip(c0, c1)),
+                tuple((x + 2 * y) // 3 for x, y in zip(c0, c1))]
+    return [c0, c1, tuple((x + y) // 2 for x, y in zip(c0, c1))]
+
+def get_color_distance(colorA: Sequence[int], colorB: Sequence[int]) -> int:
+    """Returns the squared distance between 2 RGB colors"""
+    dR = colorA[0] - colorB[0]
+    dG = colorA[1] - colorB[1]
+    dB = colorA[2] - colorB[2]
+    return dR * dR + dG * dG + dB * dB
+
+def choose_palette_indices(colors: ColorList, palette: ColorList) -> Tuple[List[int], int]:
+    """Returns the index of the nearest palette entry for each color, and the total squared error"""
+    indices = []
+    totalError = 0
+    for color in colors:
+        distances = [get_color_distance(color, paletteColor) for paletteColor in palette]
+        bestError = min(distances)
+        indices.append(distances.index(bestError))
+        totalError += bestError
+    return indices, totalError
+
+def find_bounding_box_endpoints(colors: ColorList) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Returns the corners of the bounding box of colors, inset slightly to reduce the error of the interpolated colors"""
+    minimum = [min(channel) for channel in zip(*colors)]
+    maximum = [max(channel) for channel in zip(*colors)]
+    inset = [(high - low) >> 4 for low, high in zip(minimum, maximum)]
+    # The bounding box diagonal only fits colors where red and blue rise with green, so flip a channel if it falls instead
+    meanGreen = sum(color[1] for color in colors) / len(colors)
+    for channel in (0, 2):
+        meanChannel = sum(color[channel] for color in colors) / len(colors)
+        covariance = sum((color[channel] - meanChannel) * (color[1] - meanGreen) for color in colors)
+        if covariance < 0:
+            minimum[channel], maximum[channel] = maximum[channel], minimum[channel]
+            inset[channel] = -inset[channel]
+    start = tuple(high - offset for high, offset in zip(maximum, inset))
+    end = tuple(low + offset for low, offset in zip(minimum, inset))
+    return start, end
+
+def find_principal_axis_endpoints(colors: ColorList) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Returns the 2 colors at the extremes of colors projected onto their principal axis, found with power iteration on the covariance matrix"""
+    count = len(colors)
+    mean = [sum(channel) / count for channel in zip(*colors)]
+    centered = [(color[0] - mean[0], color[1] - mean[1], color[2] - mean[2]) for color in colors]
+    covariance = [[sum(color[i] * color[j] for color in centered) for j in range(3)] for i in range(3)]
+
+    axis = [max(channel) - min(channel) for channel in zip(*colors)]
+    for _ in range(4):
+        axis = [sum(covariance[i][j] * axis[j] for j in range(3)) for i in range(3)]
+        length = max(abs(x) for x in axis)
+        if length == 0:
+            break
+        axis = [x / length for x in axis]
+
+    axisLength2 = sum(a * a for a in axis)
+    if axisLength2 == 0:
+        return colors[0], colors[0]
+    projections = [sum(c * a for c, a in zip(color, axis)) / axisLength2 for color in centered]
+    # Inset the extremes slightly, as with the bounding box, since interpolated colors are more likely to be near the middle
+    maxProjection = max(projections)
+    minProjection = min(projections)
+    inset = (maxProjection - minProjection) / 16
+    start = tuple(min(max(int(round(m + a * (maxProjection - inset))), 0), 255) for m, a in zip(mean, axis))
+    end = tuple(min(max(int(round(m + a * (minProjection + inset))), 0), 255) for m, a in zip(mean, axis))
+    return start, end
+
+def refine_endpoints(colors: ColorList, indices: List[int], fourColorMode: bool) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """Returns the endpoints that minimise the error of colors for the given indices using least squares, or None if they can't be solved"""
+    if fourColorMode:
+        weights: Tuple[float, ...] = (1.0, 0.0, 2.0 / 3.0, 1.0 / 3.0)
+    else:
+        weights = (1.0, 0.0, 0.5)
+    alpha2Sum = beta2Sum = alphaBetaSum = 0.0
+    alphaX = [0.0, 0.0, 0.0]
+    betaX = [0.0, 0.0, 0.0]
+    for color, index in zip(colors, indices):
+        if index >= len(weights):
+            continue
+        alpha = weights[index]
+        beta = 1.0 - alpha
+        alpha2Sum += alpha * alpha
+        beta2Sum += beta * beta
+        alphaBetaSum += alpha * beta
+        for channel in range(3):
+            alphaX[channel] += alpha * color[channel]
+            betaX[channel] += beta * color[channel]
+    denominator = alpha2Sum * beta2Sum - alphaBetaSum * alphaBetaSum
+    if abs(denominator) < 1e-6:
+        return None
+    start = tuple(min(max(int(round((alphaX[c] * beta2Sum - betaX[c] * alphaBetaSum) / denominator)), 0), 255) for c in range(3))
+    end = tuple(min(max(int(round((betaX[c] * alpha2Sum - alphaX[c] * alphaBetaSum) / denominator)), 0), 255) for c in range(3))
+    return start, end
+
+def encode_bc1_endpoints(colors: ColorList, start: Sequence[int], end: Sequence[int], fourColorMode: bool) -> Tuple[int, int, List[int], int]:
+    """Quantizes endpoints to 565 and chooses indices for colors.
+    Returns both endpoints, ordered so decoders use the intended mode, the indices and the total squared error"""
+    color0 = pack_565(start)
+    color1 = pack_565(end)
+    # Decoders use 4 color mode when color0 > color1, otherwise 3 color mode with a transparent index
+    if (color0 < color1) == fourColorMode:
+        color0, color1 = color1, color0
+    if color0 == color1 and fourColorMode:
+        # Both endpoints are the same, so every pixel can use index 0 in either mode
+        palette = get_bc1_palette(color0, color1, False)[:1]
+    else:
+        palette = get_bc1_palette(color0, color1, fourColorMode)
+    indices, totalError = choose_palette_indices(colors, palette)
+    return color0, color1, indices, totalError
+
+def encode_bc1_color_block(block: bytes, quality: int, allowTransparency: bool) -> bytes:
+    """Encodes the color of a 4x4 block of RGBA8 pixels to 8 bytes of BC1 data.
+    If allowTransparency is set, pixels with alpha below BC1_ALPHA_THRESHOLD are stored as transparent"""
+    pixels = list(zip(block[0::4], block[1::4], block[2::4]))
+    transparent = [False] * 16
+    if allowTransparency:
+        transparent = [alpha < BC1_ALPHA_THRESHOLD for alpha in block[3::4]]
+    fourColorMode = not any(transparent)
+
+    colors: ColorList = [pixel for pixel, isTransparent in zip(pixels, transparent) if not isTransparent]
+    if not colors:
+        return struct.pack("<HHI", 0, 0, 0xFFFFFFFF)
+
+    if quality == BCQuality.FAST:
+        start, end = find_bounding_box_endpoints(colors)
+    else:
+        start, end = find_principal_axis_endpoints(colors)
+    color0, color1, indices, totalError = encode_bc1_endpoints(colors, start, end, fourColorMode)
+
+    if quality >= BCQuality.HIGH and totalError > 0:
+        for _ in range(2):
+            refined = refine_endpoints(colors, indices, fourColorMode)
+            if refined is None:
+                break
+            candidate = encode_bc1_endpoints(colors, refined[0], refined[1], fourColorMode)
+            if candidate[3] >= totalError:
+                break
+            color0, color1, indices, totalError = candidate
+
+    # Indices were chosen for opaque colors only, so place them back amongst the transparent pixels
+    packedIndices = 0
+    opaqueIndices = iter(indices)
+    for pixelIndex, isTransparent in enumerate(transparent):
+        index = BC1_TRANSPARENT_INDEX if isTransparent else next(opaqueIndices)
+        packedIndices |= index << (pixelIndex * 2)
+    return struct.pack("<HHI", color0, color1, packedIndices)
+
+def get_bc3_alpha_palette(alpha0: int, alpha1: int) -> List[int]:
+    """Returns the alpha values that indices in a BC3 alpha block refer to"""
+    if alpha0 > alpha1:
+        return [alpha0, alpha1] + [((8 - i) * alpha0 + (i - 1) * alpha1) // 7 for i in range(2, 8)]
+    return [alpha0, alpha1] + [((6 - i) * alpha0 + (i - 1) * alpha1) // 5 for i in range(2, 6)] + [0, 255]
+
+def choose_alpha_indices(alphas: Sequence[int], palette: List[int]) -> Tuple[List[int], int]:
+    """Returns the index of the nearest palette entry for each alpha value, and the total squared error"""
+    indices = []
+    totalError = 0
+    for alpha in alphas:
+        distances = [(alpha - paletteAlpha) * (alpha - paletteAlpha) for paletteAlpha in palette]
+        bestError = min(distances)
+        indices.append(distances.index(bestError))
+        totalError += bestError
+    return indices, totalError
+
+def encode_bc3_alpha_block(block: bytes, quality: int) -> bytes:
+    """Encodes the alpha of a 4x4 block of RGBA8 pixels to 8 bytes of BC3 alpha data"""
+    alphas = block[3::4]
+    minimum = min(alphas)
+    maximum = max(alphas)
+    if minimum == maximum:
+        return bytes((maximum, minimum)) + bytes(6)
+
+    # 8 alpha mode interpolates evenly between the extremes
+    alpha0, alpha1 = maximum, minimum
+    indices, totalError = choose_alpha_indices(alphas, get_bc3_alpha_palette(alpha0, alpha1))
+
+    # 6 alpha mode has exact 0 and 255 entries, which can be better for blocks that mix fully transparent or opaque pixels with soft edges
+    if quality >= BCQuality.HIGH and (minimum == 0 or maximum == 255):
+        innerAlphas = [alpha for alpha in alphas if alpha not in (0, 255)]
+        if innerAlphas:
+            innerAlpha0, innerAlpha1 = min(innerAlphas), max(innerAlphas)
+        else:
+            innerAlpha0, innerAlpha1 = 0, 255
+        innerIndices, innerError = choose_alpha_indices(alphas, get_bc3_alpha_palette(innerAlpha0, innerAlpha1))
+        if innerError < totalError:
+            alpha0, alpha1, indices = innerAlpha0, innerAlpha1, innerIndices
+
+    packedIndices = 0
+    for pixelIndex, index in enumerate(indices):
+        packedIndices |= index << (pixelIndex * 3)
+    return bytes((alpha0, alpha1)) + packedIndices.to_bytes(6, "little")
+
+def encode_block(block: bytes, ddsFormat: str, quality: int) -> bytes:
+    """Encodes a 4x4 block of RGBA8 pixels, stored row by row, in the given block compression format"""
+    if ddsFormat == DDSFormat.BC3:
+        return encode_bc3_alpha_block(block, quality) + encode_bc1_color_block(block, quality, False)
+    return encode_bc1_color_block(block, quality, True)
+
+def compress_rgba8(imageData: bytes, width: int, height: int, ddsFormat: str, quality: int = BCQuality.NORMAL) -> bytes:
+    """Compresses an RGBA8 image to BC1 or BC3 data. Images with dimensions that aren't a multiple of 4 are padded by repeating the edge pixels"""
+    if ddsFormat not in (DDSFormat.BC1, DDSFormat.BC3):
+        raise ValueError("Unsupported block compression format: " + str(ddsFormat))
+
+    stride = width * 4
+    encodedBlocks: Dict[bytes, bytes] = {}
+    output = bytearray()
+    for blockY in range(0, height, 4):
+        rows = [imageData[y * stride:(y + 1) * stride] for y in range(blockY, min(blockY + 4, height))]
+        while len(rows) < 4:
+            rows.append(rows[-1])
+        for blockX in range(0, stride, 16):
+            blockRows = []
+            for row in rows:
+                blockRow = row[blockX:blockX + 16]
+                if len(blockRow) < 16:
+                    blockRow = blockRow + blockRow[-4:] * ((16 - len(blockRow)) // 4)
+                blockRows.append(blockRow)
+            block = b"".join(blockRows)
+
+            encodedBlock = encodedBlocks.get(block)
+            if encodedBlock is None:
+                encodedBlock = encode_block(block, ddsFormat, quality)
+                encodedBlocks[block] = encodedBlock
+            output += encodedBlock
+    return bytes(output)
+
+def compress_image(image: PILImage.Image, ddsFormat: str, quality: int = BCQuality.NORMAL) -> bytes:
+    """Compresses a PIL Image to BC1 or BC3 data"""
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return compress_rgba8(image.tobytes(), image.size[0], image.size[1], ddsFormat, quality)
+
+BC_QUALITY_NAMES = {
+    "fast": BCQuality.FAST,
+    "normal": BCQuality.NORMAL,
+    "high": BCQuality.HIGH
+}
+
+def compress_mip_chain(mips: List[PILImage.Image], ddsFormat: str, quality: int = BCQuality.NORMAL) -> DDSTexture:
+    """Compresses every level of a mip chain, such as one returned by MipMapGenerator.generate_mip_maps, into a DDSTexture"""
+    width, height = mips[0].size
+    return DDSTexture(width, height, ddsFormat, [compress_image(mip, ddsFormat, quality) for mip in mips])
@@ -0,0 +1,57 @@
+"""
+Resolves where converted and cached outputs for game files are stored.
+By default outputs are written beside their source file. When a cache root is set, they are written to
+sharded subdirectories of the cache root instead, so read-only installs can be converted and the game data
+tree stays free of generated files.
+Writes go to a temporary file which is then renamed, so an interrupted conversion never leaves a partial file.
+"""
+import hashlib
+import logging
+import os
+import uuid
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+# Number of hex digits of the path hash used to name the subdirectory, so each holds a manageable number of files
+CACHE_SHARD_LENGTH = 2
+
+CACHE_ROOT: Optional[str] = None
+
+def set_cache_root(cacheRoot: Optional[str]):
+    """Sets the directory all cached outputs are written to. Passing None stores outputs beside their source files"""
+    global CACHE_ROOT # pylint: disable=W0603
+    CACHE_ROOT = cacheRoot
+
+def get_cache_root() -> Optional[str]:
+    """Returns the directory cached outputs are written to, or None if they are written beside their source files"""
+    return CACHE_ROOT
+
+def get_cache_path(sourcePath: str, suffix: str) -> str:
+    """Returns where the output with suffix for the file at sourcePath is stored.
+    Within the cache root, the file is named after a hash of the source path so files with the same name in different folders don't collide,
+    followed by the source filename to make it easy to identify"""
+    if CACHE_ROOT is None:
+        return sourcePath + suffix
+    normalizedPath = os.path.normcase(os.path.abspath(sourcePath))
+    pathHash = hashlib.sha1(normalizedPath.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_ROOT, pathHash[:CACHE_SHARD_LENGTH], pathHash[CACHE_SHARD_LENGTH:] + "_" + os.path.basename(sourcePath) + suffix)
+
+@contextmanager
+def atomic_write_path(path: str) -> Iterator[str]:
+    """Yields a temporary path to write to, which replaces path once the block completes without an exception.
+    Missing directories are created. Writers that detect the format from the extension need the format passing explicitly"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # The temporary file is left for the writer to create, so it gets the same permissions as any other new file
+    tempPath = "%s.%s.tmp" % (path, uuid.uuid4().hex[:8])
+    try:
+        yield tempPath
+        os.replace(tempPath, path)
+    except BaseException:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
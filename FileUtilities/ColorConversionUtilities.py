@@ -6,8 +6,7 @@ import functools
 from typing import List, Tuple, Dict
 from math import floor
 
-#Provides a lookup table for every color in each color format.
-COLOR_LOOKUPS: Dict[str, List[int]] = {}
+from FileUtilities.BinaryConversionUtilities import BytesLike
 
 #Stores a lookup list for every bitdepth
 BITDEPTH_VALUE_LOOKUPS: Dict[int, List[int]] = {}
@@ -18,19 +17,82 @@ class ColorFormats(object):
     CF_ARGB_0565 = "ARGB0565"
     CF_UNKNOWN = "UNKNOWN"
 
-def get_color_format(bdR, bdG, bdB, bdA):
-    """ Determines the color format, which can be used for color lookup tables """
-    if bdR == 4 and bdG == 4 and bdB == 4 and bdA == 4:
-        return ColorFormats.CF_ARGB_4444
-
-    if bdR == 5 and bdG == 6 and bdB == 5 and bdA == 0:
-        return ColorFormats.CF_ARGB_0565
+#Channels wider than this can't be stored in the 8 bit output, and aren't used by any known files
+MAX_CHANNEL_BITDEPTH = 8
 
-    return ColorFormats.CF_UNKNOWN
+def get_color_format(bdR, bdG, bdB, bdA):
+    """ Determines the color format of a set of bit depths
+    Formats are named ARGB followed by the bit depth of each channel, such as ARGB1555 """
+    bitdepths = (bdA, bdR, bdG, bdB)
+    if any(bitdepth < 0 or bitdepth > MAX_CHANNEL_BITDEPTH for bitdepth in bitdepths) or sum(bitdepths) == 0 or sum(bitdepths) > 32:
+        return ColorFormats.CF_UNKNOWN
+    return "ARGB" + "".join(str(bitdepth) for bitdepth in bitdepths)
+
+def get_bytes_per_color(bdR: int, bdG: int, bdB: int, bdA: int) -> int:
+    """Returns how many bytes each color uses with the given bit depths"""
+    return (bdR + bdG + bdB + bdA + 7) // 8
+
+def get_bitdepth_lookup(bitdepth: int) -> List[int]:
+    """Returns the table mapping a quantized value to a 0-255 value for a given bitdepth, calculating it if needed"""
+    if bitdepth not in BITDEPTH_VALUE_LOOKUPS:
+        calculate_bitdepth_lookup(bitdepth)
+    return BITDEPTH_VALUE_LOOKUPS[bitdepth]
 
-def get_color_lookup_table(color_format):
-    """Returns the lookup table for a given color format"""
-    return COLOR_LOOKUPS[color_format]
+@functools.lru_cache(maxsize=None)
+def get_channel_decode_tables(shift: int, bitdepth: int, bytesPerColor: int) -> Tuple[Tuple[Tuple[int, bytes], ...], bytes]:
+    """Builds the translation tables used to extract a channel stored in bitdepth bits starting at shift, from colors split into byte planes.
+    Returns a table for each byte plane the channel is stored in, and a table converting the combined value to 0-255.
+    When the channel is stored in a single byte, that byte's table converts straight to 0-255, and the second table isn't needed"""
+    if bitdepth > MAX_CHANNEL_BITDEPTH:
+        raise ValueError("Channels wider than " + str(MAX_CHANNEL_BITDEPTH) + " bits are not supported")
+    channelMask = ((1 << bitdepth) - 1) << shift
+    valueLookup = get_bitdepth_lookup(bitdepth)
+    planeLookups = []
+    for planeIndex in range(bytesPerColor):
+        planeShift = planeIndex * 8
+        if channelMask & (0xFF << planeShift) != 0:
+            planeLookups.append((planeIndex, [((byteValue << planeShift) & channelMask) >> shift for byteValue in range(256)]))
+
+    valueTable = bytes(valueLookup).ljust(256, b"\0")
+    if len(planeLookups) == 1:
+        planeIndex, planeLookup = planeLookups[0]
+        return (((planeIndex, bytes(valueLookup[value] for value in planeLookup)),), valueTable)
+    return (tuple((planeIndex, bytes(planeLookup)) for planeIndex, planeLookup in planeLookups), valueTable)
+
+def decode_bitmask_channel(planes: List[bytes], shift: int, bitdepth: int) -> bytes:
+    """Extracts one color channel from colors split into byte planes, where planes[0] holds the least significant byte of every color.
+    The channel is stored in bitdepth bits starting at shift, and is returned as one 0-255 value per color"""
+    planeTables, valueTable = get_channel_decode_tables(shift, bitdepth, len(planes))
+
+    if len(planeTables) == 1:
+        planeIndex, planeTable = planeTables[0]
+        return planes[planeIndex].translate(planeTable)
+
+    # The bits each plane contributes don't overlap, so adding the planes as large integers combines them without carrying between colors
+    combinedValue = 0
+    for planeIndex, planeTable in planeTables:
+        combinedValue += int.from_bytes(planes[planeIndex].translate(planeTable), "little")
+    combined = combinedValue.to_bytes(len(planes[0]), "little")
+    return combined.translate(valueTable)
+
+def decode_bitmask_ARGB_colors(data: BytesLike, bdR: int, bdG: int, bdB: int, bdA: int, channels: int = 4) -> bytearray:
+    """Converts a buffer of little-endian ARGB colors, with custom bit depths for each channel, into 8 bit per channel RGBA data.
+    Each color uses as many whole bytes as its bit depths need, so this handles layouts such as 1555, 565, 888 and 8888.
+    The output contains the first channels channels in RGBA order, so 3 produces RGB data. Gives the same values as read_bitmask_ARGB_color
+    The output is decoded into a single buffer, which is returned without copying"""
+    bytesPerColor = get_bytes_per_color(bdR, bdG, bdB, bdA)
+    planes = [bytes(data[planeIndex::bytesPerColor]) for planeIndex in range(bytesPerColor)]
+    colorCount = len(planes[0])
+    channelLayout = [(bdG + bdB, bdR), (bdB, bdG), (0, bdB), (bdR + bdG + bdB, bdA)]
+
+    imageData = bytearray(colorCount * channels)
+    for channelIndex, (shift, bitdepth) in enumerate(channelLayout[:channels]):
+        if bitdepth == 0:
+            # An image without alpha bits is fully opaque, as in read_bitmask_ARGB_color
+            imageData[channelIndex::channels] = bytes([255]) * colorCount
+        else:
+            imageData[channelIndex::channels] = decode_bitmask_channel(planes, shift, bitdepth)
+    return imageData
 
 def calculate_bitdepth_lookup(bitdepth):
     """Calculates a lookup table mapping a quantized value to an appropriate 0-255 value for a given bitdepth"""
@@ -49,63 +111,6 @@ def build_bitdepth_lookups():
     calculate_bitdepth_lookup(5)
     calculate_bitdepth_lookup(6)
 
-def build_4444_color_lookup():
-    """Build the lookup table for the ARGB_4444 color format"""
-    bdR = 4
-    bdG = 4
-    bdB = 4
-    alphaColorOffset = bdR + bdG + bdB
-    redColorOffset = bdG + bdB
-    greenColorOffset = bdB
-    val_lookup_4 = BITDEPTH_VALUE_LOOKUPS[4]
-
-    conversion_table = [None] * 65536
-
-    for a_short, a_value in enumerate(val_lookup_4):
-        a_offset = a_short << alphaColorOffset
-        for r_short, r_value in enumerate(val_lookup_4):
-            r_offset = r_short << redColorOffset
-            ar_offset = a_offset | r_offset
-            for g_short, g_value in enumerate(val_lookup_4):
-                g_offset = g_short << greenColorOffset
-                arg_offset = ar_offset | g_offset
-                for b_short, b_value in enumerate(val_lookup_4):
-                    final_color_code = arg_offset | b_short
-                    final_color_tuple = (r_value, g_value, b_value, a_value)
-                    conversion_table[final_color_code] = final_color_tuple
-
-    return conversion_table
-
-def build_0565_color_lookup():
-    """Build the lookup table for the ARGB_0565 color format"""
-    bdG = 6
-    bdB = 5
-    redColorOffset = bdG + bdB
-    greenColorOffset = bdB
-    val_lookup_5 = BITDEPTH_VALUE_LOOKUPS[5]
-    val_lookup_6 = BITDEPTH_VALUE_LOOKUPS[6]
-
-    conversion_table = [None] * 65536
-
-    for r_short, r_value in enumerate(val_lookup_5):
-        r_offset = r_short << redColorOffset
-        for g_short, g_value in enumerate(val_lookup_6):
-            g_offset = g_short << greenColorOffset
-            rg_offset = r_offset | g_offset
-            for b_short, b_value in enumerate(val_lookup_5):
-                final_color_code = rg_offset | b_short
-                final_color_tuple = (r_value, g_value, b_value, 255)
-                conversion_table[final_color_code] = final_color_tuple
-
-    return conversion_table
-
-
-def build_color_lookups():
-    """Builds the lookup tables for each color format"""
-    build_bitdepth_lookups()
-    COLOR_LOOKUPS[ColorFormats.CF_ARGB_4444] = build_4444_color_lookup()
-    COLOR_LOOKUPS[ColorFormats.CF_ARGB_0565] = build_0565_color_lookup()
-
 @functools.lru_cache(maxsize=8)
 def calc_bitmasks_ARGB_color(bdR: int, bdG: int, bdB: int, bdA: int):
     """Calculates the appropriate bitmasks for a color stored in ARGB format."""
@@ -175,6 +180,3 @@ def read_bitmask_ARGB_color(colorVal: int, bdR: int, bdG: int, bdB: int, bdA: in
     blueColor = int(floor(blueColor))
 
     return (redColor, greenColor, blueColor, alphaColor)
-
-if len(COLOR_LOOKUPS.keys()) == 0:
-    build_color_lookups()
@@ -0,0 +1,118 @@
+"""
+Provides content hashing of files so byte-identical files under different paths are only processed once.
+Games and mods ship many identical copies of the same texture, so the first copy of each is processed and
+the outputs of the rest are linked to it. A manifest records which file each duplicate was taken from.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from FileUtilities.CacheDirectory import atomic_write_path
+from FileUtilities.FileOffsetIndex import get_file_key
+
+log = logging.getLogger(__name__)
+
+# Increase when the format of saved manifests changes, so old manifests are rebuilt
+CONTENT_MANIFEST_VERSION = 1
+CONTENT_HASH_BLOCK_SIZE = 1024 * 1024
+
+def get_content_hash(filepath: str) -> str:
+    """Returns a hash of the contents of a file"""
+    contentHash = hashlib.sha1()
+    with open(filepath, "rb") as hashFile:
+        block = hashFile.read(CONTENT_HASH_BLOCK_SIZE)
+        while block:
+            contentHash.update(block)
+            block = hashFile.read(CONTENT_HASH_BLOCK_SIZE)
+    return contentHash.hexdigest()
+
+def link_file(sourcePath: str, linkPath: str):
+    """Makes linkPath refer to the same contents as sourcePath, using a hard link where possible and a copy otherwise"""
+    if os.path.abspath(sourcePath) == os.path.abspath(linkPath):
+        return
+    with atomic_write_path(linkPath) as tempPath:
+        try:
+            os.link(sourcePath, tempPath)
+        except OSError:
+            shutil.copyfile(sourcePath, tempPath)
+
+class ContentManifest(object):
+    """Records the content hash of files, and the first file processed with each hash.
+    Hashes are reused while the size and modification time of a file are unchanged"""
+    def __init__(self):
+        super(ContentManifest, self).__init__()
+        #path -> (content hash, size, modified time)
+        self.fileHashes: Dict[str, Tuple[str, int, int]] = {}
+        #content key -> first path added with that key
+        self.canonicalPaths: Dict[str, str] = OrderedDict()
+        #duplicate path -> path it duplicates
+        self.duplicates: Dict[str, str] = OrderedDict()
+
+    def get_hash(self, filepath: str) -> str:
+        """Returns the content hash of a file, hashing it only if it has changed since it was last hashed"""
+        fileSize, fileModifiedTime = get_file_key(filepath)
+        cachedHash = self.fileHashes.get(filepath)
+        if cachedHash is not None and cachedHash[1:] == (fileSize, fileModifiedTime):
+            return cachedHash[0]
+        contentHash = get_content_hash(filepath)
+        self.fileHashes[filepath] = (contentHash, fileSize, fileModifiedTime)
+        return contentHash
+
+    def add_file(self, filepath: str, conversionKey: str = "") -> Optional[str]:
+        """Adds a file to the manifest. conversionKey should describe any settings that change the output for the same contents.
+        Returns the path of an earlier file with the same contents and conversionKey, or None if this is the first"""
+        contentKey = self.get_hash(filepath) + conversionKey
+        canonicalPath = self.canonicalPaths.get(contentKey)
+        if canonicalPath is None or canonicalPath == filepath:
+            self.canonicalPaths[contentKey] = filepath
+            self.duplicates.pop(filepath, None)
+            return None
+        self.duplicates[filepath] = canonicalPath
+        return canonicalPath
+
+    def split_unique_files(self, filepaths: List[str]) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """Adds every file to the manifest. Returns the files with unique contents, and a (canonical, duplicate) pair for every other file"""
+        uniqueFiles = []
+        duplicateFiles = []
+        for filepath in filepaths:
+            canonicalPath = self.add_file(filepath)
+            if canonicalPath is None:
+                uniqueFiles.append(filepath)
+            else:
+                duplicateFiles.append((canonicalPath, filepath))
+        return uniqueFiles, duplicateFiles
+
+    def save(self, manifestPath: str):
+        """Writes this manifest to a JSON file. Failures are logged, as a manifest can always be rebuilt"""
+        manifestData = {
+            "version": CONTENT_MANIFEST_VERSION,
+            "files": [[filepath, contentHash, fileSize, fileModifiedTime] for filepath, (contentHash, fileSize, fileModifiedTime) in self.fileHashes.items()],
+            "duplicates": [[filepath, canonicalPath] for filepath, canonicalPath in self.duplicates.items()]
+        }
+        try:
+            with atomic_write_path(manifestPath) as tempPath:
+                with open(tempPath, "w") as manifestFile:
+                    json.dump(manifestData, manifestFile, indent=1)
+        except OSError as error:
+            log.warning("Unable to save content manifest %s: %s", manifestPath, error)
+
+    @staticmethod
+    def load(manifestPath: str) -> "ContentManifest":
+        """Loads the file hashes from a JSON manifest, so unchanged files don't need to be hashed again.
+        Returns an empty manifest if the file doesn't exist or can't be used"""
+        manifest = ContentManifest()
+        try:
+            with open(manifestPath, "r") as manifestFile:
+                manifestData = json.load(manifestFile)
+        except (OSError, ValueError):
+            return manifest
+        if manifestData.get("version") != CONTENT_MANIFEST_VERSION:
+            return manifest
+        for filepath, contentHash, fileSize, fileModifiedTime in manifestData["files"]:
+            manifest.fileHashes[filepath] = (contentHash, fileSize, fileModifiedTime)
+        return manifest
@@ -0,0 +1,198 @@
+"""
+Reads and writes DirectDraw Surface (DDS) texture containers.
+A DDS file stores every level of a mip chain back to back, so a pre-converted texture can be uploaded
+by an engine with a single read, without decompressing or resampling at load time.
+Format reference: https://docs.microsoft.com/en-us/windows/win32/direct3ddds/dds-header
+"""
+import logging
+import struct
+
+from typing import List, Optional, Tuple
+
+from PIL import Image as PILImage # type: ignore
+
+from FileUtilities.CacheDirectory import atomic_write_path
+
+log = logging.getLogger(__name__)
+
+DDS_MAGIC = b"DDS "
+DDS_HEADER_SIZE = 124
+DDS_PIXELFORMAT_SIZE = 32
+# Magic, then the header fields up to the pixel format, the pixel format, then the caps
+DDS_HEADER_STRUCT = struct.Struct("<4s7I44x2I4s5I4I4x")
+
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+
+class DDSFormat(object):
+    """Constants for the pixel formats that can be stored in a DDS file"""
+    #32 bits per pixel, bytes ordered R, G, B, A. Matches PIL's RGBA raw mode and PF_R8G8B8A8
+    RGBA8 = "RGBA8"
+    #4 bits per pixel block compression with 1 bit alpha
+    BC1 = "BC1"
+    #8 bits per pixel block compression with interpolated alpha
+    BC3 = "BC3"
+
+DDS_FOURCC_FORMATS = {
+    DDSFormat.BC1: b"DXT1",
+    DDSFormat.BC3: b"DXT5"
+}
+
+DDS_BLOCK_SIZES = {
+    DDSFormat.BC1: 8,
+    DDSFormat.BC3: 16
+}
+
+# Channel masks for RGBA8, in the order R, G, B, A
+DDS_RGBA8_MASKS = (0x000000FF, 0x0000FF00, 0x00FF0000, 0xFF000000)
+
+def calculate_mip_level_size(width: int, height: int, ddsFormat: str) -> int:
+    """Returns the number of bytes a single mip level of the given dimensions takes up"""
+    if ddsFormat in DDS_BLOCK_SIZES:
+        blocksWide = max(1, (width + 3) // 4)
+        blocksHigh = max(1, (height + 3) // 4)
+        return blocksWide * blocksHigh * DDS_BLOCK_SIZES[ddsFormat]
+    return width * height * 4
+
+def get_mip_level_dimensions(width: int, height: int, mipCount: int) -> List[Tuple[int, int]]:
+    """Returns the dimensions of each level in a mip chain, halving each dimension per level down to a minimum of 1"""
+    dimensions = []
+    for _ in range(mipCount):
+        dimensions.append((width, height))
+        width = max(width // 2, 1)
+        height = max(height // 2, 1)
+    return dimensions
+
+class DDSTexture(object):
+    """A texture with a mip chain, where each level is stored as raw bytes in the given format"""
+    def __init__(self, width: int = 0, height: int = 0, ddsFormat: str = DDSFormat.RGBA8, levels: Optional[List[bytes]] = None):
+        super(DDSTexture, self).__init__()
+        self.width: int = width
+        self.height: int = height
+        self.format: str = ddsFormat
+        self.levels: List[bytes] = levels if levels is not None else []
+
+    def get_level_dimensions(self) -> List[Tuple[int, int]]:
+        """Returns the dimensions of each level stored in this texture"""
+        return get_mip_level_dimensions(self.width, self.height, len(self.levels))
+
+    def to_pil_images(self) -> List[PILImage.Image]:
+        """Decodes every level into an RGBA PIL Image"""
+        images = []
+        for (width, height), levelData in zip(self.get_level_dimensions(), self.levels):
+            if self.format == DDSFormat.RGBA8:
+                images.append(PILImage.frombytes("RGBA", (width, height), levelData))
+            else:
+                images.append(PILImage.frombytes("RGBA", (width, height), levelData, "bcn", int(self.format[2:])))
+        return images
+
+    def pack_header(self) -> bytes:
+        """Returns the magic number and header describing this texture"""
+        flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT
+        caps = DDSCAPS_TEXTURE
+        if len(self.levels) > 1:
+            flags |= DDSD_MIPMAPCOUNT
+            caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+
+        if self.format in DDS_FOURCC_FORMATS:
+            flags |= DDSD_LINEARSIZE
+            pitchOrLinearSize = calculate_mip_level_size(self.width, self.height, self.format)
+            pixelFormatFlags = DDPF_FOURCC
+            fourCC = DDS_FOURCC_FORMATS[self.format]
+            bitCount = 0
+            masks: Tuple[int, ...] = (0, 0, 0, 0)
+        else:
+            flags |= DDSD_PITCH
+            pitchOrLinearSize = self.width * 4
+            pixelFormatFlags = DDPF_RGB | DDPF_ALPHAPIXELS
+            fourCC = b"\0\0\0\0"
+            bitCount = 32
+            masks = DDS_RGBA8_MASKS
+
+        return DDS_HEADER_STRUCT.pack(DDS_MAGIC, DDS_HEADER_SIZE, flags, self.height, self.width, pitchOrLinearSize, 0, len(self.levels),
+                                      DDS_PIXELFORMAT_SIZE, pixelFormatFlags, fourCC, bitCount, masks[0], masks[1], masks[2], masks[3],
+                                      caps, 0, 0, 0)
+
+    def write_file(self, filepath: str):
+        """Writes this texture to a DDS file"""
+        with atomic_write_path(filepath) as tempPath:
+            with open(tempPath, "wb") as ddsFile:
+                ddsFile.write(self.pack_header())
+                for levelData in self.levels:
+                    ddsFile.write(levelData)
+
+    @staticmethod
+    def from_pil_images(mips: List[PILImage.Image]) -> "DDSTexture":
+        """Creates an RGBA8 texture from a list of mip levels, such as one returned by MipMapGenerator.generate_mip_maps"""
+        width, height = mips[0].size
+        levels = []
+        for (levelWidth, levelHeight), mip in zip(get_mip_level_dimensions(width, height, len(mips)), mips):
+            if mip.size != (levelWidth, levelHeight):
+                raise ValueError("Mip level of size %s does not match expected size %s" % (str(mip.size), str((levelWidth, levelHeight))))
+            if mip.mode != "RGBA":
+                mip = mip.convert("RGBA")
+            levels.append(mip.tobytes())
+        return DDSTexture(width, height, DDSFormat.RGBA8, levels)
+
+def write_dds(filepath: str, mips: List[PILImage.Image]):
+    """Writes a list of mip levels to an uncompressed RGBA8 DDS file"""
+    DDSTexture.from_pil_images(mips).write_file(filepath)
+
+def read_dds(filepath: str) -> Optional[DDSTexture]:
+    """Reads a DDS file written in one of the DDSFormat formats. Returns None if the file can't be read"""
+    with open(filepath, "rb") as ddsFile:
+        data = ddsFile.read()
+
+    if len(data) < DDS_HEADER_STRUCT.size:
+        log.error("DDS file is too small to contain a header: %s", filepath)
+        return None
+
+    fields = DDS_HEADER_STRUCT.unpack_from(data)
+    magic, headerSize, flags, height, width = fields[0:5]
+    mipCount = fields[7]
+    pixelFormatFlags, fourCC, bitCount = fields[9:12]
+    masks = fields[12:16]
+
+    if magic != DDS_MAGIC or headerSize != DDS_HEADER_SIZE:
+        log.error("Not a valid DDS file: %s", filepath)
+        return None
+
+    ddsFormat = None
+    if pixelFormatFlags & DDPF_FOURCC:
+        for knownFormat, knownFourCC in DDS_FOURCC_FORMATS.items():
+            if fourCC == knownFourCC:
+                ddsFormat = knownFormat
+    elif bitCount == 32 and tuple(masks) == DDS_RGBA8_MASKS:
+        ddsFormat = DDSFormat.RGBA8
+    if ddsFormat is None:
+        log.error("Unsupported DDS pixel format in: %s", filepath)
+        return None
+
+    if flags & DDSD_MIPMAPCOUNT == 0:
+        mipCount = 1
+    mipCount = max(mipCount, 1)
+
+    levels = []
+    offset = DDS_HEADER_STRUCT.size
+    for levelWidth, levelHeight in get_mip_level_dimensions(width, height, mipCount):
+        levelSize = calculate_mip_level_size(levelWidth, levelHeight, ddsFormat)
+        if offset + levelSize > len(data):
+            log.error("DDS file is truncated: %s", filepath)
+            return None
+        levels.append(data[offset:offset + levelSize])
+        offset += levelSize
+
+    return DDSTexture(width, height, ddsFormat, levels)
@@ -6,9 +6,11 @@ import random
 import multiprocessing
 import logging
 
-from typing import List, Callable
+from typing import List, Callable, Optional, Tuple
 
 from FileUtilities.DirectoryUtils import gather_files_in_path
+from FileUtilities.ContentManifest import ContentManifest
+from FileUtilities.CacheDirectory import get_cache_root, set_cache_root
 
 log = logging.getLogger(__name__)
 
@@ -25,6 +27,11 @@ class DirectoryProcessor(object):
     fileExt: str = ".none"
     processFunction: Callable = processorNotImplementedDefault
     allFiles: List[str] = []
+    #If set, files with identical contents are only processed once, and this is called with (processedPath, duplicatePath) for every other copy
+    duplicateFunction: Optional[Callable] = None
+    #If set, the content hashes of files are saved here, so unchanged files don't need to be hashed on the next run
+    contentManifestPath: Optional[str] = None
+    duplicateFiles: List[Tuple[str, str]] = []
 
     def gather_all_files(self):
         """Gathers all files ready for processing"""
@@ -33,6 +40,24 @@ class DirectoryProcessor(object):
             newFiles = gather_files_in_path(self.fileExt, path)
             files = files + newFiles
         self.allFiles = files
+        self.duplicateFiles = []
+        if self.duplicateFunction is not None:
+            self.remove_duplicate_files()
+
+    def remove_duplicate_files(self):
+        """Removes files with the same contents as an earlier file from allFiles, storing them in duplicateFiles"""
+        manifest = ContentManifest()
+        if self.contentManifestPath is not None:
+            manifest = ContentManifest.load(self.contentManifestPath)
+        self.allFiles, self.duplicateFiles = manifest.split_unique_files(self.allFiles)
+        if self.contentManifestPath is not None:
+            manifest.save(self.contentManifestPath)
+        log.info("Number of duplicate files skipped: %d", len(self.duplicateFiles))
+
+    def process_duplicate_files(self):
+        """Calls duplicateFunction for every duplicate file, once the files they duplicate have been processed"""
+        for processedPath, duplicatePath in self.duplicateFiles:
+            self.duplicateFunction(processedPath, duplicatePath) # pylint: disable=E1102
 
     def run_async(self):
         """
@@ -51,8 +76,10 @@ class DirectoryProcessor(object):
         log.info("Number of files found to process: %d", len(self.allFiles))
         log.info("Number of workers: %d", numWorkers)
 
-        pool = multiprocessing.Pool(numWorkers)
+        # Worker processes don't always inherit module state, so pass on where outputs should be written
+        pool = multiprocessing.Pool(numWorkers, initializer=set_cache_root, initargs=(get_cache_root(),))
         pool.map(self.processFunction, self.allFiles)
+        self.process_duplicate_files()
 
 
     def run_sequential(self):
@@ -61,6 +88,7 @@ class DirectoryProcessor(object):
         for path in self.allFiles:
             # Pylint disabled error E1121 as it is a false positive
             self.processFunction(path) # pylint: disable=E1121
+        self.process_duplicate_files()
 
     def profileRun(self):
         """Wrapper function called by profile"""
@@ -0,0 +1,107 @@
+"""
+Provides a persistent index of the byte offsets of named structures within a file.
+Indices are stored as small JSON files, either next to the indexed file or in a cache directory,
+and are only considered valid while the size and modification time of the indexed file are unchanged.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from typing import Dict, List, Optional, Tuple
+
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path
+
+log = logging.getLogger(__name__)
+
+# Increase when the format of saved indices changes, so old indices are rebuilt
+FILE_OFFSET_INDEX_VERSION = 1
+FILE_OFFSET_INDEX_SUFFIX = ".index.json"
+
+class FileOffsetIndexEntry(object):
+    """A single indexed structure. kind groups similar structures such as "room" or "section", and structureType is the class name used to decode it"""
+    def __init__(self, kind: str, name: str, offset: int, structureType: Optional[str] = None):
+        super(FileOffsetIndexEntry, self).__init__()
+        self.kind: str = kind
+        self.name: str = name
+        self.offset: int = offset
+        self.structureType: Optional[str] = structureType
+
+def get_file_key(filepath: str) -> Tuple[int, int]:
+    """Returns the size and modification time in nanoseconds of a file, used to detect when an index is out of date"""
+    fileStat = os.stat(filepath)
+    return (fileStat.st_size, fileStat.st_mtime_ns)
+
+def get_index_path(filepath: str, cacheDirectory: Optional[str] = None) -> str:
+    """Returns where the index for filepath is stored.
+    Without a cacheDirectory the index is stored wherever CacheDirectory.get_cache_path places outputs for the file,
+    otherwise it is stored in cacheDirectory using a hash of the absolute path"""
+    if cacheDirectory is None:
+        return get_cache_path(filepath, FILE_OFFSET_INDEX_SUFFIX)
+    pathHash = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()
+    return os.path.join(cacheDirectory, pathHash + FILE_OFFSET_INDEX_SUFFIX)
+
+class FileOffsetIndex(object):
+    """Stores the offsets of named structures within a single file"""
+    def __init__(self, filepath: str = None, fileSize: int = None, fileModifiedTime: int = None):
+        super(FileOffsetIndex, self).__init__()
+        self.filepath: str = filepath
+        self.fileSize: int = fileSize
+        self.fileModifiedTime: int = fileModifiedTime
+        self.entries: List[FileOffsetIndexEntry] = []
+        self._entriesByKind: Dict[str, List[FileOffsetIndexEntry]] = {}
+
+    def add_entry(self, entry: FileOffsetIndexEntry):
+        """Adds an entry to the index"""
+        self.entries.append(entry)
+        self._entriesByKind.setdefault(entry.kind, []).append(entry)
+
+    def find(self, kind: str, name: str) -> Optional[FileOffsetIndexEntry]:
+        """Returns the first entry of kind with a matching name, case-insensitive. Returns None if there is no match"""
+        lowerName = name.lower()
+        for entry in self._entriesByKind.get(kind, []):
+            if entry.name.lower() == lowerName:
+                return entry
+        return None
+
+    def find_all(self, kind: str) -> List[FileOffsetIndexEntry]:
+        """Returns all entries of kind, in the order they appear in the file"""
+        return list(self._entriesByKind.get(kind, []))
+
+    def is_valid_for(self, filepath: str) -> bool:
+        """Returns True if the file at filepath has not changed since this index was built"""
+        try:
+            return get_file_key(filepath) == (self.fileSize, self.fileModifiedTime)
+        except OSError:
+            return False
+
+    def save(self, indexPath: str):
+        """Writes this index to a JSON file. Failures are logged, as an index can always be rebuilt"""
+        indexData = {
+            "version": FILE_OFFSET_INDEX_VERSION,
+            "filepath": self.filepath,
+            "fileSize": self.fileSize,
+            "fileModifiedTime": self.fileModifiedTime,
+            "entries": [[entry.kind, entry.name, entry.offset, entry.structureType] for entry in self.entries]
+        }
+        try:
+            with atomic_write_path(indexPath) as tempPath:
+                with open(tempPath, "w") as indexFile:
+                    json.dump(indexData, indexFile)
+        except OSError as error:
+            log.warning("Unable to save index %s: %s", indexPath, error)
+
+    @staticmethod
+    def load(indexPath: str) -> Optional["FileOffsetIndex"]:
+        """Loads an index from a JSON file. Returns None if the file doesn't exist or can't be used"""
+        try:
+            with open(indexPath, "r") as indexFile:
+                indexData = json.load(indexFile)
+        except (OSError, ValueError):
+            return None
+        if indexData.get("version") != FILE_OFFSET_INDEX_VERSION:
+            return None
+        index = FileOffsetIndex(indexData["filepath"], indexData["fileSize"], indexData["fileModifiedTime"])
+        for kind, name, offset, structureType in indexData["entries"]:
+            index.add_entry(FileOffsetIndexEntry(kind, name, offset, structureType))
+        return index
@@ -0,0 +1,99 @@
+"""
+Provides interchangeable formats for caching decoded RSB images as RGBA8, so they don't need to be decoded again.
+PNG is the smallest and can be opened by any image viewer, but every load inflates and unfilters the whole image.
+RAW stores the pixels without a header so they are read straight into memory without decoding, at the cost of 4 bytes per pixel on disk.
+New formats can be added with register_image_cache_format.
+"""
+import logging
+import os
+
+from typing import Dict, Optional, Union
+
+from PIL import Image as PILImage # type: ignore
+
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path
+
+log = logging.getLogger(__name__)
+
+ImageData = Union[bytes, bytearray]
+
+IMAGE_CACHE_SUFFIX = ".CACHE"
+
+class ImageCacheFormat(object):
+    """Base class for image cache formats. Subclasses implement save and load for RGBA8 pixel data"""
+    #Name used to select this format in settings
+    name: str = ""
+    #Extension appended to IMAGE_CACHE_SUFFIX for cached files
+    extension: str = ""
+
+    def save(self, filepath: str, width: int, height: int, imageData: ImageData):
+        """Writes RGBA8 pixels to filepath"""
+        raise NotImplementedError()
+
+    def load(self, filepath: str, width: int, height: int) -> Optional[ImageData]:
+        """Reads RGBA8 pixels from filepath. Returns None if the cached image is not width by height pixels, or can't be read"""
+        raise NotImplementedError()
+
+    def save_image(self, filepath: str, image: PILImage.Image):
+        """Writes a PIL Image to filepath"""
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        self.save(filepath, image.size[0], image.size[1], image.tobytes())
+
+class PNGImageCacheFormat(ImageCacheFormat):
+    """Caches images as PNG files"""
+    name = "PNG"
+    extension = ".PNG"
+
+    def save(self, filepath: str, width: int, height: int, imageData: ImageData):
+        with atomic_write_path(filepath) as tempPath:
+            PILImage.frombytes("RGBA", (width, height), bytes(imageData)).save(tempPath, "PNG")
+
+    def load(self, filepath: str, width: int, height: int) -> Optional[ImageData]:
+        try:
+            image = PILImage.open(filepath)
+        except (OSError, ValueError) as error:
+            log.warning("Unable to load cached image %s: %s", filepath, error)
+            return None
+        if image.size != (width, height):
+            return None
+        if image.mode != "RGBA":
+            return image.convert("RGBA").tobytes()
+        return image.tobytes()
+
+class RawImageCacheFormat(ImageCacheFormat):
+    """Caches images as headerless RGBA8 pixels. The dimensions are not stored, so come from the source RSB header"""
+    name = "RAW"
+    extension = ".RGBA"
+
+    def save(self, filepath: str, width: int, height: int, imageData: ImageData):
+        with atomic_write_path(filepath) as tempPath:
+            with open(tempPath, "wb") as cacheFile:
+                cacheFile.write(imageData)
+
+    def load(self, filepath: str, width: int, height: int) -> Optional[ImageData]:
+        """Reads the cached pixels in a single read. Callers copy the pixels when uploading them, so they aren't memory mapped"""
+        with open(filepath, "rb") as cacheFile:
+            if width * height == 0 or os.fstat(cacheFile.fileno()).st_size != width * height * 4:
+                return None
+            return cacheFile.read()
+
+IMAGE_CACHE_FORMATS: Dict[str, ImageCacheFormat] = {}
+
+def register_image_cache_format(cacheFormat: ImageCacheFormat):
+    """Makes a format available to get_image_cache_format, replacing any format with the same name"""
+    IMAGE_CACHE_FORMATS[cacheFormat.name.upper()] = cacheFormat
+
+def get_image_cache_format(name: str) -> ImageCacheFormat:
+    """Returns the format registered with name, case-insensitive. Raises a ValueError for unknown formats"""
+    cacheFormat = IMAGE_CACHE_FORMATS.get(name.upper())
+    if cacheFormat is None:
+        raise ValueError("Unknown image cache format: " + name)
+    return cacheFormat
+
+def get_image_cache_path(filepath: str, cacheFormat: ImageCacheFormat) -> str:
+    """Returns the path of the cached image for the image at filepath"""
+    return get_cache_path(filepath, IMAGE_CACHE_SUFFIX + cacheFormat.extension)
+
+register_image_cache_format(PNGImageCacheFormat())
+register_image_cache_format(RawImageCacheFormat())
@@ -35,6 +35,15 @@ class CustomJSONEncoder(json.JSONEncoder):
     # https://code.tutsplus.com/tutorials/serialization-and-deserialization-of-python-objects-part-1--cms-26183
     # disabled pylint E0202 because it is desired to hide the parent definition
     def default(self, o): # pylint: disable=E0202
+        if hasattr(o, 'get_json_object'):
+            # Proxies, such as lazily loaded geometry objects, are serialized as the object they stand in for
+            return o.get_json_object()
+        if isinstance(o, memoryview):
+            # Data read from memory mapped files is serialized the same way as bytes
+            return str(o.tobytes())
+        if hasattr(o, 'tolist'):
+            # Packed arrays of geometry data are serialized the same way as lists
+            return o.tolist()
         if hasattr(o, '__dict__'):
             return o.__dict__
         return str(o)
@@ -7,6 +7,9 @@ from PIL import Image as PILImage # type: ignore
 
 log = logging.getLogger(__name__)
 
+# Pillow 9.1 moved the resampling filters into the Resampling enum, older versions only have the module constants
+BOX_FILTER: int = getattr(PILImage, "Resampling", PILImage).BOX
+
 def is_power_of_2(number: int) -> bool:
     """Checks if a number is a power of 2"""
     num1 = ((number & (number - 1)) == 0)
@@ -22,10 +25,43 @@ def halve_image_dimensions(dimensions: Union[Tuple[int, ...], List[int]]) -> Tup
     return tuple(new_dimensions)
 
 
-def generate_mip_maps(src_image: PILImage.Image) -> Optional[List[PILImage.Image]]:
+class NPOTHandling(object):
+    """Constants for how generate_mip_maps treats images with dimensions that are not a power of 2"""
+    #No mip maps are generated
+    SKIP = "skip"
+    #The image is resized so each dimension is the nearest power of 2
+    RESIZE = "resize"
+    #The image is padded with transparent pixels up to the next power of 2. Texture coordinates need to be scaled to match
+    PAD = "pad"
+
+def next_power_of_2(number: int) -> int:
+    """Returns the smallest power of 2 that is greater than or equal to number"""
+    return 1 << max(number - 1, 0).bit_length()
+
+def nearest_power_of_2(number: int) -> int:
+    """Returns the power of 2 closest to number, rounding up when number is halfway between two powers of 2"""
+    upper = next_power_of_2(number)
+    lower = max(upper // 2, 1)
+    if number - lower < upper - number:
+        return lower
+    return upper
+
+def make_power_of_2_image(src_image: PILImage.Image, npot_handling: str, resample_filter: int) -> Optional[PILImage.Image]:
+    """Returns a version of src_image with power of 2 dimensions using npot_handling, or None if the image should be skipped"""
+    width, height = src_image.size
+    if npot_handling == NPOTHandling.RESIZE:
+        return src_image.resize((nearest_power_of_2(width), nearest_power_of_2(height)), resample_filter)
+    if npot_handling == NPOTHandling.PAD:
+        padded_image = PILImage.new(src_image.mode, (next_power_of_2(width), next_power_of_2(height)))
+        padded_image.paste(src_image, (0, 0))
+        return padded_image
+    return None
+
+def generate_mip_maps(src_image: PILImage.Image, resample_filter: int = BOX_FILTER, npot_handling: str = NPOTHandling.SKIP) -> Optional[List[PILImage.Image]]:
     """
     Generate a list of images suitable for use as MipMaps
-    src_image should be a PIL.Image with Power Of 2 dimensions
+    Each level is downsampled from the previous level using resample_filter, which defaults to a fast box filter
+    Images without Power Of 2 dimensions are treated according to npot_handling, which should be one of the NPOTHandling constants. By default None is returned
     Returns list of images, 0th element being the src_image, and every image there after is half the size until 1x1.
     """
 
@@ -33,8 +69,12 @@ def generate_mip_maps(src_image: PILImage.Image) -> Optional[List[PILImage.Image
 
     image_is_power_of_2 = is_power_of_2(original_dimensions[0]) and is_power_of_2(original_dimensions[1])
     if image_is_power_of_2 is False:
-        log.warning("Skipping image as dimensions are not power of 2")
-        return None
+        resized_image = make_power_of_2_image(src_image, npot_handling, resample_filter)
+        if resized_image is None:
+            log.warning("Skipping image as dimensions are not power of 2")
+            return None
+        src_image = resized_image
+        original_dimensions = src_image.size
 
     mips: List[PILImage.Image] = []
     mips.append(src_image)
@@ -43,8 +83,8 @@ def generate_mip_maps(src_image: PILImage.Image) -> Optional[List[PILImage.Image
     while current_size != [1,1]:
         current_size = list(halve_image_dimensions(current_size))
 
-        # Create the new MipMap with the current size, using high quality downsampling
-        newMip = src_image.resize(current_size, PILImage.LANCZOS)
+        # Create the new MipMap from the previous level, which only needs to read 4 pixels for each new pixel with a box filter
+        newMip = mips[-1].resize(current_size, resample_filter)
         mips.append(newMip)
 
     return mips
@@ -5,6 +5,7 @@ import logging
 from RainbowFileReaders import MAPLevelReader
 from RainbowFileReaders.R6Constants import RSEGameVersions
 from FileUtilities import JSONMetaInfo, DirectoryProcessor
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path, set_cache_root
 
 from FileUtilities.Settings import load_settings
 
@@ -50,7 +51,7 @@ def convert_MAP(filename):
         return
 
     mapFile = MAPLevelReader.MAPLevelFile()
-    mapFile.read_file(filename, True)
+    mapFile.read_file(filename, True, useMemoryMap=True, usePackedArrays=True)
 
     for geometryObject in mapFile.geometryObjects:
         if mapFile.gameVersion == RSEGameVersions.RAINBOW_SIX:
@@ -78,12 +79,13 @@ def convert_MAP(filename):
     meta = JSONMetaInfo.JSONMetaInfo()
     meta.add_info("filecontents", mapFile)
     meta.add_info("filename", filename)
-    newFilename = filename + ".JSON"
-    meta.writeJSON(newFilename)
+    with atomic_write_path(get_cache_path(filename, ".JSON")) as tempPath:
+        meta.writeJSON(tempPath)
 
 def main():
     """Main function that converts a test file"""
     settings = load_settings()
+    set_cache_root(settings.get("cacheRoot"))
 
     fp = DirectoryProcessor.DirectoryProcessor()
     fp.paths.append(settings["gamePath"])
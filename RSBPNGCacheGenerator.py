@@ -1,7 +1,9 @@
 """
-Loads a game path and then converts all RSBs within to full colour PNGs with the extension .CACHE.PNG
+Loads a game path and then converts all RSBs within to full colour images in the format set by imageCacheFormat, such as PNGs with the extension .CACHE.PNG
+Passing --format dds writes DDS files with a full mip chain and the extension .CACHE.DDS instead
 """
 
+import argparse
 import logging
 from os import path
 
@@ -11,15 +13,32 @@ from RainbowFileReaders.RSBImageReader import RSBImageFile
 from RainbowFileReaders.R6Settings import restore_original_texture_name
 from FileUtilities.DirectoryUtils import gather_files_in_path
 from FileUtilities.Settings import load_settings
+from FileUtilities.DDSFile import write_dds
+from FileUtilities.ImageCache import ImageCacheFormat, get_image_cache_format, get_image_cache_path
+from FileUtilities.ContentManifest import ContentManifest, link_file
+from FileUtilities.CacheDirectory import get_cache_path, set_cache_root
+from FileUtilities.MipMapGenerator import generate_mip_maps, NPOTHandling
+from FileUtilities.BlockCompression import BC_QUALITY_NAMES, compress_mip_chain, get_blend_mode_for_alpha_bitdepth, select_block_compression_format
 
 log = logging.getLogger(__name__)
 
 #TODO: Improve logging for async. Add write out to file handler, which outputs txt for each file, and configure logging in each thread.
 logging.basicConfig(level=logging.INFO)
 
+DDS_CACHE_SUFFIX = ".CACHE.DDS"
+
+def get_output_path(filepath: str, textureFormat: str, cacheFormat: ImageCacheFormat) -> str:
+    """Returns the path of the converted image for the RSB at filepath"""
+    if textureFormat == "dds":
+        return get_cache_path(filepath, DDS_CACHE_SUFFIX)
+    return get_image_cache_path(filepath, cacheFormat)
+
 #Load Game
-def convert_game_images(game_path):
-    """Converts all images for a given game path, including mods"""
+def convert_game_images(game_path, textureFormat="png", textureCompression="none"):
+    """Converts all images for a given game path, including mods.
+    textureFormat can be "png" or "dds", which stores the full mip chain so it doesn't need to be generated at load time.
+    textureCompression is "none" to store RGBA8 data in DDS files, or the name of a BCQuality to block compress them,
+    using BC3 for alpha blended textures and BC1 for everything else. Textures without a CXP definition use BC3 if they store more than 1 bit of alpha"""
     gameloader = RSEGameLoader()
     gameloaded = gameloader.load_game(game_path)
     if gameloaded is False:
@@ -33,21 +52,38 @@ def convert_game_images(game_path):
 
     imagePaths = gather_files_in_path(".RSB", dataPath)
 
+    cacheFormat = get_image_cache_format(settings["imageCacheFormat"])
+    # Identical RSBs are common across games and mods, so each is only converted once for each set of conversion settings
+    manifest = ContentManifest()
+    if settings.get("contentManifestPath") is not None:
+        manifest = ContentManifest.load(settings["contentManifestPath"])
+
     for filepath in imagePaths:
         log.info("Processing: %s", filepath)
-        imageFile = RSBImageFile()
-        imageFile.read_file(filepath)
         filename = path.basename(filepath)
 
         original_texture_name = restore_original_texture_name(filename)
         cxpDef = get_cxp_definition(cxpDefinitions, original_texture_name)
 
         colorKeyRGB = None
+        blendMode = None
         if cxpDef is not None:
+            blendMode = cxpDef.blendMode
             log.info("Matched CXP definition: %s", original_texture_name)
             if cxpDef.blendMode == "colorkey":
                 colorKeyRGB = cxpDef.colorkey
 
+        outputPath = get_output_path(filepath, textureFormat, cacheFormat)
+
+        convertedPath = manifest.add_file(filepath, "|" + str(blendMode) + "|" + str(colorKeyRGB))
+        if convertedPath is not None:
+            log.info("Linking duplicate of: %s", convertedPath)
+            link_file(get_output_path(convertedPath, textureFormat, cacheFormat), outputPath)
+            continue
+
+        imageFile = RSBImageFile()
+        imageFile.read_file(filepath)
+
         image = None
 
         if colorKeyRGB is not None:
@@ -55,10 +91,34 @@ def convert_game_images(game_path):
             image = imageFile.convert_full_color_image_with_colorkey_mask(colorkeyMask)
         else:
             image = imageFile.convert_full_color_image()
-        PNGFilename = filepath + settings["imageCacheSuffix"]
-        image.save(PNGFilename, settings["imageCacheFormat"])
+
+        if textureFormat == "dds":
+            mips = generate_mip_maps(image, npot_handling=NPOTHandling.RESIZE)
+            if textureCompression in BC_QUALITY_NAMES:
+                if blendMode is None:
+                    #Without a CXP definition, the alpha channel of the image decides whether alpha gradients need to be kept
+                    blendMode = get_blend_mode_for_alpha_bitdepth(imageFile.header.bitDepthAlpha)
+                compressedTexture = compress_mip_chain(mips, select_block_compression_format(blendMode), BC_QUALITY_NAMES[textureCompression])
+                compressedTexture.write_file(outputPath)
+            else:
+                write_dds(outputPath, mips)
+        else:
+            cacheFormat.save_image(outputPath, image)
+
+    if settings.get("contentManifestPath") is not None:
+        manifest.save(settings["contentManifestPath"])
+    log.info("Converted %d unique images, linked %d duplicates", len(manifest.canonicalPaths), len(manifest.duplicates))
 
 if __name__ == "__main__":
     settings = load_settings()
+
+    parser = argparse.ArgumentParser(description="Converts all RSB files in a game to cached images")
+    parser.add_argument("--format", choices=["png", "dds"], default=settings.get("textureFormat", "png"),
+                        help="Format to write cached images to. dds also stores the full mip chain")
+    parser.add_argument("--compression", choices=["none"] + list(BC_QUALITY_NAMES.keys()), default=settings.get("textureCompression", "none"),
+                        help="Block compression quality for dds files, or none to store uncompressed RGBA8")
+    args = parser.parse_args()
+
+    set_cache_root(settings.get("cacheRoot"))
     gamepath = settings["gamePath"]
-    convert_game_images(gamepath)
+    convert_game_images(gamepath, args.format, args.compression)
@@ -10,65 +10,123 @@ Converts RSB files to png files and an acompanying JSON file with extra meta dat
  This process could be heavily optimised if array slicing is minimised and more care is
  taken around memory copies, but since it's a once off process, I'm not too concerned with speed
 
-Files with DXT compressed images don't recover the image, since i haven't worked on decompressing DXT images
 Files with a format version later than 1 also store information after the image, currently this is discarded but can easily be added.
 """
 
+import argparse
+import json
 import logging
 import os
+from functools import partial
 
 from RainbowFileReaders.RSBImageReader import RSBImageFile
 from FileUtilities.Settings import load_settings
 from FileUtilities import JSONMetaInfo, DirectoryProcessor
 from FileUtilities import MipMapGenerator
+from FileUtilities.DDSFile import write_dds
+from FileUtilities.ContentManifest import link_file
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path, set_cache_root
+from FileUtilities.BlockCompression import BC_QUALITY_NAMES, compress_mip_chain, get_blend_mode_for_alpha_bitdepth, select_block_compression_format
 
 log = logging.getLogger(__name__)
 
 #TODO: Improve logging for async. Add write out to file handler, which outputs txt for each file, and configure logging in each thread.
 logging.basicConfig(level=logging.INFO)
 
-def convert_RSB(filename):
-    """Reads an RSB file and writes to 2 PNGs (or 1 if there is not palette version stored) """
+TEXTURE_FORMATS = ["png", "dds"]
+TEXTURE_COMPRESSION_MODES = ["none"] + list(BC_QUALITY_NAMES.keys())
+#Suffixes of the images convert_RSB writes for an RSB file in each texture format. The .256.PNG is only written for images with a palette
+CONVERTED_IMAGE_SUFFIXES = {
+    "png": [".256.PNG", ".PNG"],
+    "dds": [".256.PNG", ".DDS"]
+}
+
+def convert_RSB(filename, textureFormat="png", textureCompression="none"):
+    """Reads an RSB file and writes to 2 PNGs (or 1 if there is not palette version stored).
+    When textureFormat is "dds" the full color image is written to a DDS file with a complete mip chain instead of a PNG.
+    textureCompression is "none" to store RGBA8 data in the DDS file, or the name of a BCQuality to block compress it"""
     log.info("Processing: %s", filename)
 
     imageFile = RSBImageFile()
     imageFile.read_file(filename)
 
-    #create and save png from 256 color image
+    #create and save an 8 bit palette png from 256 color image
     if imageFile.image256 is not None:
-        newImg1 = imageFile.convert_palette_image()
-        newFilename = filename + ".256.PNG"
-        newImg1.save(newFilename, "PNG")
+        newImg1 = imageFile.convert_palette_image_pil_palette()
+        with atomic_write_path(get_cache_path(filename, ".256.PNG")) as tempPath:
+            newImg1.save(tempPath, "PNG")
 
     #create and save png from full color image
     newImg2 = imageFile.convert_full_color_image()
-    newFilename = filename + ".PNG"
-    newImg2.save(newFilename, "PNG")
-
-    mips = MipMapGenerator.generate_mip_maps(newImg2)
-    if mips is None:
-        log.warning("Failed to generate mips for %s with dimensions: %d, %d", filename, newImg2.size[0], newImg2.size[1])
-    else:
-        log.info("Sucessfully generated mipmaps for %s", filename)
+    if textureFormat != "dds":
+        with atomic_write_path(get_cache_path(filename, ".PNG")) as tempPath:
+            newImg2.save(tempPath, "PNG")
+
+    #only DDS files store the mip chain, so mips are not generated for PNG output
+    if textureFormat == "dds":
+        mips = MipMapGenerator.generate_mip_maps(newImg2, npot_handling=MipMapGenerator.NPOTHandling.RESIZE)
+        if mips is None:
+            log.warning("Failed to generate mips for %s with dimensions: %d, %d", filename, newImg2.size[0], newImg2.size[1])
+        else:
+            log.info("Sucessfully generated mipmaps for %s", filename)
+            if textureCompression in BC_QUALITY_NAMES:
+                blendMode = get_blend_mode_for_alpha_bitdepth(imageFile.header.bitDepthAlpha)
+                compressedTexture = compress_mip_chain(mips, select_block_compression_format(blendMode), BC_QUALITY_NAMES[textureCompression])
+                compressedTexture.write_file(get_cache_path(filename, ".DDS"))
+            else:
+                write_dds(get_cache_path(filename, ".DDS"), mips)
 
     #save meta data to JSON file
-    newFilename = newFilename.replace(".PNG", ".JSON")
     meta = JSONMetaInfo.JSONMetaInfo()
     meta.setFilename(os.path.basename(filename))
     meta.add_info("header", imageFile.header)
-    meta.writeJSON(newFilename)
+    with atomic_write_path(get_cache_path(filename, ".JSON")) as tempPath:
+        meta.writeJSON(tempPath)
 
     log.info("Finished converting: %s", filename)
 
+def link_converted_RSB(convertedFilename, duplicateFilename, textureFormat="png"):
+    """Gives an RSB file the same converted images as an identical RSB file that has already been converted, without decoding it again.
+    Only the images convert_RSB writes for textureFormat are linked, so outputs left from earlier runs in other formats are ignored.
+    The JSON meta data is copied with the filename updated"""
+    log.info("Linking duplicate: %s to %s", duplicateFilename, convertedFilename)
+    try:
+        with open(get_cache_path(convertedFilename, ".JSON"), "r") as metaFile:
+            metaData = json.load(metaFile)
+    except (OSError, ValueError) as error:
+        log.error("Unable to link duplicate %s, as the meta data of %s could not be read: %s", duplicateFilename, convertedFilename, error)
+        return
+
+    for suffix in CONVERTED_IMAGE_SUFFIXES[textureFormat]:
+        if os.path.isfile(get_cache_path(convertedFilename, suffix)):
+            link_file(get_cache_path(convertedFilename, suffix), get_cache_path(duplicateFilename, suffix))
+
+    metaData["filename"] = os.path.basename(duplicateFilename)
+    with atomic_write_path(get_cache_path(duplicateFilename, ".JSON")) as tempPath:
+        with open(tempPath, "w") as metaFile:
+            json.dump(metaData, metaFile, indent=4)
+
 def main():
     """Main function that converts test data files"""
     settings = load_settings()
 
+    parser = argparse.ArgumentParser(description="Converts RSB files to PNG or DDS files")
+    parser.add_argument("--format", choices=TEXTURE_FORMATS, default=settings.get("textureFormat", "png"),
+                        help="Format to write full color images to. dds also stores the full mip chain")
+    parser.add_argument("--compression", choices=TEXTURE_COMPRESSION_MODES, default=settings.get("textureCompression", "none"),
+                        help="Block compression quality for dds files, or none to store uncompressed RGBA8")
+    args = parser.parse_args()
+
+    set_cache_root(settings.get("cacheRoot"))
+
     fp = DirectoryProcessor.DirectoryProcessor()
     fp.paths.append(settings["gamePath"])
     fp.fileExt = ".RSB"
 
-    fp.processFunction = convert_RSB
+    fp.processFunction = partial(convert_RSB, textureFormat=args.format, textureCompression=args.compression)
+    # Identical RSBs are common across games and mods, so only convert each one once
+    fp.duplicateFunction = partial(link_converted_RSB, textureFormat=args.format)
+    fp.contentManifestPath = settings.get("contentManifestPath")
 
     fp.run(mode=settings["runMode"])
 
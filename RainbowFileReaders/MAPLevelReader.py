@@ -3,38 +3,115 @@ This module defines the fileformat and data structures specific to MAP files use
 """
 from __future__ import annotations
 import logging
-from typing import List, Union, Optional
+import os
+from typing import Dict, Iterable, List, Union, Optional
 from datetime import datetime
 
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, SizedCString, BinaryFileReader
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, SizedCString, BinaryFileReader, UINT32_STRUCT
 from RainbowFileReaders import R6Settings, R6Constants
-from RainbowFileReaders.R6Constants import RSEGameVersions
-from RainbowFileReaders.RSEGeometryDataStructures import RSEGeometryListHeader, R6GeometryObject
+from RainbowFileReaders.R6Constants import RSEGameVersions, RSEMAPSections
+from RainbowFileReaders.RSEGeometryDataStructures import RSEGeometryListHeader, R6GeometryObject, R6MeshDefinition
 from RainbowFileReaders.RSEMaterialDefinition import RSEMaterialDefinition, RSEMaterialListHeader
 from RainbowFileReaders.CXPMaterialPropertiesReader import load_relevant_cxps
 from RainbowFileReaders.RSDMPLightReader import RSDMPLightFile
 from RainbowFileReaders.MathHelpers import Vector, IntIterable
 from RainbowFileReaders.RenderableArray import RenderableArray
-from RainbowFileReaders.R6MAPStructures import R6MAPRoomDefinition, R6MAPLightList, R6MAPPlanningLevelDefinition
+from RainbowFileReaders.R6MAPStructures import R6MAPRoomDefinition, R6MAPLight, R6MAPLightList, R6MAPPlanningLevelDefinition
 from RainbowFileReaders.RSMAPStructures import RSMAPRoomDefinition, RSMAPGeometryObject, RSMAPShermanLevelTransitionList
 
 log = logging.getLogger(__name__)
 
 AnyRoomType = Union[R6MAPRoomDefinition, RSMAPRoomDefinition]
 
+# Section strings are short names, anything longer indicates the data is not a section header
+MAX_SECTION_STRING_LENGTH = 256
+
+def is_section_string_at(filereader: BinaryFileReader, offset: int) -> bool:
+    """Checks if a plausible SizedCString, such as the name of a section, is stored at offset without moving the read position"""
+    if offset < 0 or offset + UINT32_STRUCT.size > filereader.get_length():
+        return False
+    stringLength = UINT32_STRUCT.unpack_from(filereader.bytes, offset)[0]
+    stringStart = offset + UINT32_STRUCT.size
+    if stringLength < 1 or stringLength > MAX_SECTION_STRING_LENGTH or stringStart + stringLength > filereader.get_length():
+        return False
+    stringBytes = bytes(filereader.bytes[stringStart:stringStart + stringLength])
+    if stringBytes[-1] != 0:
+        return False
+    return all(32 <= character < 127 for character in stringBytes[:-1])
+
+AnyGeometryObjectType = Union[R6GeometryObject, RSMAPGeometryObject]
+
+class LazyGeometryObject(object):
+    """
+    Stands in for a geometry object where only the header has been read.
+    Header attributes such as name_string are available immediately, accessing any other attribute decodes the rest of the object.
+    isinstance checks against the geometry object class work without loading the object
+    """
+    def __init__(self, geometryObject: AnyGeometryObjectType, data: bytes, usePackedArrays: bool):
+        self._geometryObject: AnyGeometryObjectType = geometryObject
+        self._headerAttributes = set(geometryObject.headerSchema.fieldNames)
+        # Only the bytes of this object are held until it is loaded, so unloaded objects don't keep the whole file in memory
+        self._data: Optional[bytes] = data
+        self._usePackedArrays: bool = usePackedArrays
+
+    @property # type: ignore
+    def __class__(self):
+        return type(self._geometryObject)
+
+    def is_loaded(self) -> bool:
+        """Returns True once the body of the geometry object has been decoded"""
+        return self._data is None
+
+    def load(self) -> AnyGeometryObjectType:
+        """Decodes the geometry object if it hasn't been already, and returns it"""
+        if self._data is not None:
+            filereader = BinaryFileReader(usePackedArrays=self._usePackedArrays)
+            filereader.open_buffer(self._data)
+            self._geometryObject.read(filereader)
+            filereader.close()
+            self._data = None
+        return self._geometryObject
+
+    def get_json_object(self) -> AnyGeometryObjectType:
+        """Returns the decoded geometry object, which is serialized in place of this proxy"""
+        return self.load()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._headerAttributes:
+            self.load()
+        return getattr(self._geometryObject, name)
+
+    def __setattr__(self, name: str, value):
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self.load(), name, value)
+
 class MAPLevelFile(FileFormatReader):
-    """Class to read full MAP files"""
-    def __init__(self):
+    """Class to read full MAP files
+    sections can be set to a list of RSEMAPSections constants to only load those sections. Sections that aren't loaded are skipped using their size fields, and stored as None.
+    The header, materials and footer are always loaded
+    If lazyGeometry is True, only the header of each geometry object is read, and each object is stored as a LazyGeometryObject which decodes the rest when needed"""
+    def __init__(self, sections: Iterable[str] = RSEMAPSections.ALL, lazyGeometry: bool = False):
         super(MAPLevelFile, self).__init__()
+        self.sections: List[str] = list(sections)
+        self.lazyGeometry: bool = lazyGeometry
+        #Offset of each section read, keyed by RSEMAPSections constants
+        self.sectionOffsets: Dict[str, int] = {}
         self.header: MAPHeader = None
         self.materialListHeader: RSEMaterialListHeader  = None
         self.materials: List[RSEMaterialDefinition] = []
         self.geometryListHeader: RSEGeometryListHeader = None
-        self.geometryObjects: List[Union[R6GeometryObject, RSMAPGeometryObject]] = []
-        self.portalList: RSEMAPPortalList = []
-        self.lightList: R6MAPLightList = []
-        self.objectList: RSEMAPObjectList = []
-        self.dmpLights: RSDMPLightFile = None
+        self.geometryObjects: List[Union[AnyGeometryObjectType, LazyGeometryObject]] = []
+        self.portalList: Optional[RSEMAPPortalList] = None
+        self.lightList: Optional[R6MAPLightList] = None
+        self.objectList: Optional[RSEMAPObjectList] = None
+        self.roomList: Optional[RSEMAPRoomList] = None
+        self.transitionList: Optional[RSMAPShermanLevelTransitionList] = None
+        self.planningLevelList: Optional[RSEMAPPlanningLevelList] = None
+        self.dmpLights: Optional[RSDMPLightFile] = None
 
         self.footer: RSEMAPFooterDefinition = None
         #Game version is not stored in file, and has to be determined by analysing the structure of stored materials. Stored here for easy use
@@ -70,55 +147,190 @@ class MAPLevelFile(FileFormatReader):
         if self.materials:
             self.gameVersion = self.materials[0].get_material_game_version()
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.GEOMETRY] = sectionStart
         self.geometryListHeader = RSEGeometryListHeader()
         self.geometryListHeader.read(fileReader)
         if self.verboseOutput:
             self.geometryListHeader.print_structure_info()
 
-        self.geometryObjects = []
-        for _ in range(self.geometryListHeader.count):
-            if self.gameVersion == RSEGameVersions.ROGUE_SPEAR:
-                newObj = RSMAPGeometryObject()
-                newObj.read(fileReader)
-                self.geometryObjects.append(newObj)
-                if self.verboseOutput:
-                    pass
-            else:
-                newObj = R6GeometryObject()
-                newObj.read(fileReader)
-                self.geometryObjects.append(newObj)
-                if self.verboseOutput:
-                    pass
+        if self.skip_section(RSEMAPSections.GEOMETRY, sectionStart, self.geometryListHeader.geometryListSize):
+            self.geometryObjects = None
+        else:
+            self.read_geometry_objects()
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.PORTALS] = sectionStart
         self.portalList = RSEMAPPortalList()
-        self.portalList.read(fileReader)
+        self.portalList.read_header_info(fileReader)
+        if self.skip_section(RSEMAPSections.PORTALS, sectionStart, self.portalList.portalListSize):
+            self.portalList = None
+        else:
+            self.portalList.read_portals(fileReader)
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.LIGHTS] = sectionStart
         self.lightList = R6MAPLightList()
-        self.lightList.read(fileReader)
+        self.lightList.read_header_info(fileReader)
+        if self.skip_section(RSEMAPSections.LIGHTS, sectionStart, self.lightList.lightListSize):
+            self.lightList = None
+        else:
+            self.lightList.read_lights(fileReader)
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.OBJECTS] = sectionStart
         self.objectList = RSEMAPObjectList()
-        self.objectList.read(fileReader)
+        self.objectList.read_header_info(fileReader)
+        if self.skip_section(RSEMAPSections.OBJECTS, sectionStart, self.objectList.objectListSize):
+            self.objectList = None
+        else:
+            self.objectList.read_objects(fileReader)
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.ROOMS] = sectionStart
         self.roomList = RSEMAPRoomList()
-        self.roomList.read_room_list(fileReader, self.gameVersion)
+        self.roomList.read_header_info(fileReader)
+        if self.skip_section(RSEMAPSections.ROOMS, sectionStart, self.roomList.roomListSize):
+            self.roomList = None
+        else:
+            self.roomList.read_rooms(fileReader, self.gameVersion)
 
         if self.gameVersion == RSEGameVersions.ROGUE_SPEAR:
+            sectionStart = fileReader.get_seekg()
+            self.sectionOffsets[RSEMAPSections.TRANSITIONS] = sectionStart
             self.transitionList = RSMAPShermanLevelTransitionList()
-            self.transitionList.read(fileReader)
+            self.transitionList.read_header_info(fileReader)
+            if self.skip_section(RSEMAPSections.TRANSITIONS, sectionStart, self.transitionList.transitionListSize):
+                self.transitionList = None
+            else:
+                self.transitionList.read_transition_objects(fileReader)
 
+        sectionStart = fileReader.get_seekg()
+        self.sectionOffsets[RSEMAPSections.PLANNING_LEVELS] = sectionStart
         self.planningLevelList = RSEMAPPlanningLevelList()
-        self.planningLevelList.read_planning_level_list(fileReader, self.gameVersion)
+        self.planningLevelList.read_header_info(fileReader)
+        #Rainbow Six planning level lists end with an extra byte, which may not be included in the size
+        trailingBytes = 1 if self.gameVersion == RSEGameVersions.RAINBOW_SIX else 0
+        if self.skip_section(RSEMAPSections.PLANNING_LEVELS, sectionStart, self.planningLevelList.planningLevelListSize, 0, trailingBytes):
+            self.planningLevelList = None
+        else:
+            self.planningLevelList.read_planning_levels(fileReader)
+            self.planningLevelList.read_trailing_data(fileReader, self.gameVersion)
 
         self.footer = RSEMAPFooterDefinition()
         self.footer.read(fileReader)
 
         #read in DMP file data
-        if self.gameVersion == RSEGameVersions.ROGUE_SPEAR:
-            if self.filepath.lower().endswith(".map"):
+        if self.gameVersion == RSEGameVersions.ROGUE_SPEAR and RSEMAPSections.LIGHTS in self.sections:
+            if self.filepath is not None and self.filepath.lower().endswith(".map"):
                 lightFileName = self.filepath[:-4] + ".dmp"
-                lightFile = RSDMPLightFile()
-                lightFile.read_file(lightFileName)
-                self.dmpLights = lightFile
+                #Maps read from a buffer may not have their DMP file on disk, it can be read separately with RSDMPLightFile.read_buffer
+                if os.path.isfile(lightFileName):
+                    lightFile = RSDMPLightFile()
+                    lightFile.read_file(lightFileName)
+                    self.dmpLights = lightFile
+                else:
+                    log.warning("Unable to find DMP file: %s", lightFileName)
+
+    @classmethod
+    def get_indexed_structure_types(cls) -> Dict[type, str]:
+        return {
+            R6GeometryObject: "geometryObject",
+            RSMAPGeometryObject: "geometryObject",
+            R6MeshDefinition: "mesh",
+            RSEMAPPortal: "portal",
+            R6MAPLight: "light",
+            RSEMAPObject: "object",
+            R6MAPRoomDefinition: "room",
+            RSMAPRoomDefinition: "room",
+        }
+
+    def get_section_offsets(self) -> Dict[str, int]:
+        return self.sectionOffsets
+
+    def read_geometry_objects(self):
+        """Reads the geometry objects described by geometryListHeader, using the structure for the detected game version"""
+        #Objects are decoded in this process, as returning decoded objects from worker processes costs more than decoding them.
+        #Only decoding the objects that are used, with lazyGeometry, is the faster option for large maps
+        fileReader = self._filereader
+
+        self.geometryObjects = []
+        for _ in range(self.geometryListHeader.count):
+            newObj: AnyGeometryObjectType
+            if self.gameVersion == RSEGameVersions.ROGUE_SPEAR:
+                newObj = RSMAPGeometryObject()
+            else:
+                newObj = R6GeometryObject()
+
+            if self.lazyGeometry:
+                lazyObj = self.read_lazy_geometry_object(newObj)
+                if lazyObj is not None:
+                    self.geometryObjects.append(lazyObj)
+                    continue
+
+            newObj.read(fileReader)
+            self.geometryObjects.append(newObj)
+            if self.verboseOutput:
+                pass
+
+    def read_lazy_geometry_object(self, geometryObject: AnyGeometryObjectType) -> Optional[LazyGeometryObject]:
+        """Reads the header of geometryObject and skips the rest using its size field.
+        Returns None, with the read position unchanged, if the end of the object can't be found and it must be read normally"""
+        fileReader = self._filereader
+        objectStart = fileReader.get_seekg()
+        geometryObject.read_header_info(fileReader)
+        # Geometry objects are followed by another geometry object or the portal list, which both have a string after their size and id
+        objectEnd = self.find_structure_end(objectStart, geometryObject.size)
+        if objectEnd is None:
+            log.warning("Unable to find end of geometry object %s, reading it fully: %s", geometryObject.name_string.string, self.filepath)
+            fileReader.seek(objectStart)
+            return None
+        fileReader.seek(objectEnd)
+        return LazyGeometryObject(geometryObject, bytes(fileReader.bytes[objectStart:objectEnd]), fileReader.usePackedArrays)
+
+    def find_structure_end(self, structureStart: int, structureSize: int, nextStringOffset: int = 8, trailingBytes: int = 0) -> Optional[int]:
+        """
+        Uses the size stored in a structure's header to find where it ends. Returns None if no valid end can be found.
+        Sizes don't consistently include the size field itself, so each possible end is validated by checking for the string at nextStringOffset in the following structure.
+        """
+        fileReader = self._filereader
+        for structureEnd in (structureStart + 4 + structureSize, structureStart + structureSize):
+            for extraBytes in sorted({0, trailingBytes}):
+                candidateEnd = structureEnd + extraBytes
+                if candidateEnd >= fileReader.get_seekg() and is_section_string_at(fileReader, candidateEnd + nextStringOffset):
+                    return candidateEnd
+        return None
+
+    def skip_section(self, sectionName: str, sectionStart: int, sectionSize: int, nextStringOffset: int = 8, trailingBytes: int = 0) -> bool:
+        """
+        Skips the rest of a section that was not requested, using the size stored in its header. Returns True if the section was skipped.
+        If no valid end is found the read position is not changed, and the section should be read normally
+        """
+        if sectionName in self.sections:
+            return False
+        sectionEnd = self.find_structure_end(sectionStart, sectionSize, nextStringOffset, trailingBytes)
+        if sectionEnd is None:
+            log.warning("Unable to skip %s section using size field, reading it fully: %s", sectionName, self.filepath)
+            return False
+        self._filereader.seek(sectionEnd)
+        return True
+
+    def read_probe_data(self):
+        """Reads the header and the first material, which is enough to determine the game version"""
+        fileReader = self._filereader
+
+        self.header = MAPHeader()
+        self.header.read(fileReader)
+
+        self.materialListHeader = RSEMaterialListHeader()
+        self.materialListHeader.read(fileReader)
+
+        self.materials = []
+        if self.materialListHeader.numMaterials > 0:
+            newMaterial = RSEMaterialDefinition()
+            newMaterial.read(fileReader)
+            self.materials.append(newMaterial)
+            self.gameVersion = newMaterial.get_material_game_version()
 
 
 class MAPHeader(BinaryFileDataStructure):
@@ -265,8 +477,9 @@ class RSEMAPObject(BinaryFileDataStructure):
         self.versionNumber: int = filereader.read_uint32()
         self.name_string: SizedCString = SizedCString(filereader)
 
+        # The unparsed data is copied, so a memory mapped file can be unmapped as soon as it has been read
         if self.versionNumber >= self.RS_OBJECT_VERSION:
-            self.bytes = filereader.read_bytes(self.objectSize)
+            self.bytes = bytes(filereader.read_bytes(self.objectSize))
         elif self.versionNumber == self.R6_OBJECT_VERSION:
             numberOfBytesToSkip = self.objectSize
             #skip 4 uints
@@ -274,7 +487,7 @@ class RSEMAPObject(BinaryFileDataStructure):
             #skip the length of the 2 strings
             numberOfBytesToSkip = numberOfBytesToSkip - self.name_string.string_length
             numberOfBytesToSkip = numberOfBytesToSkip - self.version_string.string_length
-            self.bytes = filereader.read_bytes(numberOfBytesToSkip)
+            self.bytes = bytes(filereader.read_bytes(numberOfBytesToSkip))
         else:
             log.critical("Unsupported Map object version: %d", self.versionNumber)
             return
@@ -341,7 +554,10 @@ class RSEMAPPlanningLevelList(BinaryFileDataStructure):
 
         self.read_header_info(filereader)
         self.read_planning_levels(filereader)
+        self.read_trailing_data(filereader, gameVer)
 
+    def read_trailing_data(self, filereader: BinaryFileReader, gameVer: str):
+        """Reads data stored after the planning levels in some game versions"""
         if gameVer == RSEGameVersions.RAINBOW_SIX:
             self.unknown1: int = filereader.read_bytes(1)[0] #Y
 
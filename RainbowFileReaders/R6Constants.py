@@ -17,6 +17,18 @@ class RSEEngineVersions(object):
     ROMMEL = "Rommel" # Rogue Spear, Urban Ops, Covert Ops, Black Ops
     IKE = "Ike" # Ghost Recon
 
+class RSEMAPSections(object):
+    """Used to group some related constants, somewhat like an enum
+    Stores the names of the sections in a MAP file which can be selectively loaded"""
+    GEOMETRY = "geometry"
+    PORTALS = "portals"
+    LIGHTS = "lights"
+    OBJECTS = "objects"
+    ROOMS = "rooms"
+    TRANSITIONS = "transitions" # Rogue Spear only
+    PLANNING_LEVELS = "planningLevels"
+    ALL = (GEOMETRY, PORTALS, LIGHTS, OBJECTS, ROOMS, TRANSITIONS, PLANNING_LEVELS)
+
 class RSEMaterialFormatConstants(object):
     """Used to group some related constants, somewhat like an enum
     Stores sizes of materials in each game version"""
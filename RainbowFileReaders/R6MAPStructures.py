@@ -2,7 +2,8 @@
 
 from typing import List
 
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, BinaryFileReader, SizedCString
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, BinaryFileReader, SizedCString, BytesLike, TYPECODE_UINT32, TYPECODE_UINT8, TYPECODE_FLOAT
+from FileUtilities.BinaryStructSchema import BinaryStructSchema, SchemaField, SchemaAlias, SchemaBranch, FIELD_SIZED_CSTRING, FIELD_BYTES, is_version_string
 from RainbowFileReaders.MathHelpers import AxisAlignedBoundingBox
 from RainbowFileReaders.RSEGeometryDataStructures import R6VertexParameterCollection, R6FaceDefinition
 
@@ -36,38 +37,47 @@ class R6MAPLightList(BinaryFileDataStructure):
 
 class R6MAPLight(BinaryFileDataStructure):
     """A light definition for lights stored in Rainbow Six MAP files"""
-    def __init__(self):
-        super(R6MAPLight, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.lightSize: int = filereader.read_uint32()
-        self.id: int = filereader.read_uint32()
-
+    schema = BinaryStructSchema([
+        SchemaField("lightSize", TYPECODE_UINT32),
+        SchemaField("id", TYPECODE_UINT32),
         #Some maps store a version string, others don't, not quite sure why. Also makes unknown6 quite unclear as to whether they are separate fields or not
-        self.name_string: SizedCString = SizedCString(filereader)
-        if self.name_string.string == "Version":
-            self.version_string: SizedCString = self.name_string
-            self.versionNumber: int = filereader.read_uint32()
-
-            self.name_string = SizedCString(filereader)
-            self.unknown6: int = filereader.read_uint32()
-        else:
-            self.unknown7: bytes = filereader.read_bytes(3)
-
+        SchemaField("name_string", FIELD_SIZED_CSTRING),
+        SchemaBranch(is_version_string("name_string"), [
+            SchemaAlias("version_string", "name_string"),
+            SchemaField("versionNumber", TYPECODE_UINT32),
+            SchemaField("name_string", FIELD_SIZED_CSTRING),
+            SchemaField("unknown6", TYPECODE_UINT32),
+        ], [
+            SchemaField("unknown7", FIELD_BYTES, 3),
+        ]),
         #3x3 matrix = 9 elements
-        self.transformMatrix: List[float] = filereader.read_vec_f(9)
-
-        self.position: List[float] = filereader.read_vec_f(3)
-        self.color: List[int] = filereader.read_vec_uint32(3)
-        self.constantAttenuation: float = filereader.read_float()
-        self.linearAttenuation: float = filereader.read_float()
-        self.quadraticAttenuation: float = filereader.read_float()
+        SchemaField("transformMatrix", TYPECODE_FLOAT, 9),
+        SchemaField("position", TYPECODE_FLOAT, 3),
+        SchemaField("color", TYPECODE_UINT32, 3),
+        SchemaField("constantAttenuation", TYPECODE_FLOAT),
+        SchemaField("linearAttenuation", TYPECODE_FLOAT),
+        SchemaField("quadraticAttenuation", TYPECODE_FLOAT),
         #maybe?
-        self.falloff: float = filereader.read_float()
-        self.energy: float = filereader.read_float()
-        self.type: int = filereader.read_bytes(1)[0]
+        SchemaField("falloff", TYPECODE_FLOAT),
+        SchemaField("energy", TYPECODE_FLOAT),
+        SchemaField("type", TYPECODE_UINT8),
+    ])
+
+    def __init__(self):
+        super(R6MAPLight, self).__init__()
+        self.lightSize: int = None
+        self.id: int = None
+        self.name_string: SizedCString = None
+        self.unknown7: BytesLike = None
+        self.transformMatrix: List[float] = None
+        self.position: List[float] = None
+        self.color: List[int] = None
+        self.constantAttenuation: float = None
+        self.linearAttenuation: float = None
+        self.quadraticAttenuation: float = None
+        self.falloff: float = None
+        self.energy: float = None
+        self.type: int = None
 
 class R6MAPRoomDefinition(BinaryFileDataStructure):
     """Defines a Room as used in Rainbow Six. Contains information such as levels and transitions"""
@@ -151,7 +161,7 @@ class R6MAPShermanLevelPlanAreaDefinition(BinaryFileDataStructure):
             self.versionNumber: int = filereader.read_uint32()
             self.name_string = SizedCString(filereader)
 
-        self.unknown2_bytes: bytes = filereader.read_bytes(4) #ABCD
+        self.unknown2_bytes: bytes = bytes(filereader.read_bytes(4)) #ABCD
         self.unknown3: int = filereader.read_uint32() #U
 
         self.vertexCount: int = filereader.read_uint32()
@@ -187,30 +197,37 @@ class R6MAPShermanLevelPlanAreaDefinition(BinaryFileDataStructure):
 
 class R6MAPShermanLevelTransitionDefinition(BinaryFileDataStructure):
     """This is related to the portal system and traversal between floors, but exact details and usage is still TBD"""
+    schema = BinaryStructSchema([
+        SchemaField("name_string", FIELD_SIZED_CSTRING),
+        SchemaField("level_A_string", FIELD_SIZED_CSTRING),
+        SchemaField("level_B_string", FIELD_SIZED_CSTRING),
+        SchemaField("coords", TYPECODE_FLOAT, 4),
+    ])
+
     def __init__(self):
         super(R6MAPShermanLevelTransitionDefinition, self).__init__()
-
-    def read(self, filereader):
-        super().read(filereader)
-
-        self.name_string: SizedCString = SizedCString(filereader)
-
-        self.level_A_string: SizedCString = SizedCString(filereader)
-        self.level_B_string: SizedCString = SizedCString(filereader)
-
-        self.coords = filereader.read_vec_f(4)
+        self.name_string: SizedCString = None
+        self.level_A_string: SizedCString = None
+        self.level_B_string: SizedCString = None
+        self.coords: List[float] = None
 
 class R6MAPPlanningLevelDefinition(BinaryFileDataStructure):
     """This is related to the planning levels, but exact details and usage is still TBD"""
+    schema = BinaryStructSchema([
+        SchemaField("levelNumber", TYPECODE_FLOAT), #A
+        SchemaField("floorHeight", TYPECODE_FLOAT), #B
+        SchemaField("roomCount", TYPECODE_UINT32),
+    ])
+
     def __init__(self):
         super(R6MAPPlanningLevelDefinition, self).__init__()
+        self.levelNumber: float = None
+        self.floorHeight: float = None
+        self.roomCount: int = None
 
     def read(self, filereader: BinaryFileReader):
         super().read(filereader)
 
-        self.levelNumber: float = filereader.read_float() #A
-        self.floorHeight: float = filereader.read_float() #B
-        self.roomCount: int = filereader.read_uint32()
         self.roomNames: List[SizedCString] = []
         for _ in range(self.roomCount):
             string = SizedCString(filereader)
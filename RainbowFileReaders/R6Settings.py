@@ -63,6 +63,9 @@ def determine_data_paths_for_file(filename: str) -> Tuple[Optional[str], Optiona
     All relative paths will be returned as absolute paths, which can be reversed with os.path.relpath()
     @returns Tuple of (BaseGamePath, BaseDataPath, ModPath)
     """
+    #Files read from memory may not have a name
+    if filename is None:
+        return (None, None, None)
 
     #Get the absolute path
     absPath = os.path.abspath(filename)
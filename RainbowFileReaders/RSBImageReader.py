@@ -1,23 +1,76 @@
 """Provides classes that will read and parse RSB Image files."""
+from __future__ import annotations
+import functools
 import logging
 
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 
 from PIL import Image as PILImage # type: ignore
-from PIL import ImagePalette # type: ignore
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, bytes_to_shortint, BinaryFileReader
-from FileUtilities.ColorConversionUtilities import get_color_format, get_color_lookup_table
+from PIL import ImageChops # type: ignore
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, BinaryFileReader, BytesLike
+from FileUtilities.ColorConversionUtilities import decode_bitmask_ARGB_colors, MAX_CHANNEL_BITDEPTH
 from RainbowFileReaders.MathHelpers import IntIterable
 
 log = logging.getLogger(__name__)
 
+#Maps the DXT type stored in RSB headers to the BCn format number used by PIL's bcn decoder.
+#DXT2 and DXT4 use the same block layout as DXT3 and DXT5, with premultiplied alpha
+DXT_BCN_FORMATS = {0: 1, 1: 2, 2: 2, 3: 3, 4: 3}
+#Colors in DXT blocks are stored as 565, which determines the precision of colorkey matches
+DXT_RGBA_BITMASK = (5, 6, 5, 0)
+#Version 0 palettes store 256 BGRA colors
+RSB_PALETTE_SIZE = 256 * 4
+
 class RSBImageFile(FileFormatReader):
-    """Class to read full RSB files"""
-    def __init__(self):
+    """Class to read full RSB files
+    If lazyImages is True, only the header is read. The offsets of the palette and images are recorded, and they are decoded when image256, imageFullColor, palette or a convert method is first used"""
+    def __init__(self, lazyImages: bool = False):
         super(RSBImageFile, self).__init__()
+        self.lazyImages: bool = lazyImages
         self.header: RSBHeader = RSBHeader()
-        self.image256: Optional[RSBImage] = None
-        self.imageFullColor: RSBImage = RSBImage()
+        self._palette: Optional[RSBPalette] = None
+        self._image256: Optional[RSBImage] = None
+        self._imageFullColor: RSBImage = RSBImage()
+        #Offsets of each block of image data, None if the file doesn't contain that block
+        self.paletteOffset: Optional[int] = None
+        self.image256Offset: Optional[int] = None
+        self.imageFullColorOffset: Optional[int] = None
+        # A reference to the whole file is held until the images are decoded
+        self._pendingImageData: Optional[BytesLike] = None
+
+    @property
+    def palette(self) -> Optional[RSBPalette]:
+        """The palette of version 0 files, decoded when first accessed in lazy mode"""
+        self.load_images()
+        return self._palette
+
+    @palette.setter
+    def palette(self, value: Optional[RSBPalette]):
+        self._palette = value
+
+    @property
+    def image256(self) -> Optional[RSBImage]:
+        """The 256 color image of version 0 files, decoded when first accessed in lazy mode"""
+        self.load_images()
+        return self._image256
+
+    @image256.setter
+    def image256(self, value: Optional[RSBImage]):
+        self._image256 = value
+
+    @property
+    def imageFullColor(self) -> RSBImage:
+        """The full color image, decoded when first accessed in lazy mode"""
+        self.load_images()
+        return self._imageFullColor
+
+    @imageFullColor.setter
+    def imageFullColor(self, value: RSBImage):
+        self._imageFullColor = value
+
+    def is_loaded(self) -> bool:
+        """Returns True once the palette and images have been read"""
+        return self._pendingImageData is None
 
     def read_data(self):
         """Reads the data from an RSB Image file. Overrides parent function"""
@@ -29,16 +82,21 @@ class RSBImageFile(FileFormatReader):
         self.header = RSBHeader()
         self.header.read(fileReader)
 
-        self.image256 = None
+        self._palette = None
+        self._image256 = None
+        self.paletteOffset = None
+        self.image256Offset = None
+        self.imageFullColorOffset = None
+        self._pendingImageData = None
         if self.header.version == 0 and self.header.containsPalette == 1:
-            #read palette
-            self.palette = RSBPalette()
-            self.palette.read(fileReader)
-
-            #read 256 color image
-            self.image256 = RSBImage()
-            bytesPerPixel = 1
-            self.image256.read_image(self.header.width, self.header.height, bytesPerPixel, fileReader)
+            self.paletteOffset = fileReader.get_seekg()
+            self.image256Offset = self.paletteOffset + RSB_PALETTE_SIZE
+            if self.lazyImages:
+                fileReader.skip_bytes(RSB_PALETTE_SIZE + self.header.width * self.header.height)
+                #Set before the header is validated, so the palette image is still loaded when the full color image can't be
+                self._pendingImageData = fileReader.bytes
+            else:
+                self.read_palette_image(fileReader)
 
         #in version 0 files, the bit mask is stored after the palette version of the image
         if self.header.version == 0:
@@ -48,9 +106,61 @@ class RSBImageFile(FileFormatReader):
             log.critical("Header not valid, aborting")
             return
 
-        #read full color image
-        self.imageFullColor = RSBImage()
-        self.imageFullColor.read_image(self.header.width, self.header.height, self.header.calculate_bytes_per_pixel(), fileReader)
+        self.imageFullColorOffset = fileReader.get_seekg()
+        if self.lazyImages:
+            fileReader.skip_bytes(self.header.calculate_full_color_data_size())
+            self._pendingImageData = fileReader.bytes
+        else:
+            self.read_full_color_image(fileReader)
+
+    def read_palette_image(self, fileReader: BinaryFileReader):
+        """Reads the palette and the 256 color image of version 0 files"""
+        #read palette
+        self._palette = RSBPalette()
+        self._palette.read(fileReader)
+
+        #read 256 color image
+        self._image256 = RSBImage()
+        bytesPerPixel = 1
+        self._image256.read_image(self.header.width, self.header.height, bytesPerPixel, fileReader)
+
+    def read_full_color_image(self, fileReader: BinaryFileReader):
+        """Reads the full color image, which may be DXT compressed"""
+        self._imageFullColor = RSBImage()
+        if self.header.isDXT:
+            self._imageFullColor.read_compressed_image(self.header.width, self.header.height, self.header.calculate_dxt_data_size(), fileReader)
+        else:
+            self._imageFullColor.read_image(self.header.width, self.header.height, self.header.calculate_bytes_per_pixel(), fileReader)
+
+    def load_images(self):
+        """Reads the palette and images skipped in lazy mode, if they haven't been read already"""
+        if self._pendingImageData is None:
+            return
+        fileReader = BinaryFileReader()
+        fileReader.open_buffer(self._pendingImageData, self.filepath)
+        self._pendingImageData = None
+        if self.paletteOffset is not None:
+            fileReader.seek(self.paletteOffset)
+            self.read_palette_image(fileReader)
+        #The full color image isn't read when the header is invalid
+        if self.imageFullColorOffset is not None:
+            fileReader.seek(self.imageFullColorOffset)
+            self.read_full_color_image(fileReader)
+        fileReader.close()
+
+    def read_probe_data(self):
+        """Reads the header and bit mask, skipping over the palette image in version 0 files"""
+        fileReader = self._filereader
+
+        self.header = RSBHeader()
+        self.header.read(fileReader)
+
+        if self.header.version == 0:
+            if self.header.containsPalette == 1:
+                #256 BGRA palette entries, followed by the 1 byte per pixel palette image
+                fileReader.skip_bytes(RSB_PALETTE_SIZE)
+                fileReader.skip_bytes(self.header.width * self.header.height)
+            self.header.read_bit_mask(fileReader)
 
     def convert_palette_image(self) -> Optional[PILImage.Image]:
         """
@@ -58,105 +168,73 @@ class RSBImageFile(FileFormatReader):
         If a palette image exists, a full color RGBA image will be returned
         If no palette image exists, None is returned
         """
-        if self.image256 is None:
+        paletteImage = self.convert_palette_image_pil_palette()
+        if paletteImage is None:
             return None
-        newImage = PILImage.new('RGBA', (self.header.width, self.header.height))
-        pixels = newImage.load()
-        for x in range(newImage.size[0]):    # for every col:
-            for y in range(newImage.size[1]):    # For every row
-                pixel_index = self.header.width * y + x
-                pixel_data = self.image256.get_pixel(pixel_index)
-                pixel_color = self.palette.get_color(ord(pixel_data))
-                #alpha is ignored as it caused fully invisible PNGs
-                pixels[x,y] = (pixel_color[0], pixel_color[1], pixel_color[2], 255) # set the colour accordingly, ignoring alpha
-        return newImage
+        #alpha is ignored as it caused fully invisible PNGs
+        return paletteImage.convert('RGBA')
 
     def convert_palette_image_pil_palette(self) -> Optional[PILImage.Image]:
         """
-        Converts the stored palettized version of the image into a full color RGBA image
+        Converts the stored palettized version of the image into a palette based PIL image, which can be saved as an 8 bit PNG
         If a palette image exists, a palette based PIL image will be returned
         If no palette image exists, None is returned
         """
-        if self.image256 is None:
+        image256 = self.image256
+        palette = self.palette
+        if image256 is None or palette is None:
             return None
-        log.debug("Palette conversion pending")
-        newImage = PILImage.new('P', (self.header.width, self.header.height))
-
-        newPalette = ImagePalette.ImagePalette(mode='RGBA')
-        for index, color in enumerate(self.palette.palette_entries):
-            newColorTuple = tuple(color[:3])
-            newPalette.colors[newColorTuple] = index
-            newPalette.palette[index] = newColorTuple[0]
-            newPalette.palette[index+256] = newColorTuple[1]
-            newPalette.palette[index+512] = newColorTuple[2]
-            newPalette.palette[index+768] = 128
-        newPalette.dirty = 1
-
-        imageData = []
-        for data in self.image256.image:
-            imageData.append(ord(data))
-        newImage.putdata(imageData)
-        newImage.palette = newPalette
-
+        newImage = PILImage.frombuffer('P', (self.header.width, self.header.height), bytes(image256.image), 'raw', 'P', 0, 1)
+        newImage.putpalette(palette.get_rgb_palette_bytes())
         return newImage
 
-
     def convert_full_color_image(self, force_alpha_channel: bool = False) -> PILImage.Image:
         """
         Converts the stored "full color" version of the image into a full color RGBA image with 8bpp
-        An alpha channel will only be generated if alpha information exists, or force_alpha_channel is True
+        An alpha channel will only be generated if alpha information exists, or force_alpha_channel is True. DXT compressed images always have an alpha channel
         """
+        if self.header.isDXT:
+            #Blocks are decoded by PIL's BCn decoder
+            return PILImage.frombytes('RGBA', (self.header.width, self.header.height), bytes(self.imageFullColor.image), 'bcn', DXT_BCN_FORMATS[self.header.dxtType])
+
         pixelformat = 'RGB'
         if self.header.bitDepthAlpha != 0 or force_alpha_channel:
             pixelformat = 'RGBA'
 
-        color_format = get_color_format(self.header.bitDepthRed, self.header.bitDepthGreen, self.header.bitDepthBlue, self.header.bitDepthAlpha)
-        color_lookup = get_color_lookup_table(color_format)
-        newImage = PILImage.new(pixelformat, (self.header.width, self.header.height))
-        pixels = newImage.load()
-        for x in range(newImage.size[0]):    # for every col:
-            for y in range(newImage.size[1]):    # For every row
-                pixel_index = self.header.width * y + x
-                pixel_data = self.imageFullColor.image[pixel_index]
-                pixel_color_16 = bytes_to_shortint(pixel_data)[0]
-                pixel_color = color_lookup[pixel_color_16]
-                if self.header.bitDepthAlpha == 0:
-                    #strip alpha channel if not required
-                    pixel_color = pixel_color[:3]
-                pixels[x,y] = tuple(pixel_color) # set the colour accordingly
-
-        return newImage
+        #Colors are decoded a whole channel at a time, with the alpha channel only included for RGBA images
+        image_data = decode_bitmask_ARGB_colors(self.imageFullColor.image, self.header.bitDepthRed, self.header.bitDepthGreen,
+                                                self.header.bitDepthBlue, self.header.bitDepthAlpha, len(pixelformat))
+        return PILImage.frombytes(pixelformat, (self.header.width, self.header.height), image_data)
+
+    def to_rgba8(self, colorkeyRGB: Optional[IntIterable] = None) -> Union[bytes, bytearray]:
+        """Decodes the full color image straight into a buffer of 8 bit RGBA data. Only DXT compressed images are decoded through a PIL image.
+        Images without an alpha channel are fully opaque. If colorkeyRGB is set, matching pixels are replaced with the colorkey and made transparent,
+        as in convert_full_color_image_with_colorkey_mask"""
+        if self.header.isDXT:
+            #DXT blocks can only be decoded through PIL
+            if colorkeyRGB is None:
+                return self.convert_full_color_image().tobytes()
+            return self.convert_full_color_image_with_colorkey_mask(colorkeyRGB).tobytes()
+
+        imageData = decode_bitmask_ARGB_colors(self.imageFullColor.image, self.header.bitDepthRed, self.header.bitDepthGreen,
+                                               self.header.bitDepthBlue, self.header.bitDepthAlpha, 4)
+        if colorkeyRGB is not None:
+            apply_color_key_mask_rgba8(imageData, list(colorkeyRGB), self.get_color_key_bitmask())
+        return imageData
+
+    def get_color_key_bitmask(self) -> Tuple[int, ...]:
+        """Returns the bitmask used to determine the precision of colorkey matches"""
+        if self.header.isDXT:
+            return DXT_RGBA_BITMASK
+        return self.header.get_rgba_bitmask_tuple()
 
     def check_color_key(self, imageColor: IntIterable, colorKey: IntIterable, bitmask: IntIterable) -> bool:
         """Checks if the image color matches the colorkey. Fuzzy match based on the precision allowed by the bitmask"""
-        #TODO: Improve matching
-        bMatched = True
-        log.debug("==NewColorComparison==")
         # pylint: disable=consider-using-enumerate
         for i in range(len(imageColor)):
-            elKey = colorKey[i]
-            elCol = imageColor[i]
-            elMaxValue = (2 ** bitmask[i]) - 1
-            bitmaskPrecision = (1 / elMaxValue) * 255
-            elKeyFactor = elKey / bitmaskPrecision
-            elKeyMin = int(int(elKeyFactor) * bitmaskPrecision)
-            elKeyMax = int(round((int(elKeyFactor) + 1) * bitmaskPrecision))
-
-            log.debug("elKey: %s", str(elKey))
-            log.debug("elCol: %s", str(elCol))
-            log.debug("bitmaskPrecision: %s", str(bitmaskPrecision))
-            log.debug("elKeyMin: %s", str(elKeyMin))
-            log.debug("elKeyMax: %s", str(elKeyMax))
-
-            #elKeyMin is actually from the range before generally speaking. In the case of a white key, elKeyMin and elKeyMax will match, so special case handling required.
-            if elCol <= elKeyMin or elCol > elKeyMax:
-                if elCol == elKey and elKey == 255:
-                    pass
-                elif elCol == elKey and elKey == 0:
-                    pass
-                else:
-                    bMatched = False
-        return bMatched
+            if not color_key_channel_matches(imageColor[i], colorKey[i], bitmask[i]):
+                return False
+        return True
 
     def convert_full_color_image_with_colorkey_mask(self, colorkeyRGB: IntIterable) -> PILImage.Image:
         """Converts the stored "full color" version of the image into a full color RGBA image with 8bpp
@@ -165,22 +243,68 @@ class RSBImageFile(FileFormatReader):
             return self.convert_full_color_image()
 
         newImage = self.convert_full_color_image(force_alpha_channel=True)
-        imageWidth, imageHeight = newImage.size
-        pixdata = newImage.load()
-
-        colorKey = list(colorkeyRGB)
-        colorKeyCopy = colorKey.copy()
-        colorKeyCopy.append(0)
-        colorKeyWithAlpha = tuple(colorKeyCopy)
-        bitmask = self.header.get_rgba_bitmask_tuple()
-        for y in range(imageHeight):
-            for x in range(imageWidth):
-                if self.check_color_key(pixdata[x, y][:3], colorKey, bitmask):
-                    pixdata[x, y] = colorKeyWithAlpha
+
+        apply_color_key_mask(newImage, list(colorkeyRGB), self.get_color_key_bitmask())
 
         return newImage
 
 
+def color_key_channel_matches(elCol: int, elKey: int, bitDepth: int) -> bool:
+    """Checks if a single 8 bit color channel matches the same channel in a colorkey. Fuzzy match based on the precision allowed by the channel's bit depth"""
+    #TODO: Improve matching
+    elMaxValue = (2 ** bitDepth) - 1
+    bitmaskPrecision = (1 / elMaxValue) * 255
+    elKeyFactor = elKey / bitmaskPrecision
+    elKeyMin = int(int(elKeyFactor) * bitmaskPrecision)
+    elKeyMax = int(round((int(elKeyFactor) + 1) * bitmaskPrecision))
+
+    #elKeyMin is actually from the range before generally speaking. In the case of a white key, elKeyMin and elKeyMax will match, so special case handling required.
+    if elCol <= elKeyMin or elCol > elKeyMax:
+        if elCol == elKey and elKey in (0, 255):
+            return True
+        return False
+    return True
+
+def apply_color_key_mask(image: PILImage.Image, colorKey: List[int], bitmask: IntIterable):
+    """Replaces every pixel in an RGBA image which matches colorKey with the colorkey, and makes it transparent"""
+    #Each channel is matched separately, and a pixel is only masked when all 3 channels match
+    channelMasks = []
+    for channel, elKey, bitDepth in zip(image.split()[:3], colorKey, bitmask):
+        channelMasks.append(channel.point(get_color_key_match_table(elKey, bitDepth)))
+    colorKeyMask = ImageChops.darker(ImageChops.darker(channelMasks[0], channelMasks[1]), channelMasks[2])
+    image.paste(tuple(colorKey) + (0,), None, colorKeyMask)
+
+def apply_color_key_mask_rgba8(imageData: bytearray, colorKey: List[int], bitmask: IntIterable):
+    """Replaces every pixel in a buffer of 8 bit RGBA data which matches colorKey with the colorkey, and makes it transparent. The buffer is modified in place"""
+    pixelCount = len(imageData) // 4
+    if pixelCount == 0:
+        return
+    #Each channel is translated to 0xFF where it matches and 0 where it doesn't, then the channels are combined as big integers,
+    #so every pixel is matched and replaced in C rather than in a python loop
+    allPixels = (1 << (8 * pixelCount)) - 1
+    colorKeyMask = allPixels
+    for channelIndex, elKey, bitDepth in zip(range(3), colorKey, bitmask):
+        channelMatches = imageData[channelIndex::4].translate(get_color_key_match_bytes(elKey, bitDepth))
+        colorKeyMask &= int.from_bytes(channelMatches, "little")
+    if colorKeyMask == 0:
+        return
+    keptPixels = allPixels ^ colorKeyMask
+    for channelIndex, keyValue in enumerate(colorKey[:3] + [0]):
+        channel = int.from_bytes(imageData[channelIndex::4], "little") & keptPixels
+        channel |= colorKeyMask & int.from_bytes(bytes([keyValue]) * pixelCount, "little")
+        imageData[channelIndex::4] = channel.to_bytes(pixelCount, "little")
+
+@functools.lru_cache(maxsize=None)
+def get_color_key_match_bytes(elKey: int, bitDepth: int) -> bytes:
+    """Returns get_color_key_match_table as a translation table for bytes.translate"""
+    return bytes(get_color_key_match_table(elKey, bitDepth))
+
+@functools.lru_cache(maxsize=None)
+def get_color_key_match_table(elKey: int, bitDepth: int) -> Tuple[int, ...]:
+    """Returns a lookup table for PIL.Image.point, which maps every 8 bit channel value to 255 if it matches elKey, or 0 if it doesn't"""
+    return tuple(255 if color_key_channel_matches(elCol, elKey, bitDepth) else 0 for elCol in range(256))
+
+
 class RSBHeader(BinaryFileDataStructure):
     """Reads and stores information in the header of RSB files"""
     def __init__(self):
@@ -202,10 +326,17 @@ class RSBHeader(BinaryFileDataStructure):
 
     def is_valid(self) -> bool:
         """Some images cause errors when converting, they seem to have invalid headers. Simple checks here identify bad headers"""
+        if self.isDXT:
+            #The bitmask doesn't describe DXT compressed images
+            return True
         if self.bitDepthAlpha + self.bitDepthBlue + self.bitDepthGreen + self.bitDepthRed == 0:
             return False
         if self.bitDepthAlpha + self.bitDepthBlue + self.bitDepthGreen + self.bitDepthRed > 32:
             return False
+        if max(self.get_rgba_bitmask_tuple()) > MAX_CHANNEL_BITDEPTH:
+            #Colors are decoded to 8 bits per channel, so wider channels can't be converted
+            log.error("Unsupported bitmask with channels wider than %d bits: %s", MAX_CHANNEL_BITDEPTH, str(self.get_rgba_bitmask_tuple()))
+            return False
         return True
 
     def calculate_bytes_per_pixel(self) -> int:
@@ -220,6 +351,19 @@ class RSBHeader(BinaryFileDataStructure):
             bitDepthTotal = self.bitDepthRed + self.bitDepthGreen + self.bitDepthBlue + self.bitDepthAlpha
             return bitDepthTotal // 8
 
+    def calculate_dxt_data_size(self) -> int:
+        """Calculates the size of DXT compressed image data. DXT1 stores 8 bytes for each 4x4 block of pixels, and other types store 16"""
+        blockCount = max(1, (self.width + 3) // 4) * max(1, (self.height + 3) // 4)
+        if self.dxtType == 0:
+            return blockCount * 8
+        return blockCount * 16
+
+    def calculate_full_color_data_size(self) -> int:
+        """Calculates the size of the full color image data"""
+        if self.isDXT:
+            return self.calculate_dxt_data_size()
+        return self.width * self.height * self.calculate_bytes_per_pixel()
+
     def read_bit_mask(self, filereader: BinaryFileReader):
         """Reads the bitmask for each color channel. May be stored outside of the header in Version 0 files"""
         #bit depth information
@@ -252,7 +396,7 @@ class RSBHeader(BinaryFileDataStructure):
             #process 3 more variables
             self.unknown2 = filereader.read_uint32()
             self.unknown3 = filereader.read_uint32()
-            self.unknown4 = filereader.read_bytes(1)
+            self.unknown4 = bytes(filereader.read_bytes(1))
 
         if self.version > 0:
             #bit depth information
@@ -277,6 +421,13 @@ class RSBPalette(BinaryFileDataStructure):
         """Retrieves the color stored at the index"""
         return self.palette_entries[index]
 
+    def get_rgb_palette_bytes(self) -> bytes:
+        """Returns the palette as packed 8 bit RGB values, ignoring alpha, in the layout used by PIL.Image.putpalette"""
+        paletteData = bytearray()
+        for color in self.palette_entries:
+            paletteData.extend(color[:3])
+        return bytes(paletteData)
+
     def print_palette(self):
         """Debug function to print all colors stored in the palette"""
         for i, color in enumerate(self.palette_entries):
@@ -292,17 +443,27 @@ class RSBPalette(BinaryFileDataStructure):
             self.palette_entries.append(temp)
 
 class RSBImage(BinaryFileDataStructure):
-    """Reads and stores the image data of RSB files"""
+    """Reads and stores the image data of RSB files
+    The pixels are kept in a single contiguous block, in rows of stride bytes"""
     def __init__(self):
         super(RSBImage, self).__init__()
-        self.image: List[bytes] = []
+        self.image: bytes = b''
+        self.width: int = 0
+        self.height: int = 0
+        self.bytesPerPixel: int = 0
+        self.stride: int = 0
+
+    def get_pixel_count(self) -> int:
+        """Returns the number of pixels stored in the image"""
+        return self.width * self.height
 
-    def get_pixel(self, index: int) -> bytes:
+    def get_pixel(self, index: int) -> BytesLike:
         """Retrieves the pixel stored at the specified index"""
-        if index >= len(self.image):
+        if index < 0 or index >= self.get_pixel_count():
             log.error("Invalid index: %d", index)
             return b'0'
-        return self.image[index]
+        pixelStart = index * self.bytesPerPixel
+        return self.image[pixelStart:pixelStart + self.bytesPerPixel]
 
     def read(self, filereader: BinaryFileReader):
         super().read(filereader)
@@ -310,6 +471,17 @@ class RSBImage(BinaryFileDataStructure):
 
     def read_image(self, width: int, height: int, bytes_per_pixel: int, filereader: BinaryFileReader):
         """Reads data from the file that is to be interpreted as an image. Size of data read is determined by resolution and bytes per pixel. Image is not converted to RGBA image here, as the data can be a number of internal formats"""
-        self.image = []
-        for _ in range(width*height):
-            self.image.append(filereader.read_bytes(bytes_per_pixel))
+        self.width = width
+        self.height = height
+        self.bytesPerPixel = bytes_per_pixel
+        self.stride = width * bytes_per_pixel
+        # Copied, so a memory mapped file can be unmapped as soon as it has been read
+        self.image = bytes(filereader.read_bytes(self.stride * height))
+
+    def read_compressed_image(self, width: int, height: int, data_size: int, filereader: BinaryFileReader):
+        """Reads block compressed image data, such as DXT. get_pixel can't be used with compressed images"""
+        self.width = width
+        self.height = height
+        self.bytesPerPixel = 0
+        self.stride = 0
+        self.image = bytes(filereader.read_bytes(data_size))
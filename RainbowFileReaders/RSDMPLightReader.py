@@ -2,7 +2,8 @@
 
 from typing import List
 
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, SizedCString, BinaryFileReader
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, SizedCString, TYPECODE_UINT32, TYPECODE_UINT8, TYPECODE_FLOAT
+from FileUtilities.BinaryStructSchema import BinaryStructSchema, SchemaField, SchemaAlias, SchemaBranch, FIELD_SIZED_CSTRING, is_version_string
 
 
 class RSDMPLightFile(FileFormatReader):
@@ -28,48 +29,64 @@ class RSDMPLightFile(FileFormatReader):
 
 class RSDMPHeader(BinaryFileDataStructure):
     """Reads and stores the header of DMP files from Rogue Spear"""
+    schema = BinaryStructSchema([
+        SchemaField("FileID", TYPECODE_UINT32),
+        SchemaField("AmbientLightColor", TYPECODE_FLOAT, 4),
+        SchemaField("unknown5", TYPECODE_UINT32),
+        SchemaField("lightCount", TYPECODE_UINT32),
+    ])
+
     def __init__(self):
         super(RSDMPHeader, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.FileID: int = filereader.read_uint32()
-        self.AmbientLightColor: List[float] = filereader.read_vec_f(4)
-        self.unknown5: int = filereader.read_uint32()
-        self.lightCount: int = filereader.read_uint32()
+        self.FileID: int = None
+        self.AmbientLightColor: List[float] = None
+        self.unknown5: int = None
+        self.lightCount: int = None
 
 class RSDMPLight(BinaryFileDataStructure):
     """Reads and stores Light structures from Rogue spear DMP files."""
+    schema = BinaryStructSchema([
+        SchemaField("parent_room_string", FIELD_SIZED_CSTRING),
+        SchemaField("name_string", FIELD_SIZED_CSTRING),
+        SchemaBranch(is_version_string("name_string"), [
+            SchemaAlias("version_string", "name_string"),
+            SchemaField("versionNumber", TYPECODE_UINT32),
+            SchemaField("name_string", FIELD_SIZED_CSTRING),
+            SchemaField("unknown6", TYPECODE_UINT8),
+        ]),
+        SchemaField("lightType", TYPECODE_UINT32),
+        SchemaField("direction", TYPECODE_FLOAT, 3),
+        SchemaField("position", TYPECODE_FLOAT, 3),
+        SchemaField("falloff", TYPECODE_FLOAT),
+        SchemaField("unknown2", TYPECODE_FLOAT, 2),
+        SchemaField("unknown3", TYPECODE_FLOAT, 3),
+        SchemaField("energy", TYPECODE_FLOAT),
+        SchemaField("diffuseColor", TYPECODE_FLOAT, 4),
+        SchemaField("specularColor", TYPECODE_FLOAT, 4),
+        SchemaField("ambientColor", TYPECODE_FLOAT, 4),
+        SchemaField("constantAttenuation", TYPECODE_FLOAT),
+        SchemaField("linearAttenuation", TYPECODE_FLOAT),
+        SchemaField("quadraticAttenuation", TYPECODE_FLOAT),
+        SchemaField("spotlightConeAngle", TYPECODE_FLOAT),
+        SchemaField("type", TYPECODE_UINT8),
+    ])
+
     def __init__(self):
         super(RSDMPLight, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.parent_room_string: SizedCString = SizedCString(filereader)
-
-        self.name_string: SizedCString = SizedCString(filereader)
-        if self.name_string.string == "Version":
-            self.version_string: SizedCString = self.name_string
-            self.versionNumber: int = filereader.read_uint32()
-            self.name_string = SizedCString(filereader)
-
-            self.unknown6: int = filereader.read_bytes(1)[0]
-
-        self.lightType: int = filereader.read_uint32()
-        self.direction: List[float] = filereader.read_vec_f(3)
-        self.position: List[float] = filereader.read_vec_f(3)
-        self.falloff: float = filereader.read_float()
-        self.unknown2: List[float] = filereader.read_vec_f(2)
-        self.unknown3: List[float] = filereader.read_vec_f(3)
-
-        self.energy: float = filereader.read_float()
-        self.diffuseColor: List[float] = filereader.read_vec_f(4)
-        self.specularColor: List[float] = filereader.read_vec_f(4)
-        self.ambientColor: List[float] = filereader.read_vec_f(4)
-        self.constantAttenuation: float = filereader.read_float()
-        self.linearAttenuation: float = filereader.read_float()
-        self.quadraticAttenuation: float = filereader.read_float()
-        self.spotlightConeAngle: float = filereader.read_float()
-        self.type: int = filereader.read_bytes(1)[0]
+        self.parent_room_string: SizedCString = None
+        self.name_string: SizedCString = None
+        self.lightType: int = None
+        self.direction: List[float] = None
+        self.position: List[float] = None
+        self.falloff: float = None
+        self.unknown2: List[float] = None
+        self.unknown3: List[float] = None
+        self.energy: float = None
+        self.diffuseColor: List[float] = None
+        self.specularColor: List[float] = None
+        self.ambientColor: List[float] = None
+        self.constantAttenuation: float = None
+        self.linearAttenuation: float = None
+        self.quadraticAttenuation: float = None
+        self.spotlightConeAngle: float = None
+        self.type: int = None
@@ -4,7 +4,8 @@ from __future__ import annotations
 
 from typing import List, Tuple, Dict
 
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, SizedCString, BinaryFileReader
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, SizedCString, BinaryFileReader, FloatVectorSequence, TYPECODE_UINT32, TYPECODE_FLOAT
+from FileUtilities.BinaryStructSchema import BinaryStructSchema, SchemaField, SchemaAlias, SchemaBranch, FIELD_SIZED_CSTRING, is_version_string
 from RainbowFileReaders.R6Constants import RSEGeometryFlags
 from RainbowFileReaders.MathHelpers import normalize_color, pad_color, IntIterable
 from RainbowFileReaders.RenderableArray import RenderableArray
@@ -24,6 +25,20 @@ class RSEGeometryListHeader(BinaryFileDataStructure):
 
 class R6GeometryObject(BinaryFileDataStructure):
     """Reads and stores a Rainbow Six Geometry Object"""
+    headerSchema = BinaryStructSchema([
+        SchemaField("size", TYPECODE_UINT32),
+        SchemaField("ID", TYPECODE_UINT32),
+        SchemaField("name_string", FIELD_SIZED_CSTRING),
+        #If the version string was actually set to version, then a version number is stored, along with object name
+        SchemaBranch(is_version_string("name_string"), [
+            SchemaAlias("version_string", "name_string"),
+            SchemaField("versionNumber", TYPECODE_UINT32),
+            SchemaField("name_string", FIELD_SIZED_CSTRING),
+            SchemaField("unknown4", TYPECODE_UINT32),
+            SchemaField("unknown5", TYPECODE_UINT32),
+        ]),
+    ])
+
     def __init__(self):
         super(R6GeometryObject, self).__init__()
         self.size: int = None
@@ -34,7 +49,7 @@ class R6GeometryObject(BinaryFileDataStructure):
         self.unknown4: int = None
         self.unknown5: int = None
         self.vertexCount: int = None
-        self.vertices: List[List[float]] = []
+        self.vertices: FloatVectorSequence = []
         self.vertexParamsCount: int = None
         self.vertexParams: List[R6VertexParameterCollection] = None
         self.faceCount: int = None
@@ -110,23 +125,12 @@ class R6GeometryObject(BinaryFileDataStructure):
 
     def read_header_info(self, filereader: BinaryFileReader):
         """Reads top level information for this data structure"""
-        self.size = filereader.read_uint32()
-        self.ID = filereader.read_uint32()
-        self.name_string = SizedCString(filereader)
-        #If the version string was actually set to version, then a version number is stored, along with object name
-        if self.name_string.string == 'Version':
-            self.version_string = self.name_string
-            self.versionNumber = filereader.read_uint32()
-            self.name_string = SizedCString(filereader)
-            self.unknown4 = filereader.read_uint32()
-            self.unknown5 = filereader.read_uint32()
+        self.headerSchema.read(self, filereader)
 
     def read_vertices(self, filereader: BinaryFileReader):
         """ Reads a count of the number of vertices, followed by the list of vertices """
         self.vertexCount = filereader.read_uint32()
-        self.vertices = []
-        for _ in range(self.vertexCount):
-            self.vertices.append(filereader.read_vec_f(3))
+        self.vertices = filereader.read_vec_f_block(self.vertexCount, 3)
 
     def read_vertex_params(self, filereader: BinaryFileReader):
         """ Reads a count of the number of vertex parameters, followed by the list of vertex parameters """
@@ -157,6 +161,13 @@ class R6GeometryObject(BinaryFileDataStructure):
 
 class R6VertexParameterCollection(BinaryFileDataStructure):
     """ Contains a given pair/set of attributes for a particular vertex. Contains, normal, UV and color values """
+    schema = BinaryStructSchema([
+        SchemaField("normal", TYPECODE_FLOAT, 3),
+        SchemaField("UV", TYPECODE_FLOAT, 2),
+        SchemaField("unknown10", TYPECODE_FLOAT), # no idea?
+        SchemaField("color", TYPECODE_UINT32, 3),
+    ])
+
     def __init__(self):
         super(R6VertexParameterCollection, self).__init__()
         self.normal: List[float] = None
@@ -164,26 +175,21 @@ class R6VertexParameterCollection(BinaryFileDataStructure):
         self.unknown10: float = None
         self.color: List[int] = None
 
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.normal = filereader.read_vec_f(3)
-        self.UV = filereader.read_vec_f(2)
-        self.unknown10 = filereader.read_float() # no idea?
-        self.color = filereader.read_rgb_color_24bpp_uint()
-
 class R6FaceDefinition(BinaryFileDataStructure):
     """ Contains a list of properties for an individual face. Contains indices for the vertices and parameters, as well as the face normal and material assigned """
+    schema = BinaryStructSchema([
+        SchemaField("vertexIndices", TYPECODE_UINT32, 3),
+        SchemaField("paramIndices", TYPECODE_UINT32, 3),
+        SchemaField("faceNormal", TYPECODE_FLOAT, 4),
+        SchemaField("materialIndex", TYPECODE_UINT32),
+    ])
+
     def __init__(self):
         super(R6FaceDefinition, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.vertexIndices: List[int] = filereader.read_vec_uint32(3)
-        self.paramIndices: List[int] = filereader.read_vec_uint32(3)
-        self.faceNormal: List[float] = filereader.read_vec_f(4)
-        self.materialIndex: int = filereader.read_uint32()
+        self.vertexIndices: List[int] = None
+        self.paramIndices: List[int] = None
+        self.faceNormal: List[float] = None
+        self.materialIndex: int = None
 
 class R6MeshDefinition(BinaryFileDataStructure):
     """ Contains a list of faces that make up this mesh, as well as some associated properties """
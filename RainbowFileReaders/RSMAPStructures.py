@@ -2,9 +2,10 @@
 
 import logging
 
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Sequence
 
-from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, BinaryFileReader, SizedCString
+from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, BinaryFileReader, SizedCString, FloatVectorSequence, TYPECODE_UINT32, TYPECODE_UINT16, TYPECODE_FLOAT
+from FileUtilities.BinaryStructSchema import BinaryStructSchema, SchemaField, FIELD_SIZED_CSTRING
 from FileUtilities.LoggingUtils import log_pprint
 from RainbowFileReaders import R6Constants
 from RainbowFileReaders.MathHelpers import IntIterable, pad_color
@@ -13,8 +14,20 @@ from RainbowFileReaders.R6Constants import RSEGeometryFlags
 
 log = logging.getLogger(__name__)
 
+# Header shared by RSMAPGeometryObject and RSMAPGeometryData
+RSMAP_GEOMETRY_HEADER_SCHEMA = BinaryStructSchema([
+    SchemaField("size", TYPECODE_UINT32),
+    SchemaField("id", TYPECODE_UINT32),
+    SchemaField("version_string", FIELD_SIZED_CSTRING),
+    SchemaField("versionNumber", TYPECODE_UINT32),
+    SchemaField("name_string", FIELD_SIZED_CSTRING),
+])
+
 class RSMAPGeometryObject(BinaryFileDataStructure):
     """Geometry Object used in Rogue Spear maps"""
+    schema = RSMAP_GEOMETRY_HEADER_SCHEMA
+    headerSchema = RSMAP_GEOMETRY_HEADER_SCHEMA
+
     def __init__(self):
         super(RSMAPGeometryObject, self).__init__()
         self.size: int = 0
@@ -27,17 +40,13 @@ class RSMAPGeometryObject(BinaryFileDataStructure):
     def read(self, filereader: BinaryFileReader):
         super().read(filereader)
 
-        self.size = filereader.read_uint32()
-        self.id = filereader.read_uint32()
-
-        self.version_string = SizedCString(filereader)
-        self.versionNumber = filereader.read_uint32()
-
-        self.name_string = SizedCString(filereader)
-
         self.geometryData = RSMAPGeometryData()
         self.geometryData.read(filereader)
 
+    def read_header_info(self, filereader: BinaryFileReader):
+        """Reads only the header of this object, which includes the name"""
+        self.headerSchema.read(self, filereader)
+
 class RSMAPFaceGroup(BinaryFileDataStructure):
     """Data structure defining a group of face definitions and some associated data"""
     def __init__(self):
@@ -50,12 +59,9 @@ class RSMAPFaceGroup(BinaryFileDataStructure):
 
         self.faceCount: int = filereader.read_uint32()
 
-        self.faceNormals: List[List[float]] = []
-        self.faceDistancesFromOrigin: List[float] = []
-
-        for _ in range(self.faceCount):
-            self.faceNormals.append(filereader.read_vec_f(3))
-            self.faceDistancesFromOrigin.append(filereader.read_float())
+        self.faceNormals: FloatVectorSequence
+        self.faceDistancesFromOrigin: Sequence[float]
+        self.faceNormals, self.faceDistancesFromOrigin = filereader.read_vec_f_block_with_scalar(self.faceCount, 3)
 
         self.faceVertexIndices: List[List[int]] = []
         for _ in range(self.faceCount):
@@ -92,13 +98,7 @@ class RSMAPGeometryData(BinaryFileDataStructure):
 
     def read_header_info(self, filereader: BinaryFileReader):
         """Reads top level information for this data structure"""
-        self.size = filereader.read_uint32()
-        self.id = filereader.read_uint32()
-
-        self.version_string = SizedCString(filereader)
-        self.versionNumber = filereader.read_uint32()
-
-        self.name_string = SizedCString(filereader)
+        RSMAP_GEOMETRY_HEADER_SCHEMA.read(self, filereader)
 
     def generate_renderable_array_for_facegroup(self, facegroup: RSMAPFaceGroup):
         """ Generates a RenderableArray object from the internal data structure """
@@ -151,9 +151,7 @@ class RSMAPGeometryData(BinaryFileDataStructure):
     def read_vertices(self, filereader: BinaryFileReader):
         """Reads the list of vertices from the file"""
         self.vertexCount = filereader.read_uint32()
-        self.vertices: List[List[float]] = []
-        for _ in range(self.vertexCount):
-            self.vertices.append(filereader.read_vec_f(3))
+        self.vertices: FloatVectorSequence = filereader.read_vec_f_block(self.vertexCount, 3)
 
     def read_face_groups(self, filereader: BinaryFileReader):
         """Reads the list of RSMAPFaceGroups from the file"""
@@ -175,17 +173,9 @@ class RSMAPVertexParameterCollection(BinaryFileDataStructure):
 
         self.vertexParamCount: int = filereader.read_uint32()
 
-        self.normals: List[List[float]] = []
-        for _ in range(self.vertexParamCount):
-            self.normals.append(filereader.read_vec_f(3))
-
-        self.UVs: List[List[float]] = []
-        for _ in range(self.vertexParamCount):
-            self.UVs.append(filereader.read_vec_f(2))
-
-        self.colors: List[List[float]] = []
-        for _ in range(self.vertexParamCount):
-            self.colors.append(filereader.read_vec_f(4))
+        self.normals: FloatVectorSequence = filereader.read_vec_f_block(self.vertexParamCount, 3)
+        self.UVs: FloatVectorSequence = filereader.read_vec_f_block(self.vertexParamCount, 2)
+        self.colors: FloatVectorSequence = filereader.read_vec_f_block(self.vertexParamCount, 4)
 
 class RSMAPCollisionInformation(BinaryFileDataStructure):
     """Stores more geometry which is specifically used for collision, pathing, and map planning etc"""
@@ -195,10 +185,10 @@ class RSMAPCollisionInformation(BinaryFileDataStructure):
         # These vertices and normals don't line up with the vertex and normal indices.
         # I suspect these are used for bounding boxes / simplified geometry
         self.vertexCount: int = 0
-        self.vertices: List[List[float]] = []
+        self.vertices: FloatVectorSequence = []
         self.normalCount: int = 0
-        self.normals: List[List[float]] = []
-        self.faceDistancesFromOrigin: List[float] = []
+        self.normals: FloatVectorSequence = []
+        self.faceDistancesFromOrigin: Sequence[float] = []
 
         # Face definitions
         self.faceCount: int = 0
@@ -259,19 +249,10 @@ class RSMAPCollisionInformation(BinaryFileDataStructure):
         super().read(filereader)
 
         self.vertexCount = filereader.read_uint32()
-
-        self.vertices = []
-        for _ in range(self.vertexCount):
-            self.vertices.append(filereader.read_vec_f(3))
+        self.vertices = filereader.read_vec_f_block(self.vertexCount, 3)
 
         self.normalCount = filereader.read_uint32()
-
-        self.normals = []
-        self.faceDistancesFromOrigin = []
-
-        for _ in range(self.normalCount):
-            self.normals.append(filereader.read_vec_f(3))
-            self.faceDistancesFromOrigin.append(filereader.read_float())
+        self.normals, self.faceDistancesFromOrigin = filereader.read_vec_f_block_with_scalar(self.normalCount, 3)
 
         self.faceCount = filereader.read_uint32()
 
@@ -290,19 +271,19 @@ class RSMAPCollisionInformation(BinaryFileDataStructure):
 
 class RSMAPCollisionFaceInformation(BinaryFileDataStructure):
     """Defines a face for a mesh, specifically collision related"""
+    schema = BinaryStructSchema([
+        SchemaField("vertexIndices", TYPECODE_UINT16, 3),
+        SchemaField("unknown1", TYPECODE_UINT16),
+        SchemaField("normalIndices", TYPECODE_UINT16, 3),
+        SchemaField("unknown2", TYPECODE_UINT16),
+    ])
+
     def __init__(self):
         super(RSMAPCollisionFaceInformation, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        self.vertexIndices: List[int] = filereader.read_vec_uint16(3)
-
-        self.unknown1: int = filereader.read_uint16()
-
-        self.normalIndices: List[int] = filereader.read_vec_uint16(3)
-
-        self.unknown2: int = filereader.read_uint16()
+        self.vertexIndices: List[int] = None
+        self.unknown1: int = None
+        self.normalIndices: List[int] = None
+        self.unknown2: int = None
 
 
 class RSMAPCollisionMesh(BinaryFileDataStructure):
@@ -387,16 +368,18 @@ class RSMAPShermanLevelDefinition(BinaryFileDataStructure):
 
 class RSMAPShermanLevelTransformInformation(BinaryFileDataStructure):
     """Defines a transform used for a level? Still decoding"""
+    schema = BinaryStructSchema([
+        #3x3 matrix = 9 elements
+        SchemaField("transformMatrix", TYPECODE_FLOAT, 9),
+        SchemaField("position", TYPECODE_FLOAT, 3),
+        SchemaField("unknown2", TYPECODE_FLOAT, 6), #size?
+    ])
+
     def __init__(self):
         super(RSMAPShermanLevelTransformInformation, self).__init__()
-
-    def read(self, filereader: BinaryFileReader):
-        super().read(filereader)
-
-        #3x3 matrix = 9 elements
-        self.transformMatrix: List[float] = filereader.read_vec_f(9)
-        self.position: List[float] = filereader.read_vec_f(3)
-        self.unknown2: List[float] = filereader.read_vec_f(6) #size?
+        self.transformMatrix: List[float] = None
+        self.position: List[float] = None
+        self.unknown2: List[float] = None
 
 class RSMAPShermanLevelTransitionList(BinaryFileDataStructure):
     """This is related to the portal system and traversal between floors, but exact details and usage is still TBD"""
@@ -426,13 +409,17 @@ class RSMAPShermanLevelTransitionList(BinaryFileDataStructure):
 
 class RSMAPShermanLevelTransitionDefinition(BinaryFileDataStructure):
     """This is related to the portal system and traversal between floors, but exact details and usage is still TBD"""
+    schema = BinaryStructSchema([
+        SchemaField("name_string", FIELD_SIZED_CSTRING),
+        SchemaField("coords", TYPECODE_FLOAT, 6),
+    ])
+
     def __init__(self):
         super(RSMAPShermanLevelTransitionDefinition, self).__init__()
+        self.name_string: SizedCString = None
+        self.coords: List[float] = None
 
     def read(self, filereader: BinaryFileReader):
         super().read(filereader)
 
-        self.name_string: SizedCString = SizedCString(filereader)
         log.debug(self.name_string.string)
-
-        self.coords: List[float] = filereader.read_vec_f(6)
@@ -1,12 +1,12 @@
 """Provides classes that will read and parse SOB model files."""
 
-from typing import List
+from typing import Dict, List
 
 from FileUtilities.BinaryConversionUtilities import BinaryFileDataStructure, FileFormatReader, SizedCString, BinaryFileReader
 from RainbowFileReaders import R6Settings
 from RainbowFileReaders.RSEMaterialDefinition import RSEMaterialDefinition, RSEMaterialListHeader
 from RainbowFileReaders.CXPMaterialPropertiesReader import load_relevant_cxps
-from RainbowFileReaders.RSEGeometryDataStructures import R6GeometryObject, RSEGeometryListHeader
+from RainbowFileReaders.RSEGeometryDataStructures import R6GeometryObject, R6MeshDefinition, RSEGeometryListHeader
 
 class SOBModelFile(FileFormatReader):
     """Class to read full SOB files"""
@@ -19,6 +19,13 @@ class SOBModelFile(FileFormatReader):
         self.geometryObjects: List[R6GeometryObject] = []
         self.footer: SOBFooterDefinition = None
 
+    @classmethod
+    def get_indexed_structure_types(cls) -> Dict[type, str]:
+        return {
+            R6GeometryObject: "geometryObject",
+            R6MeshDefinition: "mesh",
+        }
+
     def read_data(self):
         super().read_data()
 
@@ -62,6 +69,22 @@ class SOBModelFile(FileFormatReader):
         self.footer = SOBFooterDefinition()
         self.footer.read(fileReader)
 
+    def read_probe_data(self):
+        """Reads the header, the material list header and the first material"""
+        fileReader = self._filereader
+
+        self.header = SOBHeader()
+        self.header.read(fileReader)
+
+        self.materialListHeader = RSEMaterialListHeader()
+        self.materialListHeader.read(fileReader)
+
+        self.materials = []
+        if self.materialListHeader.numMaterials > 0:
+            newMaterial = RSEMaterialDefinition()
+            newMaterial.read(fileReader)
+            self.materials.append(newMaterial)
+
 
 class SOBHeader(BinaryFileDataStructure):
     """Contains the information stored in the file formats header structure"""
@@ -14,6 +14,7 @@ from RainbowFileReaders.MathHelpers import Vector
 from FileUtilities.Settings import load_settings
 from FileUtilities import DirectoryProcessor
 from FileUtilities import JSONMetaInfo, OBJModelWriter
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path, set_cache_root
 
 log = logging.getLogger(__name__)
 
@@ -30,8 +31,8 @@ def convert_SOB(filename):
     meta = JSONMetaInfo.JSONMetaInfo()
     meta.add_info("filecontents", modelFile)
     meta.add_info("filename", filename)
-    newFilename = filename + ".JSON"
-    meta.writeJSON(newFilename)
+    with atomic_write_path(get_cache_path(filename, ".JSON")) as tempPath:
+        meta.writeJSON(tempPath)
 
     countBadNormals = 0
     countGoodNormals = 0
@@ -48,7 +49,8 @@ def convert_SOB(filename):
         log.info("Num bad normals: %d", countBadNormals)
     log.info("Num good normals: %d", countGoodNormals)
 
-    write_OBJ(filename + ".obj", modelFile)
+    with atomic_write_path(get_cache_path(filename, ".obj")) as tempPath:
+        write_OBJ(tempPath, modelFile)
 
     log.info("===============================================")
 
@@ -76,6 +78,7 @@ def write_OBJ(filename, SOBObject: SOBModelFile):
 def main():
     """Main function that converts test data files"""
     settings = load_settings()
+    set_cache_root(settings.get("cacheRoot"))
 
     fp = DirectoryProcessor.DirectoryProcessor()
     fp.paths.append(settings["gamePath"])
@@ -1,8 +1,7 @@
 """This moduled defines classes and functions related to importing RSE assets into Unreal"""
 import os
 import logging
-from typing import List, Dict
-from PIL import Image as PILImage # type: ignore
+from typing import List, Dict, Optional
 
 # pylint: disable=no-member, broad-except
 # Disabled no-member for this module since a lot of functionality exposed by UnrealEnginePython doesn't exist outside of unreal and generates false positives
@@ -26,11 +25,16 @@ from RainbowFileReaders.MathHelpers import AxisAlignedBoundingBox
 from RainbowFileReaders.MAPLevelReader import RSEMAPPortalList
 from RainbowFileReaders.RSMAPStructures import RSMAPGeometryObject
 from RainbowFileReaders.RSEGeometryDataStructures import R6GeometryObject
+from FileUtilities import DDSFile
+from FileUtilities import ImageCache
+from FileUtilities import CacheDirectory
 
 from UnrealImporters import ImporterSettings
 
 log = logging.getLogger(__name__)
 
+CacheDirectory.set_cache_root(ImporterSettings.CACHE_ROOT)
+
 ue.log('Initializing SOB File importer')
 
 bp_RoomComponent = None
@@ -161,29 +165,47 @@ class RSEResourceLoader:
         if os.path.isfile(texturePath) is False:
             ue.log("Could not find texture to load: " + texturePath)
             return None
-        image = None
 
-        # Attempt to load PNG version which will be quicker
-        PNGFilename = texturePath + ImporterSettings.PNG_CACHE_FILE_SUFFIX
-        imageFile = None
-        if os.path.isfile(PNGFilename) and ImporterSettings.bUsePNGCache:
-            image = PILImage.open(PNGFilename)
+        # Attempt to load DDS or cached version which will be quicker
+        DDSFilename = CacheDirectory.get_cache_path(texturePath, ImporterSettings.DDS_CACHE_FILE_SUFFIX)
+        cacheFormat = ImageCache.get_image_cache_format(ImporterSettings.IMAGE_CACHE_FORMAT)
+        cacheFilename = ImageCache.get_image_cache_path(texturePath, cacheFormat)
+        imageData: Optional[ImageCache.ImageData] = None
+        ddsTexture: Optional[DDSFile.DDSTexture] = None
+        if os.path.isfile(DDSFilename) and ImporterSettings.bUseDDSCache:
+            ddsTexture = DDSFile.read_dds(DDSFilename)
+
+        pixelFormat = EPixelFormat.PF_R8G8B8A8
+        if ddsTexture is not None:
+            # The top level of the mip chain is already in a format the GPU can use, so no decoding is required
+            imageWidth = ddsTexture.width
+            imageHeight = ddsTexture.height
+            imageData = ddsTexture.levels[0]
+            if ddsTexture.format == DDSFile.DDSFormat.BC1:
+                pixelFormat = EPixelFormat.PF_DXT1
+            elif ddsTexture.format == DDSFile.DDSFormat.BC3:
+                pixelFormat = EPixelFormat.PF_DXT5
         else:
-            imageFile = RSBImageReader.RSBImageFile()
+            # Only the header is read until the image data is needed, as the dimensions are all that's required to load a cached image
+            imageFile = RSBImageReader.RSBImageFile(lazyImages=True)
             imageFile.read_file(texturePath)
-            colokeyMask = (colorKeyR, colorKeyG, colorKeyB)
-            image = imageFile.convert_full_color_image_with_colorkey_mask(colokeyMask)
-            if ImporterSettings.bUsePNGCache:
-                #Save this image as it will be quicker to load in future
-                image.save(PNGFilename, "PNG")
-
-        imageWidth, imageHeight = image.size
-
-        #TODO: generate mip maps
-        newTexture = ue.create_transient_texture(imageWidth, imageHeight, EPixelFormat.PF_R8G8B8A8)
-        if image.mode == 'RGB':
-            image.putalpha(255)
-        newTexture.texture_set_data(image.tobytes())
+            imageWidth = imageFile.header.width
+            imageHeight = imageFile.header.height
+            if os.path.isfile(cacheFilename) and ImporterSettings.bUseImageCache:
+                imageData = cacheFormat.load(cacheFilename, imageWidth, imageHeight)
+
+            if imageData is None:
+                colokeyMask = (colorKeyR, colorKeyG, colorKeyB)
+                # Decode straight to RGBA, avoiding PIL unless the image needs to be cached
+                imageData = imageFile.to_rgba8(colokeyMask)
+                if ImporterSettings.bUseImageCache:
+                    #Save this image as it will be quicker to load in future
+                    cacheFormat.save(cacheFilename, imageWidth, imageHeight, imageData)
+
+        # Transient textures are created with a single mip, so only the top level of a DDS mip chain is uploaded and the other levels are unused
+        newTexture = ue.create_transient_texture(imageWidth, imageHeight, pixelFormat)
+        newTexture.texture_set_data(bytes(imageData))
+        #TODO: create textures with a full mip chain, and upload the DDS levels or generated mip maps to it
 
         textureAddressModeConstant = TextureAddress.TA_Wrap
         if textureAddressMode == 1: #WRAP
@@ -371,6 +393,8 @@ class MAPLevel(RSEResourceLoader):
 
     def import_level_heights(self, MAPFile: MAPLevelReader.MAPLevelFile):
         """Imports a level height definition from the map data structure"""
+        if MAPFile.planningLevelList is None:
+            return
         for level in MAPFile.planningLevelList.planningLevels:
             adjustedHeight = level.floorHeight - self.worldOffsetVec[2]
             #self.worldOffsetVec[2]
@@ -379,6 +403,8 @@ class MAPLevel(RSEResourceLoader):
     def import_r6_lights(self, MAPFile: MAPLevelReader.MAPLevelFile):
         """Imports lights in the rainbow six format light list"""
         #Import lightlist
+        if MAPFile.lightList is None:
+            return
         for r6LightDef in MAPFile.lightList.lights:
             # Place lamp to a specified location
             position = arrayvector_to_fvector(r6LightDef.position, True)
@@ -540,6 +566,8 @@ class MAPLevel(RSEResourceLoader):
 
     def import_rooms(self, MAPFile: MAPLevelReader.MAPLevelFile):
         """Imports room volumes to for portals and occlusion checking"""
+        if MAPFile.roomList is None:
+            return
         for room in MAPFile.roomList.rooms:
             for levelDef in room.shermanLevels:
                 aabb = levelDef.get_aabb()
@@ -602,7 +630,8 @@ class MAPLevel(RSEResourceLoader):
                 if isinstance(geoObjectDefinition, RSMAPGeometryObject):
                     self.import_rogue_spear_geometry_object(geoObjectDefinition, geoObjComponent)
 
-        self.objectsToShift.extend(self.import_portals(MAPFile.portalList))
+        if MAPFile.portalList is not None:
+            self.objectsToShift.extend(self.import_portals(MAPFile.portalList))
 
         if self.shift_origin:
             ue.log("Recentering objects")
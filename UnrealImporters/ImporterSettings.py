@@ -2,5 +2,12 @@
 Stores settings related to Unreal importing process
 """
 
-PNG_CACHE_FILE_SUFFIX = ".CACHE.PNG"
-bUsePNGCache = True
+#Directory converted and cached textures are stored in, or None to store them beside the source files
+CACHE_ROOT = None
+#Name of the FileUtilities.ImageCache format used to cache decoded textures. One of PNG or RAW
+#PNG files are around a third of the size, but each load decompresses the image (about 2ms for 256x256) and saving is slow.
+#RAW files are read without any decoding so load almost instantly, but take 4 bytes per pixel. Prefer RAW when disk space allows
+IMAGE_CACHE_FORMAT = "PNG"
+bUseImageCache = True
+DDS_CACHE_FILE_SUFFIX = ".CACHE.DDS"
+bUseDDSCache = True
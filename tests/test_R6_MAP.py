@@ -1,17 +1,111 @@
 """Test reading MAP files from Rainbow Six (1998)"""
+import json
 import logging
+import os
+import shutil
+import struct
+import tempfile
 import unittest
 from os import path
 
 from FileUtilities.Settings import load_settings
 from FileUtilities.DirectoryUtils import gather_files_in_path
+from FileUtilities.FileOffsetIndex import FileOffsetIndex, get_index_path
+from FileUtilities.JSONMetaInfo import CustomJSONEncoder
 from RainbowFileReaders import MAPLevelReader
-from RainbowFileReaders.R6Constants import RSEGameVersions
+from RainbowFileReaders.R6Constants import RSEGameVersions, RSEMAPSections
+from RainbowFileReaders.RSEGeometryDataStructures import R6GeometryObject
+from tests.test_Utils_BinaryConversion import write_temp_file, pack_sized_cstring
 
 TEST_SETTINGS_FILE = "test_settings.json"
 
 logging.basicConfig(level=logging.CRITICAL)
 
+def pack_section(sectionString: str, body: bytes, sizeIncludesSizeField: bool = False) -> bytes:
+    """Packs a section with a size, id and section string. Sizes are written both ways seen in shipped files"""
+    data = struct.pack("<I", 1) + pack_sized_cstring(sectionString) + body
+    size = len(data) + 4 if sizeIncludesSizeField else len(data)
+    return struct.pack("<I", size) + data
+
+def pack_r6_geometry_object(name: str, size: int = None) -> bytes:
+    """Packs a Rainbow Six geometry object containing a single triangle. size overrides the size field when specified"""
+    body = struct.pack("<I", 0) + pack_sized_cstring(name)
+    body += struct.pack("<I9f", 3, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+    body += struct.pack("<I6f3I", 1, 0.0, 0.0, 1.0, 0.5, 0.5, 0.0, 255, 128, 0)
+    body += struct.pack("<I6I4fI", 1, 0, 1, 2, 0, 0, 0, 0.0, 0.0, 1.0, 0.0, 0)
+    body += struct.pack("<II", 1, 0) + pack_sized_cstring("mesh01") + struct.pack("<I3II1II", 3, 0, 1, 2, 1, 0, 0)
+    body += pack_sized_cstring("unknown8") + struct.pack("<I", 0)
+    return struct.pack("<I", len(body) if size is None else size) + body
+
+def pack_r6_material_list() -> bytes:
+    """Packs a material list containing a single Rainbow Six material"""
+    materialName = pack_sized_cstring("material01")
+    textureName = pack_sized_cstring("texture01.BMP")
+    materialSize = 73 + 2 * (len(materialName) - 4) + len(textureName) - 4
+    material = struct.pack("<II", materialSize, 0) + materialName + textureName
+    material += struct.pack("<ffI", 1.0, 0.0, 3) + struct.pack("<9I", 25, 25, 25, 255, 255, 255, 229, 229, 229)
+    material += struct.pack("<f", 0.0) + bytes([0])
+    return struct.pack("<II", 0, 0) + pack_sized_cstring("MaterialList") + struct.pack("<I", 1) + material
+
+def find_memoryviews(value, found=None, visited=None) -> list:
+    """Returns every memoryview referenced by value, its attributes, or the items of lists, tuples and dicts it contains"""
+    found = [] if found is None else found
+    visited = set() if visited is None else visited
+    if id(value) in visited:
+        return found
+    visited.add(id(value))
+    if isinstance(value, memoryview):
+        found.append(value)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            find_memoryviews(item, found, visited)
+    elif isinstance(value, dict):
+        for item in value.values():
+            find_memoryviews(item, found, visited)
+    elif hasattr(value, "__dict__"):
+        for item in vars(value).values():
+            find_memoryviews(item, found, visited)
+    return found
+
+def pack_r6_map(sectionSizeOverrides=None, geometryObjectSize: int = None) -> bytes:
+    """Packs a small Rainbow Six MAP file with one entry in each section, except geometry which has two objects
+    sectionSizeOverrides can map a section string to a size to write, to simulate incorrect size fields"""
+    sectionSizeOverrides = sectionSizeOverrides or {}
+
+    def section(sectionString, body, sizeIncludesSizeField=False):
+        data = pack_section(sectionString, body, sizeIncludesSizeField)
+        if sectionString in sectionSizeOverrides:
+            data = struct.pack("<I", sectionSizeOverrides[sectionString]) + data[4:]
+        return data
+
+    data = pack_sized_cstring("BeginMapv2.1") + struct.pack("<I", 0)
+
+    data += pack_r6_material_list()
+
+    geometryObjects = pack_r6_geometry_object("geometry01", geometryObjectSize) + pack_r6_geometry_object("geometry02", geometryObjectSize)
+    data += section("GeometryList", struct.pack("<I", 2) + geometryObjects)
+
+    portal = struct.pack("<II", 0, 0) + pack_sized_cstring("Version") + struct.pack("<I", 1) + pack_sized_cstring("portal01")
+    portal += struct.pack("<I12f", 4, *[float(i) for i in range(12)]) + struct.pack("<II", 0, 1)
+    data += section("PortalList", struct.pack("<I", 1) + portal, True)
+
+    light = struct.pack("<II", 0, 0) + pack_sized_cstring("light01") + b"\x01\x02\x03"
+    light += struct.pack("<9f3f3I5f", *[float(i) for i in range(12)], 255, 128, 0, 1.0, 0.5, 0.25, 100.0, 2.0) + bytes([1])
+    data += section("LightList", struct.pack("<I", 1) + light)
+
+    mapObject = struct.pack("<II", 8, 0) + pack_sized_cstring("Version") + struct.pack("<I", 5) + pack_sized_cstring("object01") + bytes(8)
+    data += section("ObjectList", struct.pack("<I", 1) + mapObject, True)
+
+    room = struct.pack("<I", 0) + pack_sized_cstring("Version") + struct.pack("<I", 1) + pack_sized_cstring("room01")
+    room += bytes([1, 0]) + struct.pack("<4I", 0, 0, 0, 0)
+    data += section("RoomList", struct.pack("<I", 1) + room)
+
+    planningLevel = struct.pack("<ffI", 1.0, 0.0, 1) + pack_sized_cstring("room01")
+    data += section("PlanningLevelList", struct.pack("<I", 1) + planningLevel) + bytes([0])
+
+    data += pack_sized_cstring("EndMap")
+    return data
+
 class R6MAPTests(unittest.TestCase):
     """Test R6 MAPs"""
 
@@ -108,6 +202,163 @@ class R6MAPTests(unittest.TestCase):
 
             self.check_section_strings(loadedFile)
 
+    def test_selective_section_loading(self):
+        """Tests that sections which are not requested are skipped, while requested sections are read the same as a full read"""
+        map_filepath = write_temp_file(pack_r6_map())
+        try:
+            fullFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(fullFile.read_file(map_filepath), "Failed to read whole file")
+            self.check_section_strings(fullFile)
+            self.assertEqual(fullFile.gameVersion, RSEGameVersions.RAINBOW_SIX, "Wrong game version detected")
+
+            lightFile = MAPLevelReader.MAPLevelFile(sections=[RSEMAPSections.LIGHTS])
+            self.assertTrue(lightFile.read_file(map_filepath), "Failed to read whole file when skipping sections")
+            self.assertIsNone(lightFile.geometryObjects, "Geometry was read when it wasn't requested")
+            self.assertIsNone(lightFile.portalList, "Portals were read when they weren't requested")
+            self.assertIsNone(lightFile.objectList, "Objects were read when they weren't requested")
+            self.assertIsNone(lightFile.roomList, "Rooms were read when they weren't requested")
+            self.assertIsNone(lightFile.planningLevelList, "Planning levels were read when they weren't requested")
+            self.assertEqual(lightFile.lightList.lightCount, 1, "Unexpected number of lights")
+            self.assertEqual(lightFile.lightList.lights[0].color, fullFile.lightList.lights[0].color, "Light does not match full read")
+            self.assertEqual(lightFile.footer.end_map_string.string, "EndMap", "Unexpected end of map footer string")
+
+            portalFile = MAPLevelReader.MAPLevelFile(sections=[RSEMAPSections.PORTALS])
+            self.assertTrue(portalFile.read_file(map_filepath), "Failed to read whole file when skipping sections")
+            self.assertIsNone(portalFile.lightList, "Lights were read when they weren't requested")
+            self.assertEqual(portalFile.portalList.portals[0].vertices, fullFile.portalList.portals[0].vertices, "Portal does not match full read")
+        finally:
+            os.remove(map_filepath)
+
+    def test_skipping_with_invalid_section_size(self):
+        """Tests that a section with an unusable size field is read normally instead of being skipped"""
+        map_filepath = write_temp_file(pack_r6_map({"LightList": 3}))
+        try:
+            loadedFile = MAPLevelReader.MAPLevelFile(sections=[RSEMAPSections.PORTALS])
+            self.assertTrue(loadedFile.read_file(map_filepath), "Failed to read whole file")
+            self.assertEqual(loadedFile.lightList.lightCount, 1, "Light section was not read after failing to skip it")
+            self.assertIsNone(loadedFile.objectList, "Objects were read when they weren't requested")
+        finally:
+            os.remove(map_filepath)
+
+    def test_lazy_geometry_objects(self):
+        """Tests that lazy geometry objects only decode their body when it is accessed"""
+        map_filepath = write_temp_file(pack_r6_map())
+        try:
+            fullFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(fullFile.read_file(map_filepath), "Failed to read whole file")
+
+            lazyFile = MAPLevelReader.MAPLevelFile(lazyGeometry=True)
+            self.assertTrue(lazyFile.read_file(map_filepath, useMemoryMap=True), "Failed to read whole file with lazy geometry")
+            self.check_section_strings(lazyFile)
+
+            names = [geometryObject.name_string.string for geometryObject in lazyFile.geometryObjects]
+            self.assertEqual(names, ["geometry01", "geometry02"], "Unexpected geometry object names")
+
+            lazyObject = lazyFile.geometryObjects[1]
+            self.assertFalse(lazyObject.is_loaded(), "Geometry object was loaded by reading its name")
+            self.assertEqual(find_memoryviews(lazyFile), [], "Lazy geometry objects still reference the memory mapped file")
+            self.assertLess(len(lazyObject._data), os.path.getsize(map_filepath) // 2, "Lazy geometry object holds more than its own data")
+
+            fullJSON = json.loads(json.dumps(fullFile.geometryObjects[0], cls=CustomJSONEncoder))
+            lazyJSON = json.loads(json.dumps(lazyFile.geometryObjects[0], cls=CustomJSONEncoder))
+            self.assertEqual(lazyJSON, fullJSON, "Lazy geometry object was not serialized as the decoded object")
+            self.assertIsInstance(lazyObject, R6GeometryObject, "Lazy object does not behave as a geometry object")
+            self.assertEqual(lazyObject.vertices, fullFile.geometryObjects[1].vertices, "Lazy object vertices do not match full read")
+            self.assertTrue(lazyObject.is_loaded(), "Geometry object was not loaded when accessing its vertices")
+
+            renderables = lazyObject.generate_renderable_arrays_for_mesh(lazyObject.meshes[0])
+            self.assertEqual(len(renderables), 1, "Unexpected number of renderables")
+            self.assertIs(lazyFile.geometryObjects[0].load().__class__, R6GeometryObject, "load did not return the geometry object")
+        finally:
+            os.remove(map_filepath)
+
+    def test_lazy_geometry_with_invalid_size(self):
+        """Tests that geometry objects are read normally when their size field can't be used to skip them"""
+        map_filepath = write_temp_file(pack_r6_map(geometryObjectSize=5))
+        try:
+            lazyFile = MAPLevelReader.MAPLevelFile(lazyGeometry=True)
+            self.assertTrue(lazyFile.read_file(map_filepath), "Failed to read whole file")
+            self.assertEqual(type(lazyFile.geometryObjects[0]), R6GeometryObject, "Geometry object was not read normally")
+            self.assertEqual(lazyFile.geometryObjects[0].faceCount, 1, "Unexpected number of faces")
+        finally:
+            os.remove(map_filepath)
+
+    def test_probe(self):
+        """Tests that probing a map reads the header and game version without reading the geometry, and keeps no references to the mapped file"""
+        map_filepath = write_temp_file(pack_r6_map())
+        try:
+            loadedFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(loadedFile.read_file(map_filepath), "Failed to read whole file")
+
+            probedFile = MAPLevelReader.MAPLevelFile.probe(map_filepath)
+        finally:
+            os.remove(map_filepath)
+
+        self.assertEqual(probedFile.header.header_begin_message.string, "BeginMapv2.1", "Unexpected probed header")
+        self.assertEqual(probedFile.materialListHeader.numMaterials, 1, "Unexpected probed number of materials")
+        self.assertEqual(probedFile.materials[0].texture_name.string, "texture01.BMP", "Unexpected probed material")
+        self.assertEqual(probedFile.gameVersion, loadedFile.gameVersion, "Probed game version does not match")
+        self.assertIsNone(probedFile.geometryListHeader, "Probe read the geometry list")
+        self.assertEqual(find_memoryviews(probedFile), [], "Probed map still references the memory mapped file")
+
+    def test_read_buffer(self):
+        """Tests that reading a map from bytes, a bytearray or a memoryview matches reading the same file from disk"""
+        mapData = pack_r6_map()
+        map_filepath = write_temp_file(mapData)
+        try:
+            diskFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(diskFile.read_file(map_filepath), "Failed to read whole file")
+        finally:
+            os.remove(map_filepath)
+
+        for source in [mapData, bytearray(mapData), memoryview(mapData)]:
+            bufferFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(bufferFile.read_buffer(source, "m01.map"), "Buffer was not read to end of data from " + type(source).__name__)
+            self.check_section_strings(bufferFile)
+            self.assertEqual(bufferFile.filepath, "m01.map", "Buffer name was not used")
+            self.assertEqual(bufferFile.gameVersion, diskFile.gameVersion, "Game version does not match file read from disk")
+            self.assertEqual(bufferFile.materials[0].texture_name.string, diskFile.materials[0].texture_name.string, "Material does not match file read from disk")
+            self.assertEqual(len(bufferFile.geometryObjects), len(diskFile.geometryObjects), "Unexpected number of geometry objects")
+            for diskObject, bufferObject in zip(diskFile.geometryObjects, bufferFile.geometryObjects):
+                self.assertEqual(bufferObject.vertices, diskObject.vertices, "Vertices do not match file read from disk")
+                self.assertEqual(bufferObject.faces[0].vertexIndices, diskObject.faces[0].vertexIndices, "Faces do not match file read from disk")
+
+    def test_offset_index(self):
+        """Tests building, saving and using an offset index to read single named structures"""
+        map_filepath = write_temp_file(pack_r6_map())
+        cacheDirectory = tempfile.mkdtemp()
+        try:
+            fullFile = MAPLevelReader.MAPLevelFile()
+            self.assertTrue(fullFile.read_file(map_filepath), "Failed to read whole file")
+
+            index = MAPLevelReader.MAPLevelFile.load_index(map_filepath, cacheDirectory)
+            indexPath = get_index_path(map_filepath, cacheDirectory)
+            self.assertTrue(path.isfile(indexPath), "Index was not saved")
+            self.assertEqual(index.find("section", RSEMAPSections.ROOMS).offset, fullFile.sectionOffsets[RSEMAPSections.ROOMS], "Unexpected room section offset")
+            self.assertEqual([entry.name for entry in index.find_all("geometryObject")], ["geometry01", "geometry02"], "Unexpected indexed geometry objects")
+            for kind in ["mesh", "portal", "light", "object", "room"]:
+                self.assertEqual(len(index.find_all(kind)), 1 if kind != "mesh" else 2, "Unexpected number of indexed " + kind + " entries")
+
+            loadedIndex = FileOffsetIndex.load(indexPath)
+            self.assertTrue(loadedIndex.is_valid_for(map_filepath), "Saved index is not valid for unchanged file")
+            self.assertEqual(loadedIndex.find("room", "ROOM01").offset, index.find("room", "room01").offset, "Saved index does not match built index")
+
+            room = MAPLevelReader.MAPLevelFile.read_structure_by_name(map_filepath, "room", "room01", cacheDirectory=cacheDirectory)
+            self.assertEqual(room.name_string.string, "room01", "Unexpected room read by name")
+            self.assertEqual(room.unknown1, fullFile.roomList.rooms[0].unknown1, "Room read by name does not match full read")
+
+            geometryObject = MAPLevelReader.MAPLevelFile.read_structure_by_name(map_filepath, "geometryObject", "geometry02", loadedIndex)
+            self.assertIsInstance(geometryObject, R6GeometryObject, "Unexpected structure type read by name")
+            self.assertEqual(geometryObject.vertices, fullFile.geometryObjects[1].vertices, "Geometry read by name does not match full read")
+            self.assertIsNone(MAPLevelReader.MAPLevelFile.read_structure_by_name(map_filepath, "room", "missing", loadedIndex), "Found a structure which doesn't exist")
+
+            with open(map_filepath, "ab") as mapFile:
+                mapFile.write(bytes(4))
+            self.assertFalse(loadedIndex.is_valid_for(map_filepath), "Index is still valid after the file changed")
+        finally:
+            os.remove(map_filepath)
+            shutil.rmtree(cacheDirectory)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,16 +1,47 @@
 """Test reading RSB images from Rainbow Six (1998)"""
 import logging
+import os
+import random
+import struct
 import unittest
+from unittest import mock
 from os import path
 
+from PIL import Image as PILImage
+
 from FileUtilities.Settings import load_settings
 from FileUtilities.MipMapGenerator import generate_mip_maps
+from FileUtilities.ColorConversionUtilities import read_bitmask_ARGB_color
 from RainbowFileReaders import RSBImageReader
+from tests.test_Utils_BinaryConversion import write_temp_file
 
 TEST_SETTINGS_FILE = "test_settings.json"
 
 logging.basicConfig(level=logging.CRITICAL)
 
+def pack_rsb_file(width: int, height: int, bitmask, fullColorData: bytes, paletteData: bytes = None, paletteImageData: bytes = None) -> bytes:
+    """Packs an RSB file. Version 0 files with a palette are written when paletteData is specified, otherwise a version 1 file is written
+    bitmask is the bit depth of each channel in RGBA order"""
+    if paletteData is not None:
+        data = struct.pack("<4I", 0, width, height, 1)
+        data += paletteData + paletteImageData
+        data += struct.pack("<4I", *bitmask)
+    else:
+        data = struct.pack("<3I", 1, width, height)
+        data += struct.pack("<4I", *bitmask)
+    return data + fullColorData
+
+def pack_dxt_rsb_file(width: int, height: int, dxtType: int, blockData: bytes) -> bytes:
+    """Packs a version 9 RSB file containing DXT compressed image data"""
+    data = struct.pack("<5I", 9, width, height, 0, 0) + bytes(1)
+    data += struct.pack("<4I", 0, 0, 0, 0)
+    data += struct.pack("<2I", 0, dxtType)
+    return data + blockData
+
+def pack_dxt_color_block(color0: int, color1: int, indices: int = 0) -> bytes:
+    """Packs the color part of a DXT block, with two 565 colors and 2 bit indices for each texel"""
+    return struct.pack("<HHI", color0, color1, indices)
+
 class R6RSBTests(unittest.TestCase):
     """Test R6 RSBs"""
 
@@ -100,5 +131,331 @@ class R6RSBTests(unittest.TestCase):
 
         self.assertEqual(fullColorImage.height, loadedFile.header.height, "Heights do not match on full color image")
 
+    def test_probe(self):
+        """Tests that probing an image reads the same header information as a full read, without reading the image data"""
+        width = 4
+        height = 2
+        paletteData = bytes(range(256)) * 4
+        paletteImageData = bytes(range(width * height))
+        fullColorData = struct.pack("<8H", *range(0, 65536, 8192))
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (5, 6, 5, 0), fullColorData, paletteData, paletteImageData))
+        truncated_filepath = write_temp_file(pack_rsb_file(width, height, (4, 4, 4, 4), b''))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+
+            probedFile = RSBImageReader.RSBImageFile.probe(RSB_filepath)
+            self.assertEqual(probedFile.header.width, loadedFile.header.width, "Probed width does not match")
+            self.assertEqual(probedFile.header.height, loadedFile.header.height, "Probed height does not match")
+            self.assertEqual(probedFile.header.get_rgba_bitmask_tuple(), (5, 6, 5, 0), "Probed bitmask is not correct")
+            self.assertIsNone(probedFile.image256, "Probe read the palette image")
+
+            # A probe should succeed even if the image data is missing, as it is never read
+            truncatedFile = RSBImageReader.RSBImageFile.probe(truncated_filepath)
+            self.assertEqual(truncatedFile.header.version, 1, "Unexpected version")
+            self.assertEqual(truncatedFile.header.get_rgba_bitmask_tuple(), (4, 4, 4, 4), "Probed bitmask is not correct")
+        finally:
+            os.remove(RSB_filepath)
+            os.remove(truncated_filepath)
+
+    def test_read_buffer(self):
+        """Tests that reading an image from bytes, a bytearray or a memoryview matches reading the same file from disk"""
+        width = 4
+        height = 2
+        paletteData = bytes(range(256)) * 4
+        paletteImageData = bytes(range(10, 10 + width * height))
+        fullColorData = struct.pack("<8H", *range(0, 65536, 8192))
+        RSB_data = pack_rsb_file(width, height, (5, 6, 5, 0), fullColorData, paletteData, paletteImageData)
+        RSB_filepath = write_temp_file(RSB_data)
+        try:
+            diskFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(diskFile.read_file(RSB_filepath), "Failed to read whole file")
+        finally:
+            os.remove(RSB_filepath)
+
+        for source in [RSB_data, bytearray(RSB_data), memoryview(RSB_data)]:
+            bufferFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(bufferFile.read_buffer(source, "texture.RSB"), "Buffer was not read to end of data from " + type(source).__name__)
+            self.assertEqual(bufferFile.header.get_rgba_bitmask_tuple(), diskFile.header.get_rgba_bitmask_tuple(), "Bitmask does not match file read from disk")
+            self.assertEqual(bytes(bufferFile.imageFullColor.image), bytes(diskFile.imageFullColor.image), "Full color image does not match file read from disk")
+            self.assertEqual(bytes(bufferFile.image256.image), bytes(diskFile.image256.image), "256 color image does not match file read from disk")
+            self.assertEqual(bufferFile.convert_full_color_image().tobytes(), diskFile.convert_full_color_image().tobytes(), "Decoded image does not match file read from disk")
+
+    def test_contiguous_pixel_storage(self):
+        """Tests that image data is stored in a single block, and that pixels can still be retrieved individually"""
+        width = 4
+        height = 2
+        paletteData = bytes(range(256)) * 4
+        paletteImageData = bytes(range(10, 10 + width * height))
+        fullColorData = struct.pack("<8H", *range(0, 65536, 8192))
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (5, 6, 5, 0), fullColorData, paletteData, paletteImageData))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(loadedFile.read_file(RSB_filepath, useMemoryMap=True), "Failed to read whole file")
+        finally:
+            os.remove(RSB_filepath)
+
+        fullColorImage = loadedFile.imageFullColor
+        self.assertEqual(bytes(fullColorImage.image), fullColorData, "Full color image data was not stored as one block")
+        self.assertIsInstance(fullColorImage.image, bytes, "Full color image data still references the memory mapped file")
+        self.assertIsInstance(loadedFile.image256.image, bytes, "256 color image data still references the memory mapped file")
+        self.assertEqual(fullColorImage.stride, width * 2, "Unexpected stride")
+        self.assertEqual(fullColorImage.get_pixel_count(), width * height, "Unexpected pixel count")
+        self.assertEqual(bytes(fullColorImage.get_pixel(5)), struct.pack("<H", 5 * 8192), "Unexpected pixel data")
+        self.assertEqual(loadedFile.image256.get_pixel(7)[0], 17, "Unexpected palette index")
+        self.assertEqual(loadedFile.image256.get_pixel(8), b'0', "Out of range pixel did not return the default value")
+
+    def test_lazy_image_loading(self):
+        """Tests that lazy mode only reads the header, and decodes the same images as a normal read when they are used"""
+        width = 4
+        height = 2
+        paletteData = bytes(range(256)) * 4
+        paletteImageData = bytes(range(10, 10 + width * height))
+        fullColorData = struct.pack("<8H", *range(0, 65536, 8192))
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (5, 6, 5, 0), fullColorData, paletteData, paletteImageData))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+
+            lazyFile = RSBImageReader.RSBImageFile(lazyImages=True)
+            self.assertTrue(lazyFile.read_file(RSB_filepath, useMemoryMap=True), "Failed to read whole file in lazy mode")
+        finally:
+            os.remove(RSB_filepath)
+
+        self.assertFalse(lazyFile.is_loaded(), "Images were read in lazy mode")
+        self.assertEqual(lazyFile.header.get_rgba_bitmask_tuple(), (5, 6, 5, 0), "Bitmask was not read in lazy mode")
+        self.assertEqual(lazyFile.paletteOffset, 16, "Unexpected palette offset")
+        self.assertEqual(lazyFile.image256Offset, 16 + 256 * 4, "Unexpected 256 color image offset")
+        self.assertEqual(lazyFile.imageFullColorOffset, 16 + 256 * 4 + width * height + 16, "Unexpected full color image offset")
+
+        fullColorImage = lazyFile.convert_full_color_image()
+        self.assertTrue(lazyFile.is_loaded(), "Images were not read when converting")
+        self.assertEqual(fullColorImage.tobytes(), loadedFile.convert_full_color_image().tobytes(), "Lazy full color image does not match normal read")
+        self.assertEqual(bytes(lazyFile.image256.image), paletteImageData, "Lazy 256 color image does not match")
+        self.assertEqual(lazyFile.palette.palette_entries, loadedFile.palette.palette_entries, "Lazy palette does not match normal read")
+
+    def test_lazy_loading_with_invalid_header(self):
+        """Tests that lazy mode still loads the palette image of a version 0 file with an invalid bitmask, as a normal read does"""
+        width = 4
+        height = 2
+        paletteData = bytes(range(256)) * 4
+        paletteImageData = bytes(range(10, 10 + width * height))
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (0, 0, 0, 0), b'', paletteData, paletteImageData))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            loadedFile.read_file(RSB_filepath)
+
+            lazyFile = RSBImageReader.RSBImageFile(lazyImages=True)
+            lazyFile.read_file(RSB_filepath, useMemoryMap=True)
+        finally:
+            os.remove(RSB_filepath)
+
+        self.assertFalse(lazyFile.header.is_valid(), "Test header is valid")
+        self.assertIsNone(lazyFile.imageFullColorOffset, "Full color image offset was recorded for an invalid header")
+        self.assertFalse(lazyFile.is_loaded(), "Palette image was read in lazy mode")
+        self.assertIsNotNone(lazyFile.palette, "Palette was not loaded in lazy mode")
+        self.assertTrue(lazyFile.is_loaded(), "Images were not read when the palette was used")
+        self.assertEqual(lazyFile.palette.palette_entries, loadedFile.palette.palette_entries, "Lazy palette does not match normal read")
+        self.assertEqual(bytes(lazyFile.image256.image), bytes(loadedFile.image256.image), "Lazy 256 color image does not match normal read")
+        self.assertEqual(lazyFile.imageFullColor.get_pixel_count(), 0, "Full color image was read for an invalid header")
+
+    def test_wide_channel_header(self):
+        """Tests that headers with channels wider than 8 bits are rejected, instead of failing when the image is converted"""
+        width = 2
+        height = 2
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (16, 8, 8, 0), bytes(width * height * 4)))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            loadedFile.read_file(RSB_filepath)
+        finally:
+            os.remove(RSB_filepath)
+
+        self.assertFalse(loadedFile.header.is_valid(), "Header with a 16 bit channel was accepted")
+        self.assertIsNone(loadedFile.imageFullColorOffset, "Full color image was read for a header with a 16 bit channel")
+
+    def test_palette_conversion(self):
+        """Tests converting palette images to RGBA images and to 8 bit palette PNGs"""
+        width = 16
+        height = 16
+        paletteData = bytes(random.randint(0, 255) for _ in range(256 * 4))
+        paletteImageData = bytes(reversed(range(width * height)))
+        RSB_filepath = write_temp_file(pack_rsb_file(width, height, (5, 6, 5, 0), bytes(width * height * 2), paletteData, paletteImageData))
+        PNG_filepath = RSB_filepath + ".256.PNG"
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+
+            paletteImage = loadedFile.convert_palette_image()
+            self.assertEqual(paletteImage.mode, "RGBA", "Unexpected palette image mode")
+            for pixelIndex in [0, 17, 255]:
+                paletteColor = loadedFile.palette.get_color(paletteImageData[pixelIndex])
+                expectedColor = (paletteColor[0], paletteColor[1], paletteColor[2], 255)
+                self.assertEqual(paletteImage.getpixel((pixelIndex % width, pixelIndex // width)), expectedColor, "Unexpected color in palette image")
+
+            pilPaletteImage = loadedFile.convert_palette_image_pil_palette()
+            self.assertEqual(pilPaletteImage.mode, "P", "Palette image is not palette based")
+            self.assertEqual(pilPaletteImage.getpixel((3, 1)), paletteImageData[19], "Unexpected palette index in PIL image")
+            pilPaletteImage.save(PNG_filepath, "PNG")
+            with PILImage.open(PNG_filepath) as savedImage:
+                self.assertEqual(savedImage.mode, "P", "PNG was not saved with a palette")
+                self.assertEqual(savedImage.convert("RGBA").tobytes(), paletteImage.tobytes(), "Saved palette PNG does not match RGBA conversion")
+        finally:
+            os.remove(RSB_filepath)
+            if os.path.exists(PNG_filepath):
+                os.remove(PNG_filepath)
+
+    def test_colorkey_mask(self):
+        """Tests that colorkey masking gives the same result as checking each pixel with check_color_key"""
+        width = 32
+        height = 32
+        random.seed(14)
+        colorValues = [random.randint(0, 65535) for _ in range(width * height)]
+        colorValues[:7] = [0xF81F, 0xFF0F, 0xFFFF, 0x0000, 0xF0FF, 0x07FF, 0xF81F]
+        fullColorData = struct.pack("<" + str(width * height) + "H", *colorValues)
+
+        for bitmask in [(5, 6, 5, 0), (4, 4, 4, 4)]:
+            RSB_filepath = write_temp_file(pack_rsb_file(width, height, bitmask, fullColorData))
+            try:
+                loadedFile = RSBImageReader.RSBImageFile()
+                self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+            finally:
+                os.remove(RSB_filepath)
+
+            for colorKey in [(255, 0, 255), (255, 255, 255), (0, 0, 0), (0, 255, 255)]:
+                maskedImage = loadedFile.convert_full_color_image_with_colorkey_mask(colorKey)
+                expectedImage = loadedFile.convert_full_color_image(force_alpha_channel=True)
+                expectedPixels = expectedImage.load()
+                matchCount = 0
+                for y in range(height):
+                    for x in range(width):
+                        if loadedFile.check_color_key(expectedPixels[x, y][:3], colorKey, bitmask):
+                            expectedPixels[x, y] = colorKey + (0,)
+                            matchCount += 1
+                self.assertGreater(matchCount, 0, "Test image does not contain colorkey " + str(colorKey))
+                self.assertEqual(maskedImage.tobytes(), expectedImage.tobytes(), "Masked image does not match for colorkey " + str(colorKey) + " and bitmask " + str(bitmask))
+
+    def test_dxt_decoding(self):
+        """Tests decoding DXT1 and DXT5 compressed images"""
+        #4 blocks, red, green, blue and a block which uses the second color
+        redBlock = pack_dxt_color_block(0xF800, 0x001F)
+        greenBlock = pack_dxt_color_block(0x07E0, 0x001F)
+        blueBlock = pack_dxt_color_block(0x001F, 0xF800)
+        secondColorBlock = pack_dxt_color_block(0xF800, 0x001F, 0x55555555)
+        dxt1Data = redBlock + greenBlock + blueBlock + secondColorBlock
+        #DXT5 blocks start with 2 alpha endpoints and 3 bit alpha indices, all 0 selects the first endpoint
+        dxt5Data = bytes([128, 0]) + bytes(6) + greenBlock
+
+        for width, height, dxtType, blockData, expectedPixels in [
+                (8, 8, 0, dxt1Data, {(0, 0): (255, 0, 0, 255), (5, 2): (0, 255, 0, 255), (3, 7): (0, 0, 255, 255), (7, 7): (0, 0, 255, 255)}),
+                (4, 4, 4, dxt5Data, {(0, 0): (0, 255, 0, 128), (3, 3): (0, 255, 0, 128)})]:
+            RSB_filepath = write_temp_file(pack_dxt_rsb_file(width, height, dxtType, blockData))
+            try:
+                loadedFile = RSBImageReader.RSBImageFile()
+                self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+            finally:
+                os.remove(RSB_filepath)
+
+            self.assertTrue(loadedFile.header.isDXT, "DXT image was not detected")
+            fullColorImage = loadedFile.convert_full_color_image()
+            self.assertEqual(fullColorImage.size, (width, height), "Unexpected image size")
+            for position, color in expectedPixels.items():
+                self.assertEqual(fullColorImage.getpixel(position), color, "Unexpected color at " + str(position) + " in DXT type " + str(dxtType))
+
+    def test_dxt_decoding_large_image(self):
+        """Tests that every block of a 1024x1024 DXT5 image read from a memory mapped file is decoded"""
+        width = 1024
+        height = 1024
+        #Each row of every block selects the second color, the first color, then the 2 interpolated colors
+        blockData = (bytes([255, 0]) + bytes(6) + pack_dxt_color_block(0xF800, 0x07E0, 0x1B1B1B1B)) * (width * height // 16)
+        RSB_filepath = write_temp_file(pack_dxt_rsb_file(width, height, 4, blockData))
+        try:
+            loadedFile = RSBImageReader.RSBImageFile()
+            self.assertTrue(loadedFile.read_file(RSB_filepath, useMemoryMap=True), "Failed to read whole file")
+            fullColorImage = loadedFile.convert_full_color_image()
+        finally:
+            os.remove(RSB_filepath)
+
+        self.assertEqual(fullColorImage.size, (width, height), "Unexpected image size")
+        for blockX, blockY in [(0, 0), (128, 37), (255, 255)]:
+            for y in range(blockY * 4, blockY * 4 + 4):
+                self.assertEqual(fullColorImage.getpixel((blockX * 4 + 2, y)), (0, 255, 0, 255), "Unexpected second color in block " + str((blockX, blockY)))
+                self.assertEqual(fullColorImage.getpixel((blockX * 4 + 3, y)), (255, 0, 0, 255), "Unexpected first color in block " + str((blockX, blockY)))
+        self.assertEqual(len(fullColorImage.getcolors()), 4, "Unexpected number of distinct colors")
+
+    def test_rgba8_buffer(self):
+        """Tests that decoding straight to an RGBA buffer matches the PIL conversions, with and without a colorkey"""
+        width = 16
+        height = 16
+        random.seed(19)
+        colorValues = [random.randint(0, 65535) for _ in range(width * height)]
+        colorValues[:3] = [0xF81F, 0xFF0F, 0xF81F]
+        fullColorData = struct.pack("<" + str(width * height) + "H", *colorValues)
+        dxtData = pack_dxt_color_block(0xF81F, 0x001F, 0x0000FFFF) * 4
+
+        for RSB_data in [pack_rsb_file(width, height, (5, 6, 5, 0), fullColorData), pack_rsb_file(width, height, (4, 4, 4, 4), fullColorData),
+                         pack_dxt_rsb_file(8, 8, 0, dxtData)]:
+            RSB_filepath = write_temp_file(RSB_data)
+            try:
+                loadedFile = RSBImageReader.RSBImageFile()
+                self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+            finally:
+                os.remove(RSB_filepath)
+
+            self.assertEqual(bytes(loadedFile.to_rgba8()), loadedFile.convert_full_color_image(force_alpha_channel=True).tobytes(), "RGBA buffer does not match converted image")
+            colorKey = (255, 0, 255)
+            maskedImage = loadedFile.convert_full_color_image_with_colorkey_mask(colorKey)
+            self.assertEqual(bytes(loadedFile.to_rgba8(colorKey)), maskedImage.tobytes(), "Colorkeyed RGBA buffer does not match converted image")
+            self.assertIn(0, maskedImage.getchannel("A").tobytes(), "Test image does not contain the colorkey")
+
+    def test_rgba8_colorkey_in_place(self):
+        """Tests that colorkeys are applied to RGBA buffers without a PIL image, matching convert_full_color_image_with_colorkey_mask"""
+        width = 32
+        height = 16
+        random.seed(23)
+        colorValues = [random.randint(0, 65535) for _ in range(width * height)]
+        colorValues[:6] = [0xF81F, 0xFFFF, 0x0000, 0x07FF, 0xF0FF, 0xFF0F]
+        fullColorData = struct.pack("<" + str(width * height) + "H", *colorValues)
+
+        for bitmask in [(5, 6, 5, 0), (4, 4, 4, 4), (5, 5, 5, 1)]:
+            RSB_filepath = write_temp_file(pack_rsb_file(width, height, bitmask, fullColorData))
+            try:
+                loadedFile = RSBImageReader.RSBImageFile()
+                self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+            finally:
+                os.remove(RSB_filepath)
+
+            for colorKey in [(255, 0, 255), (255, 255, 255), (0, 0, 0), (0, 255, 255), (1, 2, 3)]:
+                expectedData = loadedFile.convert_full_color_image_with_colorkey_mask(colorKey).tobytes()
+                with mock.patch.object(RSBImageReader.PILImage, "frombytes", side_effect=AssertionError("PIL image was created")):
+                    imageData = loadedFile.to_rgba8(colorKey)
+                self.assertIsInstance(imageData, bytearray, "Colorkeyed RGBA data was not decoded in place")
+                self.assertEqual(bytes(imageData), expectedData, "Colorkeyed RGBA buffer does not match for colorkey " + str(colorKey) + " and bitmask " + str(bitmask))
+
+    def test_full_color_decoding(self):
+        """Tests that full color images are decoded to the same values as reading each color with read_bitmask_ARGB_color"""
+        width = 64
+        height = 32
+        random.seed(11)
+        colorValues = [random.randint(0, 65535) for _ in range(width * height)]
+        colorValues[:4] = [0, 65535, 0xF800, 0x07E0]
+        fullColorData = struct.pack("<" + str(width * height) + "H", *colorValues)
+
+        for bitmask, force_alpha_channel, channels in [((5, 6, 5, 0), False, 3), ((5, 6, 5, 0), True, 4), ((4, 4, 4, 4), False, 4)]:
+            RSB_filepath = write_temp_file(pack_rsb_file(width, height, bitmask, fullColorData))
+            try:
+                loadedFile = RSBImageReader.RSBImageFile()
+                self.assertTrue(loadedFile.read_file(RSB_filepath), "Failed to read whole file")
+                fullColorImage = loadedFile.convert_full_color_image(force_alpha_channel)
+            finally:
+                os.remove(RSB_filepath)
+
+            expectedData = bytearray()
+            for colorValue in colorValues:
+                expectedData.extend(read_bitmask_ARGB_color(colorValue, *bitmask)[:channels])
+            self.assertEqual(fullColorImage.size, (width, height), "Unexpected image size")
+            self.assertEqual(len(fullColorImage.mode), channels, "Unexpected image mode for bitmask " + str(bitmask))
+            self.assertEqual(fullColorImage.tobytes(), bytes(expectedData), "Decoded colors do not match for bitmask " + str(bitmask))
+
+
 if __name__ == '__main__':
     unittest.main()
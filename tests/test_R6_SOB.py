@@ -1,16 +1,26 @@
 """Test reading SOB files from Rainbow Six (1998)"""
 import logging
+import os
+import struct
 import unittest
 from os import path
 
 from FileUtilities.Settings import load_settings
 from FileUtilities.DirectoryUtils import gather_files_in_path
 from RainbowFileReaders import SOBModelReader
+from tests.test_R6_MAP import pack_section, pack_r6_geometry_object, pack_r6_material_list, find_memoryviews
+from tests.test_Utils_BinaryConversion import write_temp_file, pack_sized_cstring
 
 TEST_SETTINGS_FILE = "test_settings.json"
 
 logging.basicConfig(level=logging.CRITICAL)
 
+def pack_r6_sob() -> bytes:
+    """Packs a small Rainbow Six SOB file with one material and one geometry object"""
+    data = pack_sized_cstring("BeginModel") + pack_r6_material_list()
+    data += pack_section("GeometryList", struct.pack("<I", 1) + pack_r6_geometry_object("object01"))
+    return data + pack_sized_cstring("EndModel")
+
 class R6SOBTests(unittest.TestCase):
     """Test R6 SOBs"""
 
@@ -62,3 +72,39 @@ class R6SOBTests(unittest.TestCase):
             self.assertTrue(readSucessfullyToEOF, "Failed to read whole file")
 
             self.check_section_strings(loadedFile)
+
+    def test_probe(self):
+        """Tests that probing a model reads the header and first material without reading the geometry, and keeps no references to the mapped file"""
+        sob_filepath = write_temp_file(pack_r6_sob())
+        try:
+            loadedFile = SOBModelReader.SOBModelFile()
+            self.assertTrue(loadedFile.read_file(sob_filepath), "Failed to read whole file")
+            self.check_section_strings(loadedFile)
+
+            probedFile = SOBModelReader.SOBModelFile.probe(sob_filepath)
+        finally:
+            os.remove(sob_filepath)
+
+        self.assertEqual(probedFile.header.header_begin_message.string, "BeginModel", "Unexpected probed header")
+        self.assertEqual(probedFile.materialListHeader.numMaterials, 1, "Unexpected probed number of materials")
+        self.assertEqual(probedFile.materials[0].material_name.string, loadedFile.materials[0].material_name.string, "Probed material does not match")
+        self.assertIsNone(probedFile.geometryListHeader, "Probe read the geometry list")
+        self.assertEqual(find_memoryviews(probedFile), [], "Probed model still references the memory mapped file")
+
+    def test_read_buffer(self):
+        """Tests that reading a model from bytes, a bytearray or a memoryview matches reading the same file from disk"""
+        sobData = pack_r6_sob()
+        sob_filepath = write_temp_file(sobData)
+        try:
+            diskFile = SOBModelReader.SOBModelFile()
+            self.assertTrue(diskFile.read_file(sob_filepath), "Failed to read whole file")
+        finally:
+            os.remove(sob_filepath)
+
+        for source in [sobData, bytearray(sobData), memoryview(sobData)]:
+            bufferFile = SOBModelReader.SOBModelFile()
+            self.assertTrue(bufferFile.read_buffer(source, "model.sob"), "Buffer was not read to end of data from " + type(source).__name__)
+            self.check_section_strings(bufferFile)
+            self.assertEqual(bufferFile.materials[0].material_name.string, diskFile.materials[0].material_name.string, "Material does not match file read from disk")
+            self.assertEqual(bufferFile.geometryObjects[0].name_string.string, diskFile.geometryObjects[0].name_string.string, "Geometry object does not match file read from disk")
+            self.assertEqual(bufferFile.geometryObjects[0].vertices, diskFile.geometryObjects[0].vertices, "Vertices do not match file read from disk")
@@ -0,0 +1,231 @@
+"""Test Binary Conversion utilities"""
+import io
+import logging
+import os
+import struct
+import tempfile
+import time
+import unittest
+import zipfile
+
+from typing import List, Any
+
+from FileUtilities.BinaryConversionUtilities import BinaryFileReader, SizedCString, PackedVectorArray, TYPECODE_FLOAT
+from FileUtilities.JSONMetaInfo import CustomJSONEncoder
+from RainbowFileReaders.RSDMPLightReader import RSDMPLightFile
+
+logging.basicConfig(level=logging.CRITICAL)
+
+log = logging.getLogger(__name__)
+
+BENCHMARK_VERTEX_COUNT = 100000
+
+def write_temp_file(data: bytes) -> str:
+    """Writes data to a new temporary file and returns the path"""
+    fileHandle, filepath = tempfile.mkstemp(suffix=".bin")
+    with os.fdopen(fileHandle, "wb") as f:
+        f.write(data)
+    return filepath
+
+def pack_sized_cstring(value: str) -> bytes:
+    """Packs a string in the same format read by SizedCString"""
+    encoded = value.encode("ascii") + b"\x00"
+    return struct.pack("<I", len(encoded)) + encoded
+
+def pack_dmp_light_body() -> bytes:
+    """Packs all fields of an RSDMPLight that come after the name and version information"""
+    data = struct.pack("<I", 2)
+    data += struct.pack("<3f", 0.0, -1.0, 0.0)
+    data += struct.pack("<3f", 10.0, 20.0, 30.0)
+    data += struct.pack("<f", 5.5)
+    data += struct.pack("<2f", 1.0, 2.0)
+    data += struct.pack("<3f", 3.0, 4.0, 5.0)
+    data += struct.pack("<f", 0.75)
+    data += struct.pack("<4f", 1.0, 0.5, 0.25, 1.0)
+    data += struct.pack("<4f", 0.0, 0.0, 0.0, 1.0)
+    data += struct.pack("<4f", 0.125, 0.125, 0.125, 1.0)
+    data += struct.pack("<4f", 1.0, 0.5, 0.25, 45.0)
+    data += bytes([3])
+    return data
+
+class UtilsBinaryConversionTests(unittest.TestCase):
+    """Test Binary Conversion utilities"""
+
+    def setUp(self):
+        self.testData = b''
+        self.testData += struct.pack("<I", 8) + b"Version\x00"
+        self.testData += struct.pack("<Ii", 4294967295, -12)
+        self.testData += struct.pack("<3f", 1.0, -2.5, 1000.25)
+        self.testData += bytes([255, 0, 128, 64])
+        self.filepath = write_temp_file(self.testData)
+
+    def tearDown(self):
+        os.remove(self.filepath)
+
+    def read_test_values(self, filereader: BinaryFileReader):
+        """Reads the values written in setUp and returns them as a list"""
+        values: List[Any] = []
+        values.append(SizedCString(filereader).string)
+        values.append(filereader.read_uint32())
+        values.append(filereader.read_int32())
+        values.append(filereader.read_vec_f(3))
+        values.append(filereader.read_bgra_color_8bpp_byte())
+        return values
+
+    def test_memory_mapped_read(self):
+        """Tests that a memory mapped reader returns the same values as a reader that loads the file into memory"""
+        normalReader = BinaryFileReader(self.filepath)
+        mappedReader = BinaryFileReader(self.filepath, useMemoryMap=True)
+
+        self.assertFalse(normalReader.is_memory_mapped(), "Reader was memory mapped when it shouldn't be")
+        self.assertTrue(mappedReader.is_memory_mapped(), "Reader was not memory mapped")
+
+        normalValues = self.read_test_values(normalReader)
+        mappedValues = self.read_test_values(mappedReader)
+
+        self.assertEqual(normalValues, mappedValues, "Memory mapped reader returned different values")
+        self.assertEqual(mappedValues[0], "Version", "Unexpected string value")
+        self.assertEqual(mappedValues[4], [128, 0, 255, 64], "Unexpected color value")
+        self.assertTrue(mappedReader.is_at_eof(), "Memory mapped reader did not reach end of file")
+
+        normalReader.close()
+        mappedReader.close()
+
+    def test_memory_mapped_slices_outlive_reader(self):
+        """Tests that slices returned from a memory mapped file remain valid once the reader is closed"""
+        mappedReader = BinaryFileReader(self.filepath, useMemoryMap=True)
+        mappedReader.read_uint32()
+        slicedBytes = mappedReader.read_bytes(7)
+        mappedReader.release_consumed_pages()
+        mappedReader.close()
+
+        self.assertIsInstance(slicedBytes, memoryview, "Memory mapped reader did not return a memoryview")
+        self.assertEqual(slicedBytes.tobytes(), b"Version", "Slice changed after reader was closed")
+
+    def test_memory_map_empty_file(self):
+        """Tests that an empty file can be opened in memory mapped mode"""
+        emptyFilepath = write_temp_file(b'')
+        try:
+            mappedReader = BinaryFileReader(emptyFilepath, useMemoryMap=True)
+            self.assertEqual(mappedReader.get_length(), 0, "Empty file has non-zero length")
+            self.assertTrue(mappedReader.is_at_eof(), "Empty file is not at end of file")
+            with self.assertRaises(ValueError):
+                mappedReader.read_uint32()
+            mappedReader.close()
+        finally:
+            os.remove(emptyFilepath)
+
+    def test_vector_reads(self):
+        """Tests that the bulk vector reads return the same values as individual reads"""
+        vectorData = struct.pack("<4f", 0.5, 1.5, -3.0, 7.25) + struct.pack("<3I", 1, 65536, 4294967295) + struct.pack("<3h", 1, -1, 32767)
+        vectorFilepath = write_temp_file(vectorData)
+        try:
+            bulkReader = BinaryFileReader(vectorFilepath)
+            singleReader = BinaryFileReader(vectorFilepath)
+
+            self.assertEqual(bulkReader.read_vec_f(4), [singleReader.read_float() for _ in range(4)], "Float vectors don't match")
+            self.assertEqual(bulkReader.read_vec_uint32(3), [singleReader.read_uint32() for _ in range(3)], "uint32 vectors don't match")
+            self.assertEqual(bulkReader.read_vec_uint16(3), [singleReader.read_uint16() for _ in range(3)], "uint16 vectors don't match")
+            self.assertTrue(bulkReader.is_at_eof(), "Bulk reader did not reach end of file")
+            with self.assertRaises(ValueError):
+                bulkReader.read_vec_f(1)
+        finally:
+            os.remove(vectorFilepath)
+
+    def test_packed_vector_blocks(self):
+        """Tests that packed vector blocks behave the same as lists of lists"""
+        blockData = struct.pack("<6f", 0.5, 1.5, -3.0, 7.25, 8.0, 9.0)
+        blockData += struct.pack("<8f", 0.0, 1.0, 0.0, 5.0, 1.0, 0.0, 0.0, -2.5)
+        blockFilepath = write_temp_file(blockData)
+        try:
+            listReader = BinaryFileReader(blockFilepath)
+            packedReader = BinaryFileReader(blockFilepath, usePackedArrays=True)
+
+            listVertices = listReader.read_vec_f_block(2, 3)
+            packedVertices = packedReader.read_vec_f_block(2, 3)
+            self.assertIsInstance(listVertices, list, "List reader did not return a list")
+            self.assertIsInstance(packedVertices, PackedVectorArray, "Packed reader did not return a PackedVectorArray")
+            self.assertEqual(len(packedVertices), 2, "Unexpected number of packed vectors")
+            self.assertEqual(packedVertices[1], [7.25, 8.0, 9.0], "Unexpected packed vector")
+            self.assertEqual(packedVertices[-1], listVertices[-1], "Negative index returned a different vector")
+            self.assertEqual(list(packedVertices), listVertices, "Packed vectors don't match list vectors")
+            self.assertEqual(CustomJSONEncoder().default(packedVertices), listVertices, "Packed vectors don't serialize as lists")
+            with self.assertRaises(IndexError):
+                packedVertices[2] # pylint: disable=W0104
+
+            listNormals, listDistances = listReader.read_vec_f_block_with_scalar(2, 3)
+            packedNormals, packedDistances = packedReader.read_vec_f_block_with_scalar(2, 3)
+            self.assertEqual(listNormals, [[0.0, 1.0, 0.0], [1.0, 0.0, 0.0]], "Unexpected normals")
+            self.assertEqual(listDistances, [5.0, -2.5], "Unexpected distances")
+            self.assertEqual(packedNormals.tolist(), listNormals, "Packed normals don't match list normals")
+            self.assertEqual(list(packedDistances), listDistances, "Packed distances don't match list distances")
+            self.assertTrue(packedReader.is_at_eof(), "Packed reader did not reach end of file")
+        finally:
+            os.remove(blockFilepath)
+
+    def test_read_from_memory(self):
+        """Tests that files can be parsed from buffers and file-like objects the same as from disk"""
+        dmpData = struct.pack("<I4fII", 1, 0.5, 0.5, 0.5, 1.0, 0, 1)
+        dmpData += pack_sized_cstring("room01") + pack_sized_cstring("light01") + pack_dmp_light_body()
+        dmpFilepath = write_temp_file(dmpData)
+        try:
+            diskFile = RSDMPLightFile()
+            self.assertTrue(diskFile.read_file(dmpFilepath), "File was not read to end of file")
+        finally:
+            os.remove(dmpFilepath)
+
+        archiveBuffer = io.BytesIO()
+        with zipfile.ZipFile(archiveBuffer, "w") as archive:
+            archive.writestr("data/map/m01/m01.dmp", dmpData)
+
+        memoryFiles = []
+        for source in [dmpData, bytearray(dmpData), memoryview(dmpData)]:
+            bufferFile = RSDMPLightFile()
+            self.assertTrue(bufferFile.read_buffer(source, name="m01.dmp"), "Buffer was not read to end of data")
+            self.assertEqual(bufferFile.filepath, "m01.dmp", "Buffer name was not kept")
+            memoryFiles.append(bufferFile)
+
+        streamFile = RSDMPLightFile()
+        self.assertTrue(streamFile.read_stream(io.BytesIO(dmpData)), "Stream was not read to end of data")
+        self.assertIsNone(streamFile.filepath, "Stream without a name was given a filepath")
+        memoryFiles.append(streamFile)
+
+        with zipfile.ZipFile(archiveBuffer) as archive:
+            with archive.open("data/map/m01/m01.dmp") as archivedFile:
+                archiveFile = RSDMPLightFile()
+                self.assertTrue(archiveFile.read_stream(archivedFile), "Archived file was not read to end of data")
+                self.assertEqual(archiveFile.filepath, "data/map/m01/m01.dmp", "Archive member name was not used")
+                memoryFiles.append(archiveFile)
+
+        for memoryFile in memoryFiles:
+            self.assertEqual(memoryFile.header.lightCount, diskFile.header.lightCount, "Light count does not match file read from disk")
+            self.assertEqual(memoryFile.lights[0].name_string.string, diskFile.lights[0].name_string.string, "Light name does not match file read from disk")
+            self.assertEqual(memoryFile.lights[0].diffuseColor, diskFile.lights[0].diffuseColor, "Light color does not match file read from disk")
+
+    def test_vector_read_benchmark(self):
+        """Microbenchmark comparing reading a 100k vertex buffer one float at a time against a single bulk read.
+        Timings are only logged, as they vary too much between machines to assert on"""
+        floatCount = BENCHMARK_VERTEX_COUNT * 3
+        vertexData = struct.pack("<" + str(floatCount) + "f", *[float(i) * 0.25 for i in range(floatCount)])
+        vertexFilepath = write_temp_file(vertexData)
+        try:
+            singleReader = BinaryFileReader(vertexFilepath)
+            startTime = time.perf_counter()
+            singleValues = [singleReader.read_float() for _ in range(floatCount)]
+            singleDuration = time.perf_counter() - startTime
+
+            bulkReader = BinaryFileReader(vertexFilepath)
+            startTime = time.perf_counter()
+            bulkValues = bulkReader.read_vec(TYPECODE_FLOAT, floatCount)
+            bulkDuration = time.perf_counter() - startTime
+
+            log.info("Per element read: %fs, bulk read: %fs, speedup: %.1fx", singleDuration, bulkDuration, singleDuration / max(bulkDuration, 1e-9))
+
+            self.assertEqual(list(bulkValues), singleValues, "Bulk read returned different values")
+            self.assertEqual(bulkReader.get_seekg(), singleReader.get_seekg(), "Bulk read did not advance the same distance as reading each element")
+            self.assertTrue(bulkReader.is_at_eof(), "Bulk read did not consume the whole buffer")
+        finally:
+            os.remove(vertexFilepath)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Test declarative binary structure schemas"""
+import logging
+import os
+import struct
+import unittest
+
+from FileUtilities.BinaryConversionUtilities import BinaryFileReader, TYPECODE_UINT32, TYPECODE_FLOAT
+from FileUtilities.BinaryStructSchema import BinaryStructSchema, SchemaField, SchemaFieldRun, FIELD_SIZED_CSTRING
+from RainbowFileReaders.RSDMPLightReader import RSDMPLight
+from RainbowFileReaders.R6MAPStructures import R6MAPLight
+from tests.test_Utils_BinaryConversion import write_temp_file, pack_sized_cstring, pack_dmp_light_body
+
+logging.basicConfig(level=logging.CRITICAL)
+
+class UtilsBinaryStructSchemaTests(unittest.TestCase):
+    """Test declarative binary structure schemas"""
+
+    def read_structure(self, structure, data: bytes):
+        """Writes data to a temporary file and reads the structure from it, returning the reader"""
+        filepath = write_temp_file(data)
+        try:
+            filereader = BinaryFileReader(filepath)
+            structure.read(filereader)
+        finally:
+            os.remove(filepath)
+        return filereader
+
+    def test_fixed_fields_are_merged(self):
+        """Tests that consecutive fixed size fields are compiled into a single run"""
+        schema = BinaryStructSchema([
+            SchemaField("a", TYPECODE_UINT32),
+            SchemaField("b", TYPECODE_FLOAT, 3),
+            SchemaField("name", FIELD_SIZED_CSTRING),
+            SchemaField("c", TYPECODE_UINT32),
+        ])
+        self.assertEqual(len(schema.steps), 3, "Unexpected number of compiled steps")
+        self.assertIsInstance(schema.steps[0], SchemaFieldRun, "Fixed fields were not merged into a run")
+        self.assertEqual(schema.steps[0].struct.size, 16, "Merged run has the wrong size")
+
+    def test_dmp_light_with_version(self):
+        """Tests reading a DMP light which stores a version string"""
+        data = pack_sized_cstring("room01")
+        data += pack_sized_cstring("Version") + struct.pack("<I", 5) + pack_sized_cstring("light01") + bytes([7])
+        data += pack_dmp_light_body()
+
+        light = RSDMPLight()
+        filereader = self.read_structure(light, data)
+
+        self.assertTrue(filereader.is_at_eof(), "Light was not fully read")
+        self.assertEqual(light.parent_room_string.string, "room01", "Unexpected parent room")
+        self.assertEqual(light.version_string.string, "Version", "Version string was not kept")
+        self.assertEqual(light.versionNumber, 5, "Unexpected version number")
+        self.assertEqual(light.name_string.string, "light01", "Unexpected light name")
+        self.assertEqual(light.unknown6, 7, "Unexpected unknown6")
+        self.assertEqual(light.lightType, 2, "Unexpected light type")
+        self.assertEqual(light.position, [10.0, 20.0, 30.0], "Unexpected position")
+        self.assertEqual(light.falloff, 5.5, "Unexpected falloff")
+        self.assertEqual(light.diffuseColor, [1.0, 0.5, 0.25, 1.0], "Unexpected diffuse color")
+        self.assertEqual(light.spotlightConeAngle, 45.0, "Unexpected cone angle")
+        self.assertEqual(light.type, 3, "Unexpected type")
+
+    def test_dmp_light_without_version(self):
+        """Tests reading a DMP light which has no version string"""
+        data = pack_sized_cstring("room01") + pack_sized_cstring("light01") + pack_dmp_light_body()
+
+        light = RSDMPLight()
+        filereader = self.read_structure(light, data)
+
+        self.assertTrue(filereader.is_at_eof(), "Light was not fully read")
+        self.assertEqual(light.name_string.string, "light01", "Unexpected light name")
+        self.assertFalse(hasattr(light, "versionNumber"), "Version number was set without a version string")
+        self.assertEqual(light.ambientColor, [0.125, 0.125, 0.125, 1.0], "Unexpected ambient color")
+
+    def test_r6_map_light_without_version(self):
+        """Tests that the alternate branch of a schema is read when there is no version string"""
+        data = struct.pack("<II", 100, 9) + pack_sized_cstring("light01") + b"\x01\x02\x03"
+        data += struct.pack("<9f", *[float(i) for i in range(9)])
+        data += struct.pack("<3f", 1.0, 2.0, 3.0)
+        data += struct.pack("<3I", 255, 128, 0)
+        data += struct.pack("<5f", 1.0, 0.5, 0.25, 100.0, 2.0)
+        data += bytes([1])
+
+        light = R6MAPLight()
+        filereader = self.read_structure(light, data)
+
+        self.assertTrue(filereader.is_at_eof(), "Light was not fully read")
+        self.assertEqual(light.id, 9, "Unexpected id")
+        self.assertEqual(light.unknown7, b"\x01\x02\x03", "Unexpected unknown7 bytes")
+        self.assertEqual(light.transformMatrix, [float(i) for i in range(9)], "Unexpected transform")
+        self.assertEqual(light.color, [255, 128, 0], "Unexpected color")
+        self.assertEqual(light.energy, 2.0, "Unexpected energy")
+        self.assertEqual(light.type, 1, "Unexpected type")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Test BC1 and BC3 block compression"""
+import logging
+import unittest
+
+from PIL import Image as PILImage
+
+from FileUtilities.BlockCompression import BCQuality, compress_image, compress_mip_chain, get_blend_mode_for_alpha_bitdepth, select_block_compression_format, pack_565, unpack_565
+from FileUtilities.DDSFile import DDSFormat
+from FileUtilities.MipMapGenerator import generate_mip_maps
+
+logging.basicConfig(level=logging.CRITICAL)
+
+def create_test_image(width, height, alpha=None):
+    """Creates a smooth RGBA gradient image, with either a constant or varying alpha channel"""
+    image = PILImage.new("RGBA", (width, height))
+    image.putdata([(x * 255 // max(width - 1, 1), y * 255 // max(height - 1, 1), (x + y) * 4 % 256,
+                    alpha if alpha is not None else (x * 16) % 256) for y in range(height) for x in range(width)])
+    return image
+
+def get_mean_squared_error(imageA, imageB, channels):
+    """Returns the mean squared error between 2 RGBA images, over the given number of channels"""
+    total = 0
+    for i, (valueA, valueB) in enumerate(zip(imageA.tobytes(), imageB.tobytes())):
+        if i % 4 < channels:
+            total += (valueA - valueB) * (valueA - valueB)
+    return total / (imageA.size[0] * imageA.size[1] * channels)
+
+class UtilsBlockCompressionTests(unittest.TestCase):
+    """Test BC1 and BC3 block compression"""
+
+    def test_565_round_trip(self):
+        """Tests that every 565 color is preserved when expanded and quantized again"""
+        for color in range(0, 65536, 7):
+            self.assertEqual(pack_565(unpack_565(color)), color, "565 color was not preserved")
+
+    def test_format_selection(self):
+        """Tests that only alpha blended materials use BC3"""
+        self.assertEqual(select_block_compression_format("alphablend"), DDSFormat.BC3, "Alpha blended textures should use BC3")
+        self.assertEqual(select_block_compression_format("colorkey"), DDSFormat.BC1, "Colorkey textures should use BC1")
+        self.assertEqual(select_block_compression_format("opaque"), DDSFormat.BC1, "Opaque textures should use BC1")
+        self.assertEqual(select_block_compression_format(None), DDSFormat.BC1, "Textures without a CXP definition should use BC1")
+        self.assertEqual(select_block_compression_format(get_blend_mode_for_alpha_bitdepth(4)), DDSFormat.BC3, "Textures with alpha gradients should use BC3")
+        self.assertEqual(select_block_compression_format(get_blend_mode_for_alpha_bitdepth(1)), DDSFormat.BC1, "Textures with 1 bit alpha should use BC1")
+
+    def test_bc1_quality(self):
+        """Tests that opaque BC1 data decodes close to the source for every quality, and higher qualities are no worse"""
+        src_image = create_test_image(32, 32, 255)
+        errors = []
+        for quality in (BCQuality.FAST, BCQuality.NORMAL, BCQuality.HIGH):
+            data = compress_image(src_image, DDSFormat.BC1, quality)
+            self.assertEqual(len(data), 8 * 8 * 8, "Unexpected BC1 data size")
+            decoded = PILImage.frombytes("RGBA", src_image.size, data, "bcn", 1)
+            errors.append(get_mean_squared_error(src_image, decoded, 3))
+        self.assertLess(errors[0], 50, "BC1 error is too high")
+        self.assertLessEqual(errors[2], errors[0], "High quality is worse than fast quality")
+
+    def test_bc1_transparency(self):
+        """Tests that transparent pixels survive BC1 compression, as used for colorkey textures"""
+        src_image = create_test_image(8, 8, 255)
+        src_image.putpixel((1, 1), (255, 0, 255, 0))
+        src_image.putpixel((6, 5), (255, 0, 255, 0))
+        decoded = PILImage.frombytes("RGBA", src_image.size, compress_image(src_image, DDSFormat.BC1), "bcn", 1)
+
+        self.assertEqual(decoded.getpixel((1, 1))[3], 0, "Transparent pixel became opaque")
+        self.assertEqual(decoded.getpixel((6, 5))[3], 0, "Transparent pixel became opaque")
+        self.assertEqual(decoded.getpixel((0, 0))[3], 255, "Opaque pixel became transparent")
+
+    def test_bc3_alpha(self):
+        """Tests that BC3 preserves a varying alpha channel"""
+        src_image = create_test_image(16, 16)
+        data = compress_image(src_image, DDSFormat.BC3, BCQuality.HIGH)
+        self.assertEqual(len(data), 4 * 4 * 16, "Unexpected BC3 data size")
+        decoded = PILImage.frombytes("RGBA", src_image.size, data, "bcn", 3)
+
+        alphaError = get_mean_squared_error(src_image.getchannel("A").convert("RGBA"), decoded.getchannel("A").convert("RGBA"), 1)
+        self.assertLess(alphaError, 4, "BC3 alpha error is too high")
+
+    def test_compressed_mip_chain(self):
+        """Tests that small mip levels are padded to a whole block"""
+        mips = generate_mip_maps(create_test_image(8, 8, 255))
+        texture = compress_mip_chain(mips, DDSFormat.BC1, BCQuality.FAST)
+
+        self.assertEqual(texture.format, DDSFormat.BC1, "Unexpected texture format")
+        self.assertEqual([len(level) for level in texture.levels], [32, 8, 8, 8], "Unexpected BC1 level sizes")
+        decodedMips = texture.to_pil_images()
+        self.assertEqual(decodedMips[-1].size, (1, 1), "Unexpected size of last mip level")
+        self.assertEqual(len(decodedMips[-1].getpixel((0, 0))), 4, "Last mip level did not decode")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Test resolving cache paths and atomic writes"""
+import logging
+import os
+import tempfile
+import unittest
+
+from FileUtilities.CacheDirectory import atomic_write_path, get_cache_path, get_cache_root, set_cache_root, CACHE_SHARD_LENGTH
+from FileUtilities.FileOffsetIndex import get_index_path, FILE_OFFSET_INDEX_SUFFIX
+from FileUtilities.ImageCache import get_image_cache_format, get_image_cache_path
+
+logging.basicConfig(level=logging.CRITICAL)
+
+class UtilsCacheDirectoryTests(unittest.TestCase):
+    """Test resolving cache paths and atomic writes"""
+
+    def tearDown(self):
+        set_cache_root(None)
+
+    def test_sidecar_paths_without_cache_root(self):
+        """Tests that outputs are stored beside their source file when no cache root is set"""
+        set_cache_root(None)
+        sourcePath = os.path.join("data", "texture", "WALL.RSB")
+        self.assertIsNone(get_cache_root(), "Cache root was not cleared")
+        self.assertEqual(get_cache_path(sourcePath, ".PNG"), sourcePath + ".PNG", "Output is not beside its source file")
+        self.assertEqual(get_index_path(sourcePath), sourcePath + FILE_OFFSET_INDEX_SUFFIX, "Index is not beside its source file")
+
+    def test_sharded_paths_with_cache_root(self):
+        """Tests that every kind of output is stored in a shard of the cache root, without collisions between files with the same name"""
+        with tempfile.TemporaryDirectory() as cacheRoot:
+            set_cache_root(cacheRoot)
+            firstPath = os.path.join("R6", "data", "texture", "WALL.RSB")
+            secondPath = os.path.join("EW", "data", "texture", "WALL.RSB")
+
+            firstOutput = get_cache_path(firstPath, ".PNG")
+            self.assertEqual(os.path.dirname(os.path.dirname(firstOutput)), cacheRoot, "Output is not in a shard of the cache root")
+            self.assertEqual(len(os.path.basename(os.path.dirname(firstOutput))), CACHE_SHARD_LENGTH, "Unexpected shard directory name")
+            self.assertTrue(firstOutput.endswith("_WALL.RSB.PNG"), "Output name does not identify the source file")
+            self.assertNotEqual(firstOutput, get_cache_path(secondPath, ".PNG"), "Files with the same name share an output")
+            self.assertEqual(firstOutput, get_cache_path(os.path.abspath(firstPath), ".PNG"), "Relative and absolute paths resolve differently")
+
+            self.assertTrue(get_index_path(firstPath).startswith(cacheRoot), "Index is not in the cache root")
+            self.assertTrue(get_image_cache_path(firstPath, get_image_cache_format("PNG")).startswith(cacheRoot), "Image cache is not in the cache root")
+
+    def test_atomic_write(self):
+        """Tests that a completed write creates missing directories and replaces the file, while a failed write leaves the old file untouched"""
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            outputPath = os.path.join(tempDirectory, "ab", "output.JSON")
+            with atomic_write_path(outputPath) as tempPath:
+                with open(tempPath, "w") as outputFile:
+                    outputFile.write("complete")
+
+            with self.assertRaises(RuntimeError):
+                with atomic_write_path(outputPath) as tempPath:
+                    with open(tempPath, "w") as outputFile:
+                        outputFile.write("partial")
+                    raise RuntimeError("Conversion failed")
+
+            with open(outputPath, "r") as outputFile:
+                self.assertEqual(outputFile.read(), "complete", "Failed write replaced the output")
+            self.assertEqual(os.listdir(os.path.dirname(outputPath)), ["output.JSON"], "Temporary file was left behind")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 """Test Color Conversion utilities"""
 import logging
+import struct
 import unittest
 import random
 
@@ -10,49 +11,85 @@ TEST_SETTINGS_FILE = "test_settings.json"
 
 logging.basicConfig(level=logging.CRITICAL)
 
+def decode_16bit_color(color_value, bdR, bdG, bdB, bdA):
+    """Decodes a single 16 bit color with decode_bitmask_ARGB_colors, returning an RGBA tuple"""
+    return tuple(ColorConversionUtilities.decode_bitmask_ARGB_colors(struct.pack("<H", color_value), bdR, bdG, bdB, bdA))
+
 class UtilsColorConversionTests(unittest.TestCase):
     """Test Color Conversion utilities"""
 
     def test_max_colors(self):
-        """ Tests both lookup and brute force methods with white (maximum) colors in ARGB_0565 and ARGB_4444 formats """
+        """ Tests both decoding and brute force methods with white (maximum) colors in ARGB_0565 and ARGB_4444 formats """
 
         max_color_0565_brute = ColorConversionUtilities.read_bitmask_ARGB_color(65535, 5, 6, 5, 0)
         max_color_4444_brute = ColorConversionUtilities.read_bitmask_ARGB_color(65535, 4, 4, 4, 4)
 
-        max_color_0565_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_0565][65535]
-        max_color_4444_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_4444][65535]
+        max_color_0565_decoded = decode_16bit_color(65535, 5, 6, 5, 0)
+        max_color_4444_decoded = decode_16bit_color(65535, 4, 4, 4, 4)
 
-        self.assertEqual(max_color_0565_brute, max_color_0565_lookup, "Lookup and brute force color conversion methods don't match with ARGB_0565 format")
-        self.assertEqual(max_color_4444_brute, max_color_4444_lookup, "Lookup and brute force color conversion methods don't match with ARGB_4444 format")
+        self.assertEqual(max_color_0565_brute, max_color_0565_decoded, "Decoded and brute force colors don't match with ARGB_0565 format")
+        self.assertEqual(max_color_4444_brute, max_color_4444_decoded, "Decoded and brute force colors don't match with ARGB_4444 format")
 
     def test_min_colors(self):
-        """ Tests both lookup and brute force methods with black (minimum) colors in ARGB_0565 and ARGB_4444 formats """
+        """ Tests both decoding and brute force methods with black (minimum) colors in ARGB_0565 and ARGB_4444 formats """
 
         min_color_0565_brute = ColorConversionUtilities.read_bitmask_ARGB_color(0, 5, 6, 5, 0)
         min_color_4444_brute = ColorConversionUtilities.read_bitmask_ARGB_color(0, 4, 4, 4, 4)
 
-        min_color_0565_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_0565][0]
-        min_color_4444_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_4444][0]
+        min_color_0565_decoded = decode_16bit_color(0, 5, 6, 5, 0)
+        min_color_4444_decoded = decode_16bit_color(0, 4, 4, 4, 4)
 
-        self.assertEqual(min_color_0565_brute, min_color_0565_lookup, "Lookup and brute force color conversion methods don't match with ARGB_0565 format")
-        self.assertEqual(min_color_4444_brute, min_color_4444_lookup, "Lookup and brute force color conversion methods don't match with ARGB_4444 format")
+        self.assertEqual(min_color_0565_brute, min_color_0565_decoded, "Decoded and brute force colors don't match with ARGB_0565 format")
+        self.assertEqual(min_color_4444_brute, min_color_4444_decoded, "Decoded and brute force colors don't match with ARGB_4444 format")
 
     def test_random_colors_ARGB_0565(self):
-        """ Tests both lookup and brute force methods with random colors in ARGB_0565 format """
+        """ Tests both decoding and brute force methods with random colors in ARGB_0565 format """
         settings = load_settings(TEST_SETTINGS_FILE)
 
         for _ in range(settings["random_color_test_count"]):
             random_color = random.randint(0,65535)
             random_color_0565_brute = ColorConversionUtilities.read_bitmask_ARGB_color(random_color, 5, 6, 5, 0)
-            random_color_0565_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_0565][random_color]
-            self.assertEqual(random_color_0565_brute, random_color_0565_lookup, "Lookup and brute force color conversion methods don't match with ARGB_0565 format")
+            random_color_0565_decoded = decode_16bit_color(random_color, 5, 6, 5, 0)
+            self.assertEqual(random_color_0565_brute, random_color_0565_decoded, "Decoded and brute force colors don't match with ARGB_0565 format")
 
     def test_random_colors_ARGB_4444(self):
-        """ Tests both lookup and brute force methods with random colors in ARGB_4444 format """
+        """ Tests both decoding and brute force methods with random colors in ARGB_4444 format """
         settings = load_settings(TEST_SETTINGS_FILE)
 
         for _ in range(settings["random_color_test_count"]):
             random_color = random.randint(0,65535)
             random_color_4444_brute = ColorConversionUtilities.read_bitmask_ARGB_color(random_color, 4, 4, 4, 4)
-            random_color_4444_lookup = ColorConversionUtilities.COLOR_LOOKUPS[ColorConversionUtilities.ColorFormats.CF_ARGB_4444][random_color]
-            self.assertEqual(random_color_4444_brute, random_color_4444_lookup, "Lookup and brute force color conversion methods don't match with ARGB_4444 format")
+            random_color_4444_decoded = decode_16bit_color(random_color, 4, 4, 4, 4)
+            self.assertEqual(random_color_4444_brute, random_color_4444_decoded, "Decoded and brute force colors don't match with ARGB_4444 format")
+
+    def test_decode_all_16bit_colors(self):
+        """ Tests that decoding a whole buffer matches the brute force method for every color in ARGB_0565, ARGB_4444 and ARGB_1555 formats """
+        all_colors = struct.pack("<65536H", *range(65536))
+
+        for bitmask in [(5, 6, 5, 0), (4, 4, 4, 4), (5, 5, 5, 1)]:
+            decoded_colors = ColorConversionUtilities.decode_bitmask_ARGB_colors(all_colors, *bitmask)
+            for color_value in range(65536):
+                brute_color = ColorConversionUtilities.read_bitmask_ARGB_color(color_value, *bitmask)
+                decoded_color = tuple(decoded_colors[color_value * 4:color_value * 4 + 4])
+                self.assertEqual(decoded_color, brute_color, "Decoded color " + str(color_value) + " does not match brute force method with bitmask " + str(bitmask))
+
+    def test_decode_wide_colors(self):
+        """ Tests that decoding 24 and 32 bit colors matches the brute force method """
+        random_colors = [random.randint(0, 2 ** 32 - 1) for _ in range(1000)]
+
+        for bitmask in [(8, 8, 8, 8), (8, 8, 8, 0), (6, 6, 6, 6), (8, 7, 7, 2)]:
+            bytes_per_color = ColorConversionUtilities.get_bytes_per_color(*bitmask)
+            color_values = [random_color % (2 ** sum(bitmask)) for random_color in random_colors]
+            packed_colors = b"".join(color_value.to_bytes(bytes_per_color, "little") for color_value in color_values)
+            decoded_colors = ColorConversionUtilities.decode_bitmask_ARGB_colors(packed_colors, *bitmask)
+            for index, color_value in enumerate(color_values):
+                brute_color = ColorConversionUtilities.read_bitmask_ARGB_color(color_value, *bitmask)
+                decoded_color = tuple(decoded_colors[index * 4:index * 4 + 4])
+                self.assertEqual(decoded_color, brute_color, "Decoded color " + str(color_value) + " does not match brute force method with bitmask " + str(bitmask))
+
+    def test_color_format_names(self):
+        """ Tests that color formats are named after the bit depth of each channel """
+        self.assertEqual(ColorConversionUtilities.get_color_format(5, 5, 5, 1), "ARGB1555", "Unexpected color format name")
+        self.assertEqual(ColorConversionUtilities.get_color_format(5, 6, 5, 0), ColorConversionUtilities.ColorFormats.CF_ARGB_0565, "ARGB_0565 format was not detected")
+        self.assertEqual(ColorConversionUtilities.get_color_format(0, 0, 0, 0), ColorConversionUtilities.ColorFormats.CF_UNKNOWN, "Empty color format was not rejected")
+        self.assertEqual(ColorConversionUtilities.get_color_format(16, 8, 8, 0), ColorConversionUtilities.ColorFormats.CF_UNKNOWN, "Color format with a 16 bit channel was not rejected")
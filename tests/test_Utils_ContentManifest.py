@@ -0,0 +1,95 @@
+"""Test content hashing and deduplication of files"""
+import logging
+import os
+import tempfile
+import unittest
+
+from FileUtilities.ContentManifest import ContentManifest, get_content_hash, link_file
+from FileUtilities.DirectoryProcessor import DirectoryProcessor
+
+logging.basicConfig(level=logging.CRITICAL)
+
+def write_test_file(directory, name, contents):
+    """Writes contents to a file in directory, creating any missing directories, and returns the path"""
+    filepath = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as testFile:
+        testFile.write(contents)
+    return filepath
+
+class UtilsContentManifestTests(unittest.TestCase):
+    """Test content hashing and deduplication of files"""
+
+    def test_duplicate_detection(self):
+        """Tests that files with the same contents are detected regardless of path, unless the conversion key differs"""
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            original = write_test_file(tempDirectory, "R6/data/texture/WALL.RSB", b"wall")
+            copy = write_test_file(tempDirectory, "EW/data/texture/WALL2.RSB", b"wall")
+            different = write_test_file(tempDirectory, "R6/data/texture/FLOOR.RSB", b"floor")
+
+            self.assertEqual(get_content_hash(original), get_content_hash(copy), "Identical files have different hashes")
+            manifest = ContentManifest()
+            self.assertIsNone(manifest.add_file(original), "First file was reported as a duplicate")
+            self.assertEqual(manifest.add_file(copy), original, "Duplicate was not detected")
+            self.assertIsNone(manifest.add_file(different), "Different file was reported as a duplicate")
+            self.assertIsNone(manifest.add_file(copy, "colorkey"), "Duplicate with a different conversion key was reported as a duplicate")
+            self.assertIsNone(manifest.add_file(original), "Adding the same file again reported it as a duplicate of itself")
+
+    def test_manifest_reuses_hashes(self):
+        """Tests that saved hashes are reused for unchanged files, and files are hashed again when they change"""
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            testPath = write_test_file(tempDirectory, "A.RSB", b"original")
+            manifestPath = os.path.join(tempDirectory, "manifest", "content.json")
+
+            manifest = ContentManifest()
+            originalHash = manifest.get_hash(testPath)
+            manifest.save(manifestPath)
+
+            loadedManifest = ContentManifest.load(manifestPath)
+            self.assertEqual(loadedManifest.fileHashes[testPath][0], originalHash, "Hash was not saved")
+            # Replace the saved hash, so reusing it can be told apart from hashing the file again
+            loadedManifest.fileHashes[testPath] = ("saved",) + loadedManifest.fileHashes[testPath][1:]
+            self.assertEqual(loadedManifest.get_hash(testPath), "saved", "Hash of unchanged file was not reused")
+
+            with open(testPath, "ab") as testFile:
+                testFile.write(b" and changed")
+            self.assertNotEqual(loadedManifest.get_hash(testPath), "saved", "Changed file was not hashed again")
+
+            self.assertEqual(len(ContentManifest.load(os.path.join(tempDirectory, "missing.json")).fileHashes), 0, "Missing manifest was not empty")
+
+    def test_link_file(self):
+        """Tests that a linked file has the same contents and replaces an existing file"""
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            sourcePath = write_test_file(tempDirectory, "A.RSB.PNG", b"png data")
+            linkPath = write_test_file(tempDirectory, "B.RSB.PNG", b"stale")
+            link_file(sourcePath, linkPath)
+            with open(linkPath, "rb") as linkedFile:
+                self.assertEqual(linkedFile.read(), b"png data", "Linked file has different contents")
+
+    def test_directory_processor_skips_duplicates(self):
+        """Tests that the directory processor processes each unique file once, and reports every duplicate"""
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            write_test_file(tempDirectory, "R6/A.RSB", b"same")
+            write_test_file(tempDirectory, "EW/A.RSB", b"same")
+            write_test_file(tempDirectory, "EW/B.RSB", b"same")
+            write_test_file(tempDirectory, "R6/C.RSB", b"unique")
+
+            processed = []
+            duplicates = []
+            processor = DirectoryProcessor()
+            processor.paths = [tempDirectory]
+            processor.fileExt = ".RSB"
+            processor.processFunction = processed.append
+            processor.duplicateFunction = lambda processedPath, duplicatePath: duplicates.append((processedPath, duplicatePath))
+            processor.contentManifestPath = os.path.join(tempDirectory, "manifest.json")
+            processor.run(mode="seq")
+
+            self.assertEqual(len(processed), 2, "Unexpected number of processed files")
+            self.assertEqual(len(duplicates), 2, "Unexpected number of duplicate files")
+            for processedPath, duplicatePath in duplicates:
+                self.assertIn(processedPath, processed, "Duplicate refers to a file that wasn't processed")
+                self.assertNotIn(duplicatePath, processed, "Duplicate was processed")
+            self.assertTrue(os.path.isfile(processor.contentManifestPath), "Content manifest was not saved")
+
+if __name__ == '__main__':
+    unittest.main()
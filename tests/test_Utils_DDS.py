@@ -0,0 +1,67 @@
+"""Test reading and writing DDS files"""
+import logging
+import os
+import tempfile
+import unittest
+
+from PIL import Image as PILImage
+
+from FileUtilities.DDSFile import DDSTexture, DDSFormat, write_dds, read_dds, calculate_mip_level_size, DDS_HEADER_STRUCT
+from FileUtilities.MipMapGenerator import generate_mip_maps
+
+logging.basicConfig(level=logging.CRITICAL)
+
+class UtilsDDSTests(unittest.TestCase):
+    """Test reading and writing DDS files"""
+
+    def test_header_size(self):
+        """Tests that the magic number and header take up 128 bytes"""
+        self.assertEqual(DDS_HEADER_STRUCT.size, 128, "Unexpected DDS header size")
+
+    def test_rgba8_mip_chain_round_trip(self):
+        """Tests that a mip chain written to a DDS file reads back identically, with the top level stored first"""
+        src_image = PILImage.new("RGBA", (16, 8))
+        src_image.putdata([(x * 16, y * 32, x ^ y, 255 - x) for y in range(8) for x in range(16)])
+        mips = generate_mip_maps(src_image)
+
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            ddsPath = os.path.join(tempDirectory, "test.DDS")
+            write_dds(ddsPath, mips)
+            self.assertEqual(os.path.getsize(ddsPath), 128 + sum(len(mip.tobytes()) for mip in mips), "Unexpected DDS file size")
+            texture = read_dds(ddsPath)
+
+        self.assertIsNotNone(texture, "Failed to read DDS file")
+        self.assertEqual((texture.width, texture.height), (16, 8), "Unexpected texture dimensions")
+        self.assertEqual(texture.format, DDSFormat.RGBA8, "Unexpected texture format")
+        self.assertEqual(texture.get_level_dimensions(), [mip.size for mip in mips], "Unexpected mip level dimensions")
+        self.assertEqual(texture.levels, [mip.tobytes() for mip in mips], "Mip level data does not match")
+
+        decodedMips = texture.to_pil_images()
+        self.assertEqual(decodedMips[0].getpixel((3, 2)), src_image.getpixel((3, 2)), "Decoded pixel does not match")
+
+    def test_block_compressed_round_trip(self):
+        """Tests that block compressed levels are stored with the correct sizes and decode with PIL"""
+        # A single opaque white BC1 block, repeated for each block in each level
+        whiteBlock = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+        levels = [whiteBlock * (calculate_mip_level_size(size, size, DDSFormat.BC1) // 8) for size in (8, 4, 2, 1)]
+        self.assertEqual([len(level) for level in levels], [32, 8, 8, 8], "Unexpected BC1 level sizes")
+
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            ddsPath = os.path.join(tempDirectory, "test.DDS")
+            DDSTexture(8, 8, DDSFormat.BC1, levels).write_file(ddsPath)
+            texture = read_dds(ddsPath)
+
+        self.assertEqual(texture.format, DDSFormat.BC1, "Unexpected texture format")
+        self.assertEqual(texture.levels, levels, "Block data does not match")
+        decodedMips = texture.to_pil_images()
+        self.assertEqual(decodedMips[1].size, (4, 4), "Unexpected decoded mip size")
+        self.assertEqual(decodedMips[0].getpixel((7, 7)), (255, 255, 255, 255), "Decoded pixel does not match")
+
+    def test_mismatched_mip_sizes(self):
+        """Tests that mips which don't halve in size are rejected"""
+        mips = [PILImage.new("RGBA", (8, 8)), PILImage.new("RGBA", (2, 2))]
+        with self.assertRaises(ValueError):
+            DDSTexture.from_pil_images(mips)
+
+if __name__ == '__main__':
+    unittest.main()
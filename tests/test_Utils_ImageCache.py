@@ -0,0 +1,71 @@
+"""Test image cache formats"""
+import logging
+import os
+import tempfile
+import unittest
+
+from PIL import Image as PILImage
+
+from FileUtilities.ImageCache import get_image_cache_format, get_image_cache_path, IMAGE_CACHE_FORMATS
+
+logging.basicConfig(level=logging.CRITICAL)
+
+def create_test_image_data(width, height):
+    """Creates RGBA8 pixels with runs, repeated colors, small and large differences, and alpha changes"""
+    pixels = bytearray()
+    for y in range(height):
+        for x in range(width):
+            if y == 0:
+                # A long run of a single color
+                pixels += bytes((10, 20, 30, 255))
+            elif y % 4 == 1:
+                # Small and medium gradients
+                pixels += bytes(((x * 3) % 256, (x * 5 + y) % 256, (x * 7) % 256, 255))
+            elif y % 4 == 2:
+                # Colors that have been seen before, and changes in alpha
+                pixels += bytes(((x % 3) * 80, 0, 255, (x % 2) * 255))
+            else:
+                # Large jumps between neighbouring pixels
+                pixels += bytes(((x * 97) % 256, (x * 59 + y * 13) % 256, (x * 31) % 256, (x * 11) % 256))
+    return bytes(pixels)
+
+class UtilsImageCacheTests(unittest.TestCase):
+    """Test image cache formats"""
+
+    def test_cache_formats_round_trip(self):
+        """Tests that every registered cache format returns the pixels it saved, and rejects mismatched dimensions"""
+        width = 13
+        height = 7
+        imageData = create_test_image_data(width, height)
+        self.assertEqual(sorted(IMAGE_CACHE_FORMATS.keys()), ["PNG", "RAW"], "Unexpected cache formats")
+
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            sourcePath = os.path.join(tempDirectory, "TEST.RSB")
+            for name in IMAGE_CACHE_FORMATS:
+                cacheFormat = get_image_cache_format(name.lower())
+                cachePath = get_image_cache_path(sourcePath, cacheFormat)
+                cacheFormat.save(cachePath, width, height, imageData)
+
+                loaded = cacheFormat.load(cachePath, width, height)
+                self.assertIsNotNone(loaded, "Failed to load cached image: " + name)
+                self.assertIsInstance(loaded, bytes, "Cached image does not own its pixels: " + name)
+                self.assertEqual(loaded, imageData, "Cached image did not round trip: " + name)
+                self.assertIsNone(cacheFormat.load(cachePath, width + 1, height), "Cached image with wrong dimensions was loaded: " + name)
+
+    def test_save_pil_image(self):
+        """Tests that RGB images are cached as opaque RGBA"""
+        image = PILImage.new("RGB", (4, 4), (1, 2, 3))
+        with tempfile.TemporaryDirectory() as tempDirectory:
+            cacheFormat = get_image_cache_format("PNG")
+            cachePath = os.path.join(tempDirectory, "TEST.RSB.CACHE.PNG")
+            cacheFormat.save_image(cachePath, image)
+            loaded = cacheFormat.load(cachePath, 4, 4)
+        self.assertEqual(bytes(loaded[0:4]), bytes((1, 2, 3, 255)), "RGB image was not converted to opaque RGBA")
+
+    def test_unknown_format(self):
+        """Tests that unknown formats raise an error"""
+        with self.assertRaises(ValueError):
+            get_image_cache_format("TGA")
+
+if __name__ == '__main__':
+    unittest.main()
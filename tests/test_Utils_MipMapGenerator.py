@@ -0,0 +1,52 @@
+"""Test mip map generation"""
+import logging
+import unittest
+
+from PIL import Image as PILImage
+
+from FileUtilities.MipMapGenerator import generate_mip_maps, NPOTHandling, next_power_of_2, nearest_power_of_2
+
+logging.basicConfig(level=logging.CRITICAL)
+
+class UtilsMipMapGeneratorTests(unittest.TestCase):
+    """Test mip map generation"""
+
+    def test_power_of_2_mip_chain(self):
+        """Tests that each level is half the size of the previous, down to 1x1"""
+        src_image = PILImage.new("RGBA", (64, 16), (255, 128, 0, 255))
+        mips = generate_mip_maps(src_image)
+
+        self.assertEqual(len(mips), 7, "Unexpected number of mip maps")
+        self.assertIs(mips[0], src_image, "First mip map is not the source image")
+        self.assertEqual([mip.size for mip in mips[1:4]], [(32, 8), (16, 4), (8, 2)], "Unexpected mip map sizes")
+        self.assertEqual(mips[-1].size, (1, 1), "Last mip map is not 1x1")
+        self.assertEqual(mips[-1].getpixel((0, 0)), (255, 128, 0, 255), "Solid color was not preserved")
+
+    def test_box_filter_averages(self):
+        """Tests that the default filter averages each 2x2 block of the previous level"""
+        src_image = PILImage.new("L", (2, 2))
+        src_image.putdata([0, 100, 200, 100])
+        mips = generate_mip_maps(src_image)
+        self.assertEqual(mips[1].getpixel((0, 0)), 100, "Mip map is not the average of the previous level")
+
+    def test_npot_handling(self):
+        """Tests that non power of 2 images are skipped by default, and can be resized or padded"""
+        src_image = PILImage.new("RGB", (24, 5), (10, 20, 30))
+        self.assertIsNone(generate_mip_maps(src_image), "Generated mip maps for a non power of 2 image by default")
+
+        resized_mips = generate_mip_maps(src_image, npot_handling=NPOTHandling.RESIZE)
+        self.assertEqual(resized_mips[0].size, (32, 4), "Image was not resized to the nearest power of 2")
+        self.assertEqual(resized_mips[-1].size, (1, 1), "Last mip map is not 1x1")
+
+        padded_mips = generate_mip_maps(src_image, npot_handling=NPOTHandling.PAD)
+        self.assertEqual(padded_mips[0].size, (32, 8), "Image was not padded to the next power of 2")
+        self.assertEqual(padded_mips[0].getpixel((23, 4)), (10, 20, 30), "Image contents were not kept when padding")
+        self.assertEqual(padded_mips[0].getpixel((24, 5)), (0, 0, 0), "Padding is not empty")
+
+    def test_power_of_2_rounding(self):
+        """Tests rounding numbers to powers of 2"""
+        self.assertEqual([next_power_of_2(x) for x in [1, 2, 3, 5, 64, 65]], [1, 2, 4, 8, 64, 128], "Unexpected next power of 2")
+        self.assertEqual([nearest_power_of_2(x) for x in [1, 3, 5, 6, 24, 100]], [1, 4, 4, 8, 32, 128], "Unexpected nearest power of 2")
+
+if __name__ == '__main__':
+    unittest.main()